@@ -0,0 +1,274 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # No Windows não há getrusage; o relatório fica com o pico do tracemalloc.
+    resource = None
+
+import cv2
+import numpy as np
+
+from object_detector import *
+from measure_core import MAX_DIMENSION, MODES, annotate_image, create_marker_detector, measure_object_contours, \
+    measure_trunk_contours, pixel_cm_ratio_from_corners, resize_to_max_dimension
+from image_loader import read_image_reduced
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+SYNTHETIC_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (4032, 3024)]
+STAGES = ["load", "decode", "resize", "reduced_decode", "marker_detection", "segmentation", "contour_filtering",
+          "geometry", "annotation", "encode_write"]
+PERCENTILES = (50, 90, 99)
+
+def synthetic_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    img = rng.normal(150, 25, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
+    marker_size = min(width, height) // 4
+    marker = cv2.aruco.generateImageMarker(aruco_dict, 0, marker_size)
+    border = marker_size // 8
+    marker = cv2.copyMakeBorder(marker, border, border, border, border, cv2.BORDER_CONSTANT, value=255)
+    x0, y0 = width // 20, height // 20
+    img[y0:y0 + marker.shape[0], x0:x0 + marker.shape[1]] = marker[:, :, None]
+
+    for _ in range(8):
+        radius = int(rng.uniform(0.04, 0.09) * min(width, height))
+        center = (int(rng.uniform(0.45, 0.9) * width), int(rng.uniform(0.2, 0.85) * height))
+        cv2.circle(img, center, radius, (60, 90, 120), -1)
+    return img
+
+def benchmark_inputs(include_assets=True, resolutions=SYNTHETIC_RESOLUTIONS, tmp_dir=None):
+    inputs = []
+    if include_assets:
+        for path in sorted(glob.glob(os.path.join(ASSETS_DIR, "*"))):
+            inputs.append((os.path.basename(path), path))
+    for width, height in resolutions:
+        path = os.path.join(tmp_dir, f"sintetica_{width}x{height}.jpg")
+        cv2.imwrite(path, synthetic_image(width, height))
+        inputs.append((f"sintetica_{width}x{height}", path))
+    return inputs
+
+class StageTimer():
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.samples = {stage: [] for stage in STAGES}
+        self.peak_bytes = {stage: 0 for stage in STAGES}
+
+    @contextmanager
+    def __call__(self, stage):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_bytes[stage] = max(self.peak_bytes[stage], peak - base)
+        else:
+            self.samples[stage].append(elapsed)
+
+def run_stages(path, mode, marker_detector, object_detector, timer, output_path):
+    with timer("load"):
+        with open(path, "rb") as f:
+            data = np.frombuffer(f.read(), np.uint8)
+    with timer("decode"):
+        img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    with timer("resize"):
+        img, _ = resize_to_max_dimension(img, MAX_DIMENSION)
+    # Caminho usado pelo lote: lê o arquivo e decodifica já reduzido (JPEG em 1/2, 1/4 ou 1/8). Comparar com a soma de
+    # load, decode e resize; o resto do pipeline segue com a imagem acima.
+    with timer("reduced_decode"):
+        read_image_reduced(path, MAX_DIMENSION)
+    with timer("marker_detection"):
+        corners, ids, _ = marker_detector.detectMarkers(img)
+    pixel_cm_ratio = pixel_cm_ratio_from_corners(corners[0]) if corners else None
+
+    if mode == "trunk":
+        with timer("segmentation"):
+            cleaned = object_detector.segment(img)
+        with timer("contour_filtering"):
+            contours = object_detector.filter_contours(cleaned)
+        with timer("geometry"):
+            objects = measure_trunk_contours(contours, pixel_cm_ratio)
+    elif mode == "pile":
+        with timer("segmentation"):
+            faces = object_detector.segment(img)
+        with timer("contour_filtering"):
+            contours = object_detector.filter_contours(object_detector.split(faces))
+        with timer("geometry"):
+            objects = measure_trunk_contours(contours, pixel_cm_ratio)
+    else:
+        with timer("segmentation"):
+            mask = object_detector.segment(img)
+        with timer("contour_filtering"):
+            contours, _ = object_detector.filter_contours(mask)
+        with timer("geometry"):
+            objects = measure_object_contours(contours, pixel_cm_ratio)
+
+    result = {
+        "marker_found": bool(corners),
+        "marker_id": int(ids[0][0]) if ids is not None else None,
+        "marker_corners": corners[0][0].tolist() if corners else None,
+        "pixel_cm_ratio": pixel_cm_ratio,
+        "objects": objects if pixel_cm_ratio is not None or mode != "objects" else [],
+    }
+    with timer("annotation"):
+        output_img = annotate_image(img, result, mode)
+    with timer("encode_write"):
+        cv2.imwrite(output_path, output_img)
+    return len(objects)
+
+def percentile_summary(samples):
+    if not samples:
+        return None
+    values = np.float64(samples) * 1000
+    summary = {f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["mean_ms"] = float(values.mean())
+    summary["throughput_per_s"] = float(1000 / values.mean()) if values.mean() > 0 else None
+    summary["samples"] = len(samples)
+    return summary
+
+def benchmark_input(path, mode, repeat, warmup, tmp_dir):
+    marker_detector = create_marker_detector(mode)
+    object_detector = create_object_detector(mode)
+    output_path = os.path.join(tmp_dir, "saida.jpg")
+
+    for _ in range(warmup):
+        run_stages(path, mode, marker_detector, object_detector, StageTimer(), output_path)
+
+    timer = StageTimer()
+    totals = []
+    objects = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        objects = run_stages(path, mode, marker_detector, object_detector, timer, output_path)
+        # A leitura reduzida é uma alternativa medida à parte, não uma etapa a mais do pipeline.
+        totals.append(time.perf_counter() - start - timer.samples["reduced_decode"][-1])
+
+    memory_timer = StageTimer(trace_memory=True)
+    tracemalloc.start()
+    try:
+        run_stages(path, mode, marker_detector, object_detector, memory_timer, output_path)
+        _, total_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for stage in STAGES:
+        stages[stage] = percentile_summary(timer.samples[stage])
+        stages[stage]["peak_memory_bytes"] = memory_timer.peak_bytes[stage]
+    return {
+        "objects": objects,
+        "stages": stages,
+        "total": percentile_summary(totals),
+        "peak_memory_bytes": total_peak,
+    }
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def print_report(report):
+    for mode, inputs in report["results"].items():
+        print(f"\n=== MODO: {mode} ===")
+        for name, data in inputs.items():
+            total = data["total"]
+            print(f"\n{name}: {total['mean_ms']:.1f} ms/imagem ({total['throughput_per_s']:.2f} imagens/s), "
+                  f"pico de memória {data['peak_memory_bytes'] / 2**20:.1f} MiB, {data['objects']} objetos")
+            print(f"  {'etapa':<18}{'p50':>9}{'p90':>9}{'p99':>9}{'MiB':>8}")
+            for stage, summary in data["stages"].items():
+                print(f"  {stage:<18}{summary['p50_ms']:>9.2f}{summary['p90_ms']:>9.2f}{summary['p99_ms']:>9.2f}"
+                      f"{summary['peak_memory_bytes'] / 2**20:>8.1f}")
+    if report["max_rss_kib"] is not None:
+        print(f"\nRSS máximo do processo: {report['max_rss_kib'] / 1024:.1f} MiB")
+    else:
+        peak = max(data["peak_memory_bytes"] for inputs in report["results"].values() for data in inputs.values())
+        print(f"\nPico de memória do tracemalloc (RSS indisponível nesta plataforma): {peak / 2**20:.1f} MiB")
+
+def compare_reports(current, baseline, threshold, min_delta_ms):
+    regressions = []
+    print(f"\n=== COMPARAÇÃO COM A LINHA DE BASE ({baseline['environment']['timestamp']}) ===")
+    for mode, inputs in current["results"].items():
+        for name, data in inputs.items():
+            base = baseline["results"].get(mode, {}).get(name)
+            if base is None:
+                continue
+            for stage, summary in list(data["stages"].items()) + [("total", data["total"])]:
+                base_summary = base["stages"].get(stage) if stage != "total" else base["total"]
+                if not base_summary or not base_summary["p50_ms"]:
+                    continue
+                change = summary["p50_ms"] / base_summary["p50_ms"] - 1
+                if change > threshold and summary["p50_ms"] - base_summary["p50_ms"] > min_delta_ms:
+                    regressions.append((mode, name, stage, base_summary["p50_ms"], summary["p50_ms"], change))
+
+    if not regressions:
+        print(f"Nenhuma etapa ficou mais de {threshold:.0%} mais lenta (p50).")
+    for mode, name, stage, before, after, change in regressions:
+        print(f"- REGRESSÃO {mode}/{name}/{stage}: {before:.2f} ms -> {after:.2f} ms (+{change:.0%})")
+    return regressions
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1: {text}")
+    return value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de cada etapa dos pipelines de medição.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["objects", "trunk"])
+    parser.add_argument("--repeat", type=positive_int, default=10, help="Repetições medidas por imagem")
+    parser.add_argument("--warmup", type=int, default=1, help="Repetições de aquecimento descartadas")
+    parser.add_argument("--no-assets", action="store_true", help="Usa apenas as imagens sintéticas")
+    parser.add_argument("--save", help="Salva o resultado em JSON (linha de base)")
+    parser.add_argument("--compare", help="Linha de base JSON para comparação")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Aumento relativo de p50 considerado regressão")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Diferença mínima absoluta de p50 para regressão")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    report = {"environment": environment_info(), "repeat": args.repeat, "results": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = benchmark_inputs(not args.no_assets, tmp_dir=tmp_dir)
+        for mode in args.modes:
+            report["results"][mode] = {}
+            for name, path in inputs:
+                print(f"Medindo {mode}/{name}...")
+                report["results"][mode][name] = benchmark_input(path, mode, args.repeat, args.warmup, tmp_dir)
+    report["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Linha de base salva em: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_reports(report, baseline, args.threshold, args.min_delta_ms):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from object_detector import *
+from measure_core import MAX_DIMENSION, MODES, create_marker_detector, measure_image
+from image_loader import load_image
+from tiling import DEFAULT_TILE_MEMORY_MB
+
+VARIANTS = {
+    "padrao": {},
+    "piramide": {"pyramid": True},
+    "perspectiva": {"perspective": True},
+    "rapido_800": {"max_dimension": 800},
+    "completo": {"max_dimension": None},
+    "blocos": {"tile_memory": DEFAULT_TILE_MEMORY_MB},
+}
+
+def load_ground_truth(dataset_dir):
+    with open(os.path.join(dataset_dir, "ground_truth.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def predicted_diameter(obj, mode):
+    if mode != "objects":
+        return obj["diameter_cm"]
+    if obj["width_cm"] is None:
+        return None
+    return max(obj["width_cm"], obj["height_cm"])
+
+def match_logs(truth_logs, objects, scale, mode):
+    predictions = [((obj["center_x"] / scale, obj["center_y"] / scale), predicted_diameter(obj, mode))
+                   for obj in objects]
+    pairs = []
+    for t_index, log in enumerate(truth_logs):
+        tx, ty = log["center_px"]
+        for p_index, ((px, py), _) in enumerate(predictions):
+            distance = np.hypot(px - tx, py - ty)
+            if distance < log["diameter_major_px"] / 4:
+                pairs.append((distance, t_index, p_index))
+
+    matched = []
+    used_truth, used_pred = set(), set()
+    for _, t_index, p_index in sorted(pairs):
+        if t_index in used_truth or p_index in used_pred:
+            continue
+        used_truth.add(t_index)
+        used_pred.add(p_index)
+        matched.append((truth_logs[t_index]["diameter_major_cm"], predictions[p_index][1]))
+    return matched
+
+def evaluate_variant(dataset_dir, truth, mode, options):
+    marker_detector = create_marker_detector(mode)
+    object_detector = create_object_detector(mode)
+    max_dimension = options.get("max_dimension", MAX_DIMENSION)
+    pyramid = options.get("pyramid", False)
+    perspective = options.get("perspective", False)
+    tile_memory = options.get("tile_memory")
+
+    markers_found = 0
+    scale_errors = []
+    diameter_errors = []
+    true_logs = predicted = matched_logs = 0
+    elapsed = 0.0
+
+    for scene in truth:
+        start = time.perf_counter()
+        img = load_image(os.path.join(dataset_dir, "images", scene["image"]))
+        result, _ = measure_image(img, mode, marker_detector, object_detector, max_dimension, pyramid=pyramid,
+                                  perspective=perspective, tile_memory=tile_memory)
+        elapsed += time.perf_counter() - start
+
+        true_logs += len(scene["logs"])
+        predicted += len(result["objects"])
+        if result["pixel_cm_ratio"] is None:
+            continue
+        markers_found += 1
+        ratio_full = result["pixel_cm_ratio"] / result["scale"]
+        scale_errors.append(abs(ratio_full / scene["pixel_cm_ratio"] - 1))
+
+        matches = match_logs(scene["logs"], result["objects"], result["scale"], mode)
+        matched_logs += len(matches)
+        diameter_errors.extend((pred - true, true) for true, pred in matches if pred is not None)
+
+    errors = np.float64(diameter_errors).reshape(-1, 2)
+    images = len(truth)
+    return {
+        "images": images,
+        "marker_detection_rate": markers_found / images if images else 0.0,
+        "scale_error_pct": float(np.mean(scale_errors) * 100) if scale_errors else None,
+        "recall": matched_logs / true_logs if true_logs else None,
+        "precision": matched_logs / predicted if predicted else None,
+        "diameter_mae_cm": float(np.abs(errors[:, 0]).mean()) if len(errors) else None,
+        "diameter_bias_cm": float(errors[:, 0].mean()) if len(errors) else None,
+        "diameter_mape_pct": float((np.abs(errors[:, 0]) / errors[:, 1]).mean() * 100) if len(errors) else None,
+        "images_per_s": images / elapsed if elapsed > 0 else None,
+    }
+
+def format_value(value, fmt):
+    return "-" if value is None else fmt.format(value)
+
+def print_report(report):
+    for mode, variants in report.items():
+        print(f"\n=== MODO: {mode} ===")
+        print(f"  {'variante':<14}{'marcador':>9}{'escala%':>9}{'recall':>8}{'precisão':>10}"
+              f"{'EMA cm':>8}{'EPAM%':>8}{'img/s':>8}")
+        for name, m in variants.items():
+            print(f"  {name:<14}{m['marker_detection_rate']:>9.0%}{format_value(m['scale_error_pct'], '{:.2f}'):>9}"
+                  f"{format_value(m['recall'], '{:.0%}'):>8}{format_value(m['precision'], '{:.0%}'):>10}"
+                  f"{format_value(m['diameter_mae_cm'], '{:.2f}'):>8}{format_value(m['diameter_mape_pct'], '{:.1f}'):>8}"
+                  f"{format_value(m['images_per_s'], '{:.2f}'):>8}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Avalia precisão e velocidade das medições num conjunto sintético.")
+    parser.add_argument("dataset_dir", help="Diretório gerado por generate_dataset.py")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["trunk"])
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--output", help="Salva as métricas em JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    truth = load_ground_truth(args.dataset_dir)
+
+    report = {}
+    for mode in args.modes:
+        report[mode] = {}
+        for name in args.variants:
+            print(f"Avaliando {mode}/{name}...")
+            report[mode][name] = evaluate_variant(args.dataset_dir, truth, mode, VARIANTS[name])
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Métricas salvas em: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
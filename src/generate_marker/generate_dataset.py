@@ -0,0 +1,208 @@
+import argparse
+import json
+import math
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from generate_marker import generate_marker
+
+MARKER_SIZE_CM = 23.5
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def rotation_matrix(tilt_x, tilt_y, roll):
+    ax, ay, az = np.deg2rad([tilt_x, tilt_y, roll])
+    rx = np.array([[1, 0, 0], [0, math.cos(ax), -math.sin(ax)], [0, math.sin(ax), math.cos(ax)]])
+    ry = np.array([[math.cos(ay), 0, math.sin(ay)], [0, 1, 0], [-math.sin(ay), 0, math.cos(ay)]])
+    rz = np.array([[math.cos(az), -math.sin(az), 0], [math.sin(az), math.cos(az), 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+def plane_to_image_homography(image_size, scene_cm, tilt_x, tilt_y, roll, distance_cm=300.0):
+    width, height = image_size
+    focal = width * distance_cm / (scene_cm[0] * 1.15)
+    camera = np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]])
+    rotation = rotation_matrix(tilt_x, tilt_y, roll)
+    translation = np.array([0, 0, distance_cm])
+    homography = camera @ np.column_stack([rotation[:, 0], rotation[:, 1], translation])
+    return homography / homography[2, 2]
+
+def project(homography, points):
+    return cv2.perspectiveTransform(np.float64(points).reshape(-1, 1, 2), homography).reshape(-1, 2)
+
+def render_background(rng, size):
+    width, height = size
+    base = rng.uniform(150, 200)
+    noise = rng.normal(0, 1, (height // 8 + 1, width // 8 + 1)).astype(np.float32)
+    noise = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    fine = rng.normal(0, 6, (height, width)).astype(np.float32)
+    gray = base + 18 * noise + fine
+    tint = np.float32([0.85, 0.95, 1.0])
+    return np.clip(gray[:, :, None] * tint, 0, 255).astype(np.uint8)
+
+def draw_log_end(canvas, rng, center_px, axes_px, angle):
+    wood = tuple(float(c) for c in rng.uniform([60, 110, 150], [90, 150, 200]))
+    bark = tuple(float(c) for c in rng.uniform([20, 30, 40], [45, 60, 75]))
+    center = (int(round(center_px[0])), int(round(center_px[1])))
+    axes = (int(round(axes_px[0])), int(round(axes_px[1])))
+    cv2.ellipse(canvas, center, axes, angle, 0, 360, bark, -1, cv2.LINE_AA)
+    inner = (max(1, int(axes[0] * 0.9)), max(1, int(axes[1] * 0.9)))
+    cv2.ellipse(canvas, center, inner, angle, 0, 360, wood, -1, cv2.LINE_AA)
+    for ring in np.linspace(0.15, 0.8, int(rng.integers(3, 8))):
+        ring_axes = (max(1, int(inner[0] * ring)), max(1, int(inner[1] * ring)))
+        shade = tuple(c * 0.85 for c in wood)
+        cv2.ellipse(canvas, center, ring_axes, angle, 0, 360, shade, 1, cv2.LINE_AA)
+
+def place_logs(rng, scene_cm, marker_box_cm, count, diameter_range, ellipse_ratio, min_gap_cm=3.0):
+    logs = []
+    attempts = 0
+    while len(logs) < count and attempts < count * 50:
+        attempts += 1
+        major = rng.uniform(*diameter_range)
+        minor = major * rng.uniform(ellipse_ratio, 1.0)
+        radius = major / 2
+        x = rng.uniform(radius + 2, scene_cm[0] - radius - 2)
+        y = rng.uniform(radius + 2, scene_cm[1] - radius - 2)
+
+        mx0, my0, mx1, my1 = marker_box_cm
+        if mx0 - radius - 2 < x < mx1 + radius + 2 and my0 - radius - 2 < y < my1 + radius + 2:
+            continue
+        if any(math.hypot(x - other["center_cm"][0], y - other["center_cm"][1]) < radius + other["diameter_major_cm"] / 2 + min_gap_cm
+               for other in logs):
+            continue
+        logs.append({
+            "center_cm": [x, y],
+            "diameter_major_cm": major,
+            "diameter_minor_cm": minor,
+            "angle": float(rng.uniform(0, 180)),
+        })
+    return logs
+
+def apply_lighting(img, rng, gradient, noise_sigma, blur, jpeg_quality):
+    height, width = img.shape[:2]
+    direction = rng.uniform(0, 2 * math.pi)
+    xs = np.linspace(-1, 1, width, dtype=np.float32)[None, :]
+    ys = np.linspace(-1, 1, height, dtype=np.float32)[:, None]
+    ramp = 1 + gradient * (math.cos(direction) * xs + math.sin(direction) * ys) / 2
+    vignette = 1 - 0.15 * gradient * (xs * xs + ys * ys)
+    lit = img.astype(np.float32) * (ramp * vignette)[:, :, None]
+    if noise_sigma > 0:
+        lit += rng.normal(0, noise_sigma, lit.shape).astype(np.float32)
+    lit = np.clip(lit, 0, 255).astype(np.uint8)
+    if blur > 0:
+        lit = cv2.GaussianBlur(lit, (0, 0), blur)
+    ok, encoded = cv2.imencode(".jpg", lit, [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+def generate_scene(rng, index, args):
+    scene_cm = (args.scene_width_cm, args.scene_height_cm)
+    ppc = args.render_px_per_cm
+    canvas_size = (int(scene_cm[0] * ppc), int(scene_cm[1] * ppc))
+    canvas = render_background(rng, canvas_size)
+
+    marker_px = int(round(MARKER_SIZE_CM * ppc))
+    quiet_zone = marker_px // 6
+    mx = rng.uniform(8, scene_cm[0] - MARKER_SIZE_CM - 8)
+    my = rng.uniform(8, scene_cm[1] - MARKER_SIZE_CM - 8)
+    marker = generate_marker(args.marker_id, marker_px)
+    marker = cv2.copyMakeBorder(marker, quiet_zone, quiet_zone, quiet_zone, quiet_zone, cv2.BORDER_CONSTANT, value=255)
+    x0, y0 = int(round(mx * ppc)) - quiet_zone, int(round(my * ppc)) - quiet_zone
+    canvas[y0:y0 + marker.shape[0], x0:x0 + marker.shape[1]] = marker[:, :, None]
+    mx, my = (x0 + quiet_zone) / ppc, (y0 + quiet_zone) / ppc
+    marker_box_cm = (mx - quiet_zone / ppc, my - quiet_zone / ppc,
+                     mx + MARKER_SIZE_CM + quiet_zone / ppc, my + MARKER_SIZE_CM + quiet_zone / ppc)
+
+    count = int(rng.integers(args.min_logs, args.max_logs + 1))
+    logs = place_logs(rng, scene_cm, marker_box_cm, count, (args.min_diameter_cm, args.max_diameter_cm),
+                      args.ellipse_ratio, args.min_gap_cm)
+    for log in logs:
+        draw_log_end(canvas, rng, np.float64(log["center_cm"]) * ppc,
+                     (log["diameter_major_cm"] / 2 * ppc, log["diameter_minor_cm"] / 2 * ppc), log["angle"])
+
+    tilt_x = float(rng.uniform(-args.max_tilt, args.max_tilt))
+    tilt_y = float(rng.uniform(-args.max_tilt, args.max_tilt))
+    roll = float(rng.uniform(-args.max_roll, args.max_roll))
+    plane_homography = plane_to_image_homography(args.size, scene_cm, tilt_x, tilt_y, roll)
+    centered = np.array([[1, 0, -scene_cm[0] / 2], [0, 1, -scene_cm[1] / 2], [0, 0, 1]])
+    scene_to_image = plane_homography @ centered
+    canvas_to_image = scene_to_image @ np.diag([1 / ppc, 1 / ppc, 1])
+
+    img = cv2.warpPerspective(canvas, canvas_to_image, args.size, flags=cv2.INTER_AREA,
+                              borderMode=cv2.BORDER_REPLICATE)
+    gradient = float(rng.uniform(0, args.max_lighting_gradient))
+    noise_sigma = float(rng.uniform(0, args.max_noise))
+    img = apply_lighting(img, rng, gradient, noise_sigma, args.blur, args.jpeg_quality)
+
+    marker_corners_cm = [[mx, my], [mx + MARKER_SIZE_CM, my], [mx + MARKER_SIZE_CM, my + MARKER_SIZE_CM], [mx, my + MARKER_SIZE_CM]]
+    marker_corners = project(scene_to_image, marker_corners_cm)
+    perimeter = float(cv2.arcLength(np.float32(marker_corners), True))
+
+    for log in logs:
+        log["center_px"] = project(scene_to_image, [log["center_cm"]])[0].tolist()
+        log["diameter_major_px"] = log["diameter_major_cm"] * perimeter / (4 * MARKER_SIZE_CM)
+
+    name = f"cena_{index:05d}.jpg"
+    truth = {
+        "image": name,
+        "width": args.size[0],
+        "height": args.size[1],
+        "marker_id": args.marker_id,
+        "marker_size_cm": MARKER_SIZE_CM,
+        "marker_corners": marker_corners.tolist(),
+        "pixel_cm_ratio": perimeter / (4 * MARKER_SIZE_CM),
+        "scene_to_image": scene_to_image.tolist(),
+        "pose": {"tilt_x": tilt_x, "tilt_y": tilt_y, "roll": roll},
+        "lighting_gradient": gradient,
+        "noise_sigma": noise_sigma,
+        "logs": logs,
+    }
+    return name, img, truth
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera cenas sintéticas com marcador ArUco e toras de diâmetro conhecido.")
+    parser.add_argument("output_dir", help="Diretório de saída")
+    parser.add_argument("--count", type=int, default=100, help="Número de cenas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=parse_size, default=(1600, 1200), help="Resolução das imagens (LxA)")
+    parser.add_argument("--marker-id", type=int, default=0)
+    parser.add_argument("--scene-width-cm", type=float, default=200.0)
+    parser.add_argument("--scene-height-cm", type=float, default=150.0)
+    parser.add_argument("--render-px-per-cm", type=float, default=12.0, help="Resolução da cena antes da projeção")
+    parser.add_argument("--min-logs", type=int, default=1)
+    parser.add_argument("--max-logs", type=int, default=6)
+    parser.add_argument("--min-diameter-cm", type=float, default=15.0)
+    parser.add_argument("--max-diameter-cm", type=float, default=45.0)
+    parser.add_argument("--min-gap-cm", type=float, default=3.0,
+                        help="Distância mínima entre toras (0 permite toras encostadas, como numa pilha)")
+    parser.add_argument("--ellipse-ratio", type=float, default=0.85, help="Menor razão eixo menor/maior das toras")
+    parser.add_argument("--max-tilt", type=float, default=15.0, help="Inclinação máxima da câmera (graus)")
+    parser.add_argument("--max-roll", type=float, default=10.0, help="Rotação máxima no plano (graus)")
+    parser.add_argument("--max-lighting-gradient", type=float, default=0.5)
+    parser.add_argument("--max-noise", type=float, default=8.0, help="Desvio padrão máximo do ruído gaussiano")
+    parser.add_argument("--blur", type=float, default=0.6, help="Sigma do desfoque")
+    parser.add_argument("--jpeg-quality", type=int, default=90)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    images_dir = os.path.join(args.output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    rng = np.random.default_rng(args.seed)
+    truth_path = os.path.join(args.output_dir, "ground_truth.jsonl")
+    with open(truth_path, "w", encoding="utf-8") as f:
+        for index in range(args.count):
+            name, img, truth = generate_scene(rng, index, args)
+            cv2.imwrite(os.path.join(images_dir, name), img)
+            f.write(json.dumps(truth) + "\n")
+
+    print(f"{args.count} cenas geradas em: {images_dir}")
+    print(f"Gabarito salvo em: {truth_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
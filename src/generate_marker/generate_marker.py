@@ -1,8 +1,23 @@
+import argparse
+import sys
+
 import cv2
 
 aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
 
-marker_size = 600  
-marker_image = cv2.aruco.generateImageMarker(aruco_dict, 0, marker_size)
+def generate_marker(marker_id=0, marker_size=600):
+    return cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera a imagem de um marcador ArUco DICT_5X5_50 para impressão.")
+    parser.add_argument("--id", type=int, default=0, help="ID do marcador (0 a 49)")
+    parser.add_argument("--size", type=int, default=600, help="Lado da imagem em pixels")
+    parser.add_argument("--output", default="aruco_marker.jpg", help="Arquivo de saída")
+    args = parser.parse_args(argv)
+
+    cv2.imwrite(args.output, generate_marker(args.id, args.size))
+    print(f"Marcador {args.id} salvo em: {args.output}")
+    return 0
 
-cv2.imwrite("aruco_marker.jpg", marker_image)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,58 @@
+import argparse
+import sys
+import time
+
 import cv2
 
-def list_cameras():
-    for i in range(5):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            ret, frame = cap.read()
-            if ret:
-                print(f"Câmera {i} está disponível")
-                cv2.imshow(f"Camera {i}", frame)
-                cv2.waitKey(2000)  
-                cv2.destroyWindow(f"Camera {i}")
-            cap.release()
+from camera_discovery import DEFAULT_CAMERA_CACHE, MAX_INDEX, PROBE_TIMEOUT_S, discover_cameras
+
+def show_previews(cameras):
+    for camera in cameras:
+        if not camera["available"]:
+            continue
+        cap = cv2.VideoCapture(camera["source"])
+        ret, frame = cap.read()
+        if ret:
+            cv2.imshow(f"Camera {camera['source']}", frame)
+            cv2.waitKey(2000)
+            cv2.destroyWindow(f"Camera {camera['source']}")
+        cap.release()
+    cv2.destroyAllWindows()
+
+def list_cameras(args):
+    start = time.perf_counter()
+    cameras, cached = discover_cameras(args.cache, args.max_index, args.timeout, refresh=args.refresh)
+    elapsed = time.perf_counter() - start
+
+    for camera in cameras:
+        if camera["available"]:
+            fps = f"{camera['fps']:.0f} fps" if camera["fps"] else "fps desconhecido"
+            supported = ", ".join(str(f) for f in camera.get("supported_fps") or [])
+            print(f"Câmera {camera['source']} está disponível: {camera['width']}x{camera['height']}, {fps}, "
+                  f"backend {camera['backend']}" + (f" (aceita {supported} fps)" if supported else ""))
         else:
-            print(f"Câmera {i} não está disponível")
+            reason = f" ({camera['error']})" if camera.get("error") else ""
+            print(f"Câmera {camera['source']} não está disponível{reason}")
+    if not cameras:
+        print("Nenhum dispositivo de vídeo encontrado")
+    print(f"Descoberta em {elapsed * 1000:.0f} ms" + (" (cache)" if cached else ""))
+
+    if args.preview:
+        show_previews(cameras)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descobre as câmeras disponíveis sem abrir janelas.")
+    parser.add_argument("--refresh", action="store_true", help="Ignora o cache e sonda os dispositivos de novo")
+    parser.add_argument("--cache", default=DEFAULT_CAMERA_CACHE, help="Arquivo do cache de câmeras")
+    parser.add_argument("--max-index", type=int, default=MAX_INDEX,
+                        help="Índices sondados quando não há /dev/video* (Windows, macOS)")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT_S, help="Tempo máximo da sondagem (s)")
+    parser.add_argument("--preview", action="store_true", help="Mostra um quadro de cada câmera por 2 s")
+    args = parser.parse_args(argv)
+
+    print("Procurando câmeras disponíveis...")
+    list_cameras(args)
+    return 0
 
-print("Procurando câmeras disponíveis...")
-list_cameras()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    sys.exit(main())
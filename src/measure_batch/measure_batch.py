@@ -0,0 +1,236 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+from measure_core import MAX_DIMENSION, MODES
+from calibration_cache import DEFAULT_CACHE_FILE
+from results_store import ResultStore, is_store_path
+from result_cache import DEFAULT_RESULT_CACHE, MAX_ENTRIES
+from image_loader import MAPPED_EXTENSIONS
+from tiling import DEFAULT_TILE_MEMORY_MB, parse_tile_memory
+from marker_set import marker_set_arg
+import instrumentation
+from instrumentation import span
+from station_profile import load_profile, resolve_max_dimension
+from parallel_runner import ParallelRunner, clear_result_cache, measure_serial
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp") + MAPPED_EXTENSIONS
+
+CSV_FIELDS = [
+    "image", "error", "marker_found", "marker_id", "pixel_cm_ratio", "calibration_source", "scale",
+    "object_index", "center_x", "center_y", "width_cm", "height_cm", "diameter_cm", "area_px",
+]
+
+def collect_images(inputs, recursive=False):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for root, _, files in os.walk(item):
+                    paths.extend(os.path.join(root, name) for name in files)
+            else:
+                paths.extend(os.path.join(item, name) for name in os.listdir(item))
+        else:
+            paths.extend(glob.glob(item, recursive=True))
+    return sorted(p for p in set(paths) if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+
+class ResultWriter():
+    def __init__(self, output_path, fields=CSV_FIELDS, station=None, mode=None):
+        self.output_path = output_path
+        self.fields = fields
+        self.base_fields = fields[:fields.index("object_index")]
+        self.store = ResultStore(output_path, station, mode) if is_store_path(output_path) else None
+        if self.store:
+            return
+        self.file = open(output_path, "w", newline="", encoding="utf-8")
+        self.jsonl = output_path.lower().endswith(".jsonl")
+        if not self.jsonl:
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.store:
+            self.store.write(record)
+            return
+        if self.jsonl:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+
+        base = {key: record.get(key) for key in self.base_fields}
+        if not record.get("objects"):
+            self.csv_writer.writerow(base)
+            return
+        for i, obj in enumerate(record["objects"]):
+            row = dict(base, object_index=i)
+            row.update(obj)
+            self.csv_writer.writerow(row)
+
+    def close(self):
+        if self.store:
+            self.store.close()
+        else:
+            self.file.close()
+
+class BatchStats():
+    def __init__(self):
+        self.total = 0
+        self.failed = 0
+        self.no_marker = 0
+        self.from_cache = 0
+        self.from_result_cache = 0
+        self.result_cache_misses = 0
+        self.objects = 0
+        self.cross_section_cm2 = 0.0
+        self.volume_m3 = 0.0
+
+    def add(self, record):
+        self.total += 1
+        if "width" not in record:
+            self.failed += 1
+        elif record["pixel_cm_ratio"] is None:
+            self.no_marker += 1
+        elif not record["marker_found"]:
+            self.from_cache += 1
+        if record.get("result_cache"):
+            self.from_result_cache += 1
+        elif record.get("result_cache") is False:
+            self.result_cache_misses += 1
+        self.objects += len(record.get("objects") or [])
+        totals = record.get("totals") or {}
+        self.cross_section_cm2 += totals.get("cross_section_cm2") or 0.0
+        self.volume_m3 += totals.get("volume_m3") or 0.0
+
+    def print_summary(self, elapsed):
+        print("\n=== RESUMO DO LOTE ===")
+        print(f"- Imagens processadas: {self.total}")
+        print(f"- Falhas de leitura/processamento: {self.failed}")
+        print(f"- Imagens sem marcador: {self.no_marker}")
+        print(f"- Imagens medidas com a calibração em cache: {self.from_cache}")
+        if self.from_result_cache or self.result_cache_misses:
+            print(f"- Cache de resultados: {self.from_result_cache} imagens reaproveitadas, "
+                  f"{self.result_cache_misses} medidas de novo")
+        print(f"- Objetos medidos: {self.objects}")
+        if self.cross_section_cm2:
+            print(f"- Área total das seções das toras: {self.cross_section_cm2 / 10000:.2f} m²")
+        if self.volume_m3:
+            print(f"- Volume estimado: {self.volume_m3:.2f} m³")
+        print(f"- Tempo total: {elapsed:.2f} s")
+        if elapsed > 0 and self.total:
+            print(f"- Vazão: {self.total / elapsed:.2f} imagens/s")
+            print(f"- Tempo médio por imagem: {1000 * elapsed / self.total:.1f} ms")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Medição em lote, sem janelas, de diretórios de fotos de toras.")
+    parser.add_argument("inputs", nargs="+", help="Diretórios, arquivos ou padrões glob de imagens")
+    parser.add_argument("--mode", choices=MODES, default="objects", help="Pipeline de medição")
+    parser.add_argument("--output", default="medidas.csv", help="Arquivo de saída (.csv, .jsonl ou banco SQLite .db)")
+    parser.add_argument("--annotated-dir", help="Diretório para salvar as imagens anotadas")
+    parser.add_argument("--max-dimension", type=int,
+                        help=f"Dimensão máxima antes da medição (0 desativa; padrão: a do perfil ou {MAX_DIMENSION})")
+    parser.add_argument("--profile", help="Perfil JSON da estação gerado por tune_station.py (ArUco e segmentação)")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Detecta na imagem reduzida e refina cantos e contornos na resolução original")
+    parser.add_argument("--tiled", nargs="?", type=parse_tile_memory, const=DEFAULT_TILE_MEMORY_MB, metavar="MB",
+                        help="Segmenta na resolução de --max-dimension (0 = original) em blocos que cabem em MB de "
+                             f"memória (padrão {DEFAULT_TILE_MEMORY_MB}); use com imagens decodificadas em .npy")
+    parser.add_argument("--perspective", action="store_true",
+                        help="Mede no plano do marcador pela homografia, corrigindo fotos oblíquas")
+    parser.add_argument("--markers", type=marker_set_arg,
+                        help="Vários marcadores: IDs e tamanhos (ex.: 0,1,2:15 ou *:23.5) ou arquivo JSON do quadro")
+    parser.add_argument("--log-length", type=float,
+                        help="Comprimento das toras em metros, para estimar o volume no modo pile")
+    parser.add_argument("--recursive", action="store_true", help="Percorre subdiretórios")
+    parser.add_argument("--station", help="ID da estação; ativa o cache de calibração da escala")
+    parser.add_argument("--calibration-cache", default=DEFAULT_CACHE_FILE, help="Arquivo do cache de calibração")
+    parser.add_argument("--verify-every", type=int, default=100, help="Reverifica o marcador a cada N imagens")
+    parser.add_argument("--result-cache", nargs="?", const=DEFAULT_RESULT_CACHE,
+                        help="Reaproveita resultados de imagens e parâmetros já medidos (banco SQLite)")
+    parser.add_argument("--result-cache-size", type=int, default=MAX_ENTRIES,
+                        help="Número máximo de resultados no cache; os usados há mais tempo saem primeiro")
+    parser.add_argument("--result-cache-clear", action="store_true",
+                        help="Remove do cache os resultados de outros parâmetros, modos ou versões antes de começar")
+    parser.add_argument("--metrics",
+                        help="Mede o tempo de cada etapa e grava em JSON ou no formato texto do Prometheus (.prom)")
+    parser.add_argument("--workers", type=int, default=1, help="Processos de medição (0 usa todos os núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=8, help="Imagens enviadas por vez a cada processo")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        profile = load_profile(args.profile, args.mode) if args.profile else None
+    except (OSError, ValueError) as e:
+        print(f"Erro: não foi possível carregar o perfil: {e}")
+        return 1
+
+    paths = collect_images(args.inputs, args.recursive)
+    if not paths:
+        print("Nenhuma imagem encontrada nas entradas informadas.")
+        return 1
+    print(f"Encontradas {len(paths)} imagens.")
+
+    annotated_root = None
+    if args.annotated_dir:
+        os.makedirs(args.annotated_dir, exist_ok=True)
+        # Pasta comum das imagens: a estrutura abaixo dela se repete nas anotadas (fotos de mesmo nome em subpastas).
+        annotated_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+
+    options = {
+        "mode": args.mode,
+        "max_dimension": resolve_max_dimension(args.max_dimension, profile),
+        "annotated_dir": args.annotated_dir,
+        "annotated_root": annotated_root,
+        "pyramid": args.pyramid,
+        "station": args.station,
+        "calibration_cache": args.calibration_cache,
+        "verify_every": args.verify_every,
+        "log_length": args.log_length,
+        "perspective": args.perspective,
+        "markers": args.markers,
+        "result_cache": args.result_cache,
+        "result_cache_size": args.result_cache_size,
+        "metrics": bool(args.metrics) or instrumentation.METRICS.enabled,
+        "profile": profile,
+        "tile_memory": args.tiled,
+    }
+    if args.metrics:
+        instrumentation.enable()
+    if args.result_cache and args.station:
+        print("Aviso: o cache de resultados é ignorado com --station.")
+    elif args.result_cache and args.result_cache_clear:
+        print(f"Removidos {clear_result_cache(options)} resultados antigos do cache de resultados.")
+
+    runner = None
+    if args.workers != 1:
+        runner = ParallelRunner(options, args.workers, args.chunk_size)
+        print(f"Usando {runner.workers} processos (lotes de {runner.chunk_size} imagens).")
+        records = runner.run(paths)
+    else:
+        records = measure_serial(options, paths)
+
+    writer = ResultWriter(args.output, station=args.station, mode=args.mode)
+    stats = BatchStats()
+    start = time.perf_counter()
+    try:
+        for record in records:
+            with span("write_results"):
+                writer.write(record)
+            stats.add(record)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    stats.print_summary(elapsed)
+    if runner and runner.crashes:
+        print(f"- Reinícios do pool após falha de processo: {runner.crashes}")
+    print(f"Resultados salvos em: {args.output}")
+    if args.metrics:
+        instrumentation.write_report(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import argparse
+import sys
+import time
+
+from measure_core import MAX_DIMENSION, MODES
+from calibration_cache import DEFAULT_CACHE_FILE
+from marker_set import marker_set_arg
+from video_source import VideoSource, measure_video
+from measure_batch import CSV_FIELDS, BatchStats, ResultWriter
+from parallel_runner import create_measure_state
+import instrumentation
+from instrumentation import span
+from station_profile import load_profile, resolve_max_dimension
+
+VIDEO_CSV_FIELDS = ["source", "frame_index", "timestamp_s"] + CSV_FIELDS[1:]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Medição de vídeos, câmeras ou streams de rede, quadro a quadro.")
+    parser.add_argument("source", help="Índice da câmera, arquivo de vídeo ou URL (rtsp://, http://)")
+    parser.add_argument("--mode", choices=MODES, default="objects", help="Pipeline de medição")
+    parser.add_argument("--output", default="medidas_video.csv", help="Arquivo de saída (.csv, .jsonl ou banco SQLite .db)")
+    parser.add_argument("--stride", type=int, default=1, help="Mede um a cada N quadros")
+    parser.add_argument("--every", type=float, help="Mede no máximo um quadro a cada N segundos de vídeo")
+    parser.add_argument("--keyframes", action="store_true", help="Decodifica apenas os quadros-chave (arquivos)")
+    parser.add_argument("--start", type=float, default=0.0, help="Início em segundos")
+    parser.add_argument("--end", type=float, help="Fim em segundos")
+    parser.add_argument("--max-dimension", type=int,
+                        help=f"Dimensão máxima antes da medição (0 desativa; padrão: a do perfil ou {MAX_DIMENSION})")
+    parser.add_argument("--profile", help="Perfil JSON da estação gerado por tune_station.py (ArUco e segmentação)")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Detecta na imagem reduzida e refina cantos e contornos na resolução original")
+    parser.add_argument("--perspective", action="store_true",
+                        help="Mede no plano do marcador pela homografia, corrigindo fotos oblíquas")
+    parser.add_argument("--markers", type=marker_set_arg,
+                        help="Vários marcadores: IDs e tamanhos (ex.: 0,1,2:15 ou *:23.5) ou arquivo JSON do quadro")
+    parser.add_argument("--station", help="ID da estação; ativa o cache de calibração da escala")
+    parser.add_argument("--calibration-cache", default=DEFAULT_CACHE_FILE, help="Arquivo do cache de calibração")
+    parser.add_argument("--verify-every", type=int, default=100, help="Reverifica o marcador a cada N quadros")
+    parser.add_argument("--log-length", type=float,
+                        help="Comprimento das toras em metros, para estimar o volume no modo pile")
+    parser.add_argument("--metrics",
+                        help="Mede o tempo de cada etapa e grava em JSON ou no formato texto do Prometheus (.prom)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        profile = load_profile(args.profile, args.mode) if args.profile else None
+    except (OSError, ValueError) as e:
+        print(f"Erro: não foi possível carregar o perfil: {e}")
+        return 1
+    args.max_dimension = resolve_max_dimension(args.max_dimension, profile)
+
+    state = create_measure_state({
+        "mode": args.mode,
+        "max_dimension": args.max_dimension,
+        "pyramid": args.pyramid,
+        "station": args.station,
+        "calibration_cache": args.calibration_cache,
+        "verify_every": args.verify_every,
+        "log_length": args.log_length,
+        "perspective": args.perspective,
+        "markers": args.markers,
+        "profile": profile,
+    })
+    try:
+        video = VideoSource(args.source, args.stride, args.every, args.keyframes, args.start, args.end)
+    except (IOError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+
+    writer = ResultWriter(args.output, VIDEO_CSV_FIELDS, args.station, args.mode)
+    stats = BatchStats()
+    last_timestamp = 0.0
+    start = time.perf_counter()
+    try:
+        with video:
+            records = measure_video(video, args.mode, state["marker_detector"], state["object_detector"],
+                                    args.max_dimension, state["calibrator"], args.pyramid, args.log_length,
+                                    args.perspective, state["marker_set"])
+            for record in records:
+                with span("write_results"):
+                    writer.write(record)
+                stats.add(record)
+                last_timestamp = record["timestamp_s"]
+    except KeyboardInterrupt:
+        print("\nInterrompido; os quadros já medidos foram salvos.")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    stats.print_summary(elapsed)
+    print(f"- Leitura: {video.summary()}")
+    covered = last_timestamp - args.start
+    if elapsed > 0 and covered > 0:
+        print(f"- Vídeo percorrido: {covered:.1f} s em {elapsed:.1f} s ({covered / elapsed:.1f}x o tempo real)")
+    print(f"Resultados salvos em: {args.output}")
+    if args.metrics:
+        instrumentation.write_report(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import cv2
+
+from object_detector import *
+from measure_core import MAX_DIMENSION, annotated_path, measure_image_file
+from calibration_cache import DEFAULT_CACHE_FILE, CalibrationCache, StationCalibrator
+from result_cache import MAX_ENTRIES, ResultCache, pipeline_fingerprint
+from marker_set import parse_marker_set
+from station_profile import profile_detectors
+import instrumentation
+from instrumentation import span
+
+DEFAULT_OPTIONS = {
+    "mode": "objects",
+    "max_dimension": MAX_DIMENSION,
+    "annotated_dir": None,
+    "annotated_root": None,
+    "pyramid": False,
+    "station": None,
+    "calibration_cache": DEFAULT_CACHE_FILE,
+    "verify_every": 100,
+    "log_length": None,
+    "perspective": False,
+    "markers": None,
+    "result_cache": None,
+    "result_cache_size": MAX_ENTRIES,
+    "metrics": False,
+    "profile": None,
+    "tile_memory": None,
+}
+
+_worker_state = {}
+
+def create_measure_state(options):
+    options = dict(DEFAULT_OPTIONS, **options)
+    marker_detector, object_detector = profile_detectors(options["mode"], options["profile"])
+    calibrator = None
+    if options["station"]:
+        calibrator = StationCalibrator(CalibrationCache(options["calibration_cache"]), options["station"],
+                                       marker_detector, options["verify_every"])
+    marker_set = parse_marker_set(options["markers"])
+    result_cache = None
+    # Com --station a medição depende também da calibração guardada, que o hash da imagem não cobre.
+    if options["result_cache"] and calibrator is None:
+        result_cache = ResultCache(options["result_cache"],
+                                   pipeline_fingerprint(options, marker_detector, object_detector, marker_set),
+                                   options["result_cache_size"])
+    return {
+        "options": options,
+        "marker_detector": marker_detector,
+        "object_detector": object_detector,
+        "calibrator": calibrator,
+        "marker_set": marker_set,
+        "result_cache": result_cache,
+    }
+
+def clear_result_cache(options):
+    # Roda uma vez no processo principal, antes de os workers abrirem o cache.
+    options = dict(DEFAULT_OPTIONS, **options)
+    marker_detector, object_detector = profile_detectors(options["mode"], options["profile"])
+    fingerprint = pipeline_fingerprint(options, marker_detector, object_detector, parse_marker_set(options["markers"]))
+    result_cache = ResultCache(options["result_cache"], fingerprint, options["result_cache_size"])
+    try:
+        return result_cache.invalidate()
+    finally:
+        result_cache.close()
+
+def close_measure_state(state):
+    # Fecha o cache de resultados, o que também aplica a eviction pendente.
+    result_cache = state.get("result_cache")
+    if result_cache is not None:
+        result_cache.close()
+        state["result_cache"] = None
+
+def measure_path(state, path):
+    options = state["options"]
+    result_cache = state.get("result_cache")
+    content_hash = None
+    if result_cache is not None:
+        start = time.perf_counter()
+        with span("result_cache"):
+            try:
+                content_hash = result_cache.content_hash(path)
+            except OSError:
+                content_hash = None
+            record = result_cache.get(content_hash) if content_hash else None
+        annotated_dir = options["annotated_dir"]
+        if record is not None and annotated_dir:
+            if not os.path.exists(annotated_path(annotated_dir, path, options["annotated_root"])):
+                record = None
+        if record is not None:
+            record["image"] = path
+            record["result_cache"] = True
+            record["elapsed_ms"] = (time.perf_counter() - start) * 1000
+            instrumentation.count("result_cache_hits")
+            return record
+
+    record = measure_image_file(path, options["mode"], state["marker_detector"], state["object_detector"],
+                                options["max_dimension"], options["annotated_dir"], state["calibrator"],
+                                options["pyramid"], options["log_length"], options["perspective"], state["marker_set"],
+                                options["tile_memory"], options["annotated_root"])
+    # Imagens ilegíveis e erros do OpenCV podem ser transitórios (arquivo ainda sendo copiado); não vão para o cache.
+    if content_hash and record.get("error") in (None, "marcador_nao_encontrado"):
+        result_cache.put(content_hash, record)
+    if result_cache is not None:
+        record["result_cache"] = False
+        instrumentation.count("result_cache_misses")
+    return record
+
+def measure_serial(options, paths):
+    state = create_measure_state(options)
+    try:
+        for path in paths:
+            yield measure_path(state, path)
+    finally:
+        close_measure_state(state)
+
+def _init_worker(options):
+    from multiprocessing.util import Finalize
+    cv2.setNumThreads(1)
+    instrumentation.enable(options.get("metrics", False))
+    _worker_state.update(create_measure_state(options))
+    # O pool não avisa o worker quando é encerrado; o finalizador roda na saída normal do processo.
+    Finalize(None, close_measure_state, args=(_worker_state,), exitpriority=10)
+
+def process_chunk(paths):
+    records = []
+    for path in paths:
+        try:
+            record = measure_path(_worker_state, path)
+        except Exception as e:
+            record = {"image": path, "error": f"erro: {e}"}
+        record["worker_pid"] = os.getpid()
+        records.append(record)
+    # Cada worker devolve o que mediu desde o último lote; o processo principal soma tudo no registro global.
+    return records, instrumentation.METRICS.snapshot(reset=True)
+
+def create_executor(options, workers):
+    # multiprocessing e o pool só são importados no modo paralelo; a execução serial não paga essa partida.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(options,))
+
+class ParallelRunner():
+    def __init__(self, options, workers=None, chunk_size=8):
+        self.options = options
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.max_in_flight = self.workers * 2
+        self.crashes = 0
+
+    def _start_executor(self):
+        return create_executor(self.options, self.workers)
+
+    def run(self, paths):
+        from concurrent.futures.process import BrokenProcessPool
+        pending = deque((i, paths[i:i + self.chunk_size]) for i in range(0, len(paths), self.chunk_size))
+        isolated = deque()
+        in_flight = {}
+        finished = {}
+        next_start = 0
+
+        executor = self._start_executor()
+        try:
+            while next_start < len(paths):
+                if isolated:
+                    if not in_flight:
+                        start, chunk = isolated.popleft()
+                        in_flight[executor.submit(process_chunk, chunk)] = (start, chunk, True)
+                else:
+                    while pending and len(in_flight) < self.max_in_flight:
+                        start, chunk = pending.popleft()
+                        in_flight[executor.submit(process_chunk, chunk)] = (start, chunk, False)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                crashed = False
+                for future in done:
+                    start, chunk, _ = in_flight[future]
+                    try:
+                        finished[start], snapshot = future.result()
+                        instrumentation.METRICS.merge(snapshot)
+                        del in_flight[future]
+                    except BrokenProcessPool:
+                        crashed = True
+
+                if crashed:
+                    self.crashes += 1
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    for future, (start, chunk, was_isolated) in in_flight.items():
+                        if future.done() and future.exception() is None:
+                            finished[start], snapshot = future.result()
+                            instrumentation.METRICS.merge(snapshot)
+                        elif was_isolated:
+                            finished[start] = [{"image": chunk[0], "error": "worker_encerrado_inesperadamente"}]
+                        else:
+                            isolated.extend((start + i, [path]) for i, path in enumerate(chunk))
+                    isolated = deque(sorted(isolated))
+                    in_flight.clear()
+                    executor = self._start_executor()
+
+                while next_start in finished:
+                    records = finished.pop(next_start)
+                    next_start += len(records)
+                    yield from records
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,66 @@
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+from results_store import connect, query_measurements, query_track, summarize
+
+def parse_time(text):
+    return datetime.fromisoformat(text).timestamp()
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="seconds") if timestamp else "-"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o banco de medições sem reprocessar as imagens.")
+    parser.add_argument("database", help="Banco SQLite gerado com --output medidas.db")
+    parser.add_argument("--station", help="Filtra pela estação")
+    parser.add_argument("--source", help="Filtra por imagem, vídeo ou câmera de origem")
+    parser.add_argument("--since", type=parse_time, help="Início do período (ISO, ex.: 2024-05-01 ou 2024-05-01T08:00)")
+    parser.add_argument("--until", type=parse_time, help="Fim do período (ISO)")
+    parser.add_argument("--track", type=int,
+                        help="Mostra o histórico de uma tora rastreada (track_id) na execução e câmera mais recentes")
+    parser.add_argument("--run", help="Execução (run_id) do histórico de --track")
+    parser.add_argument("--list", action="store_true", help="Lista as medições em CSV na saída padrão")
+    parser.add_argument("--limit", type=int, help="Número máximo de linhas listadas")
+    return parser.parse_args(argv)
+
+def write_rows(rows):
+    if not rows:
+        print("Nenhum registro encontrado.")
+        return
+    writer = csv.writer(sys.stdout)
+    writer.writerow(rows[0].keys())
+    writer.writerows(tuple(row) for row in rows)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # O sqlite3 criaria um banco vazio para um caminho errado, e a consulta mostraria zero medições sem avisar.
+    if not os.path.isfile(args.database):
+        print(f"Erro: banco de medições não encontrado: {args.database}")
+        return 1
+    conn = connect(args.database)
+    try:
+        if args.track is not None:
+            write_rows(query_track(conn, args.track, args.station, args.source, args.run))
+        elif args.list:
+            write_rows(query_measurements(conn, args.station, args.source, args.since, args.until, args.limit))
+        else:
+            summary = summarize(conn, args.station, args.since, args.until)
+            print("=== RESUMO DAS MEDIÇÕES ===")
+            print(f"- Medições: {summary['measurements']} ({summary['errors'] or 0} com erro)")
+            print(f"- Objetos medidos: {summary['objects'] or 0}")
+            print(f"- Período: {format_time(summary['first_at'])} a {format_time(summary['last_at'])}")
+            if summary["elapsed_ms"] is not None:
+                print(f"- Tempo médio de medição: {summary['elapsed_ms']:.1f} ms")
+            if summary["mean_diameter_cm"] is not None:
+                print(f"- Diâmetro médio: {summary['mean_diameter_cm']:.1f} cm")
+            if summary["mean_width_cm"] is not None:
+                print(f"- Tamanho médio: {summary['mean_width_cm']:.1f} x {summary['mean_height_cm']:.1f} cm")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+from measure_core import MAX_DIMENSION, MODES
+from image_loader import load_image
+from station_profile import StationTuner, sample_paths, save_profile
+from measure_batch import collect_images
+
+DEFAULT_PROFILE = "perfil_estacao.json"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ajusta os parâmetros do ArUco e da segmentação para as fotos de uma estação e grava o perfil.")
+    parser.add_argument("inputs", nargs="+", help="Diretórios, arquivos ou padrões glob com fotos da estação")
+    parser.add_argument("--mode", choices=MODES, default="objects", help="Pipeline de medição")
+    parser.add_argument("--station", help="ID da estação gravado no perfil")
+    parser.add_argument("--output", default=DEFAULT_PROFILE, help="Arquivo JSON do perfil")
+    parser.add_argument("--samples", type=int, default=30, help="Fotos usadas no ajuste (0 usa todas)")
+    parser.add_argument("--max-dimension", type=int, default=MAX_DIMENSION,
+                        help="Dimensão máxima da medição de referência (0 usa a resolução original)")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Diferença relativa máxima das medidas em relação à referência")
+    parser.add_argument("--min-recall", type=float, default=0.95,
+                        help="Fração mínima dos objetos da referência que precisam continuar sendo encontrados")
+    parser.add_argument("--repeat", type=int, default=2, help="Repetições por foto; vale o menor tempo")
+    parser.add_argument("--recursive", action="store_true", help="Percorre subdiretórios")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    paths = [p for p in sample_paths(collect_images(args.inputs, args.recursive), args.samples)
+             if load_image(p) is not None]
+    if not paths:
+        print("Nenhuma imagem encontrada nas entradas informadas.")
+        return 1
+    print(f"Ajustando o modo {args.mode} com {len(paths)} imagens...")
+
+    tuner = StationTuner(paths, args.mode, args.max_dimension, args.tolerance, args.min_recall, args.repeat)
+    profile = tuner.tune()
+    profile["station"] = args.station
+    save_profile(args.output, profile)
+
+    agreement = profile["agreement"]
+    print(f"\nPerfil salvo em {args.output}:")
+    print(f"- Dimensão máxima: {profile['max_dimension']}")
+    print(f"- ArUco: {profile['aruco'] or 'padrão'}")
+    print(f"- Segmentação: {profile['detector']}")
+    print(f"- Tempo por imagem: {profile['baseline_ms']:.1f} ms -> {profile['ms_per_image']:.1f} ms "
+          f"({profile['baseline_ms'] / profile['ms_per_image']:.1f}x)")
+    print(f"- Concordância com a referência: recall {agreement['recall']:.2f}, precisão {agreement['precision']:.2f}, "
+          f"erro de tamanho {100 * agreement['size_error']:.1f}%, erro de escala {100 * agreement['ratio_error']:.2f}%")
+    print(f"- Configurações avaliadas: {profile['evaluations']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from measure_core import marker_homography, pixel_cm_ratio_from_corners
+
+DEFAULT_CACHE_FILE = "calibracao.json"
+SIGNATURE_SIZE = 16
+
+class CalibrationCache():
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, station_id):
+        return self.entries.get(station_id)
+
+    def store(self, station_id, entry):
+        self.entries[station_id] = entry
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def marker_region(corners, shape, margin=0.25):
+    x, y, w, h = cv2.boundingRect(np.float32(corners).reshape(-1, 2))
+    margin_x, margin_y = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+    x1, y1 = min(shape[1], x + w + margin_x), min(shape[0], y + h + margin_y)
+    return x0, y0, x1, y1
+
+def region_signature(img, region):
+    x0, y0, x1, y1 = region
+    patch = img[y0:y1, x0:x1]
+    if patch.ndim == 3:
+        patch = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+    patch = cv2.resize(patch, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+    return patch.astype(np.float32)
+
+def calibration_entry(img, corners, ids):
+    marker_corners = corners[0][0]
+    signature = region_signature(img, marker_region(marker_corners, img.shape))
+    return {
+        "pixel_cm_ratio": pixel_cm_ratio_from_corners(corners[0]),
+        "marker_id": int(ids[0][0]) if ids is not None else None,
+        "marker_corners": marker_corners.tolist(),
+        "homography": marker_homography(marker_corners).tolist(),
+        "image_size": [img.shape[1], img.shape[0]],
+        "signature": signature.ravel().tolist(),
+        "verified_at": time.time(),
+    }
+
+def matching_entry(cache, station_id, img):
+    entry = cache.get(station_id)
+    if entry and tuple(entry["image_size"]) == (img.shape[1], img.shape[0]):
+        return entry
+    return None
+
+class StationCalibrator():
+    def __init__(self, cache, station_id, marker_detector, verify_every=100, max_signature_change=12.0):
+        self.cache = cache
+        self.station_id = station_id
+        self.marker_detector = marker_detector
+        self.verify_every = verify_every
+        self.max_signature_change = max_signature_change
+        self.images_since_verify = 0
+        self.signature = None
+        self.counts = {"detectado": 0, "cache": 0, "cache_sem_verificacao": 0, "sem_calibracao": 0}
+
+    def _store(self, img, corners, ids):
+        entry = calibration_entry(img, corners, ids)
+        self.signature = np.float32(entry["signature"]).reshape(SIGNATURE_SIZE, SIGNATURE_SIZE)
+        self.cache.store(self.station_id, entry)
+        self.images_since_verify = 0
+        return entry
+
+    def calibrate(self, img):
+        entry = matching_entry(self.cache, self.station_id, img)
+
+        if entry is not None:
+            if self.signature is None:
+                self.signature = np.float32(entry["signature"]).reshape(SIGNATURE_SIZE, SIGNATURE_SIZE)
+            signature = region_signature(img, marker_region(entry["marker_corners"], img.shape))
+            changed = float(np.mean(np.abs(signature - self.signature))) > self.max_signature_change
+            if not changed and self.images_since_verify < self.verify_every:
+                self.images_since_verify += 1
+                self.counts["cache"] += 1
+                return entry, "cache"
+
+        corners, ids, _ = self.marker_detector.detectMarkers(img)
+        if corners:
+            self.counts["detectado"] += 1
+            return self._store(img, corners, ids), "detectado"
+
+        if entry is not None:
+            self.images_since_verify += 1
+            self.counts["cache_sem_verificacao"] += 1
+            return entry, "cache_sem_verificacao"
+
+        self.counts["sem_calibracao"] += 1
+        return None, "sem_calibracao"
@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import cv2
+
+DEFAULT_CAMERA_CACHE = "cameras.json"
+MAX_INDEX = 5
+PROBE_TIMEOUT_S = 1.5
+FPS_CANDIDATES = (15, 30, 60)
+TIMEOUT_ERROR = "tempo_esgotado"
+
+def device_indices(max_index=MAX_INDEX):
+    if sys.platform.startswith("linux") and os.path.isdir("/dev"):
+        indices = []
+        for path in glob.glob("/dev/video*"):
+            match = re.fullmatch(r"/dev/video(\d+)", path)
+            if match:
+                indices.append(int(match.group(1)))
+        return sorted(indices)
+    return list(range(max_index))
+
+def device_signature(indices):
+    signature = []
+    for index in indices:
+        path = f"/dev/video{index}"
+        stat = os.stat(path) if os.path.exists(path) else None
+        signature.append([index, stat.st_ctime if stat else None])
+    return signature
+
+def probe_camera(source, probe_fps=True):
+    info = {"source": source, "available": False}
+    start = time.perf_counter()
+    cap = cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            return info
+        ok, frame = cap.read()
+        if not ok:
+            return info
+        info.update({
+            "available": True,
+            "backend": cap.getBackendName(),
+            "width": frame.shape[1],
+            "height": frame.shape[0],
+            "fps": cap.get(cv2.CAP_PROP_FPS) or None,
+        })
+        if probe_fps:
+            supported = []
+            for fps in FPS_CANDIDATES:
+                if cap.set(cv2.CAP_PROP_FPS, fps) and abs(cap.get(cv2.CAP_PROP_FPS) - fps) < 1:
+                    supported.append(fps)
+            info["supported_fps"] = supported
+        return info
+    finally:
+        cap.release()
+        info["probe_ms"] = (time.perf_counter() - start) * 1000
+
+def probe_cameras(sources, timeout=PROBE_TIMEOUT_S, probe_fps=True):
+    results = {}
+
+    def worker(source):
+        try:
+            results[source] = probe_camera(source, probe_fps)
+        except cv2.error as e:
+            results[source] = {"source": source, "available": False, "error": f"opencv: {e}"}
+
+    # Threads daemon: um dispositivo travado em VideoCapture() não segura a descoberta nem a saída do processo.
+    threads = [threading.Thread(target=worker, args=(source,), daemon=True) for source in sources]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.perf_counter()))
+
+    return [results.get(source, {"source": source, "available": False, "error": TIMEOUT_ERROR})
+            for source in sources]
+
+def load_camera_cache(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_camera_cache(path, cache):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+def discover_cameras(cache_path=DEFAULT_CAMERA_CACHE, max_index=MAX_INDEX, timeout=PROBE_TIMEOUT_S,
+                     max_age_s=24 * 3600, refresh=False, probe_fps=True):
+    indices = device_indices(max_index)
+    signature = device_signature(indices)
+
+    if cache_path and not refresh:
+        cache = load_camera_cache(cache_path)
+        if cache and cache["signature"] == signature and time.time() - cache["probed_at"] < max_age_s:
+            # Um tempo esgotado é do momento (dispositivo ocupado ou lento para abrir), não do dispositivo: só esses
+            # índices são sondados de novo.
+            cameras = cache["cameras"]
+            pending = [camera["source"] for camera in cameras if camera.get("error") == TIMEOUT_ERROR]
+            if pending:
+                probed = {camera["source"]: camera for camera in probe_cameras(pending, timeout, probe_fps)}
+                cameras = [probed.get(camera["source"], camera) for camera in cameras]
+                save_camera_cache(cache_path, dict(cache, cameras=cameras))
+            return cameras, True
+
+    cameras = probe_cameras(indices, timeout, probe_fps)
+    if cache_path:
+        save_camera_cache(cache_path, {"signature": signature, "probed_at": time.time(), "cameras": cameras})
+    return cameras, False
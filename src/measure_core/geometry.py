@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+def box_points(rects):
+    centers = rects[:, 0:2]
+    widths, heights = rects[:, 2:3], rects[:, 3:4]
+    theta = np.deg2rad(rects[:, 4:5])
+    b = np.cos(theta) * 0.5
+    a = np.sin(theta) * 0.5
+
+    p0 = np.hstack([centers[:, 0:1] - a * heights - b * widths, centers[:, 1:2] + b * heights - a * widths])
+    p1 = np.hstack([centers[:, 0:1] + a * heights - b * widths, centers[:, 1:2] - b * heights - a * widths])
+    return np.stack([p0, p1, 2 * centers - p0, 2 * centers - p1], axis=1)
+
+def transform_contours(contours, homography):
+    if not len(contours):
+        return []
+    lengths = [len(c) for c in contours]
+    points = np.concatenate([c.reshape(-1, 2) for c in contours]).astype(np.float32).reshape(-1, 1, 2)
+    warped = cv2.perspectiveTransform(points, homography)
+    return np.split(warped, np.cumsum(lengths)[:-1])
+
+def contour_geometry(contours, pixel_cm_ratio=None, with_circles=True):
+    n = len(contours)
+    rects = np.array([(x, y, w, h, angle) for (x, y), (w, h), angle in map(cv2.minAreaRect, contours)],
+                     np.float64).reshape(n, 5)
+    areas = np.fromiter((cv2.contourArea(c) for c in contours), np.float64, n)
+    perimeters = np.fromiter((cv2.arcLength(c, True) for c in contours), np.float64, n)
+
+    circularity = np.zeros(n)
+    np.divide(4 * np.pi * areas, perimeters * perimeters, out=circularity, where=perimeters > 0)
+
+    geometry = {
+        "count": n,
+        "centers": rects[:, 0:2],
+        "sizes": rects[:, 2:4],
+        "angles": rects[:, 4],
+        "boxes": box_points(rects),
+        "areas": areas,
+        "perimeters": perimeters,
+        "circularity": circularity,
+    }
+
+    if with_circles:
+        circles = np.array([(x, y, r) for (x, y), r in map(cv2.minEnclosingCircle, contours)],
+                           np.float64).reshape(n, 3)
+        geometry["circle_centers"] = circles[:, 0:2]
+        geometry["radii"] = circles[:, 2]
+
+    if pixel_cm_ratio is not None:
+        geometry["sizes_cm"] = geometry["sizes"] / pixel_cm_ratio
+        if with_circles:
+            geometry["diameters_cm"] = 2 * geometry["radii"] / pixel_cm_ratio
+
+    return geometry
+
+def draw_rect_measurements(img, geometry, width_label="Width {:.1f} cm", height_label="Height {:.1f} cm"):
+    if not geometry["count"]:
+        return img
+    centers = np.int32(geometry["centers"])
+    cv2.polylines(img, list(centers.reshape(-1, 1, 1, 2)), True, (0, 0, 255), 10)
+    cv2.polylines(img, list(np.int32(geometry["boxes"])), True, (255, 0, 0), 2)
+
+    sizes_cm = geometry.get("sizes_cm")
+    if sizes_cm is None:
+        return img
+    for (x, y), (w, h) in zip(centers.tolist(), sizes_cm.tolist()):
+        cv2.putText(img, width_label.format(w), (x - 100, y - 15), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
+        cv2.putText(img, height_label.format(h), (x - 100, y + 15), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
+    return img
+
+def draw_circle_measurements(img, geometry, label="Diametro: {:.1f} cm"):
+    if not geometry["count"]:
+        return img
+    centers = np.int32(geometry["circle_centers"])
+    radii = np.int32(geometry["radii"])
+
+    for (x, y), r in zip(centers.tolist(), radii.tolist()):
+        cv2.circle(img, (x, y), r, (255, 0, 0), 3)
+
+    offsets = np.stack([-radii, np.zeros_like(radii)], axis=1)
+    diameters = np.stack([centers + offsets, centers - offsets], axis=1)
+    cv2.polylines(img, list(diameters), False, (0, 0, 255), 2)
+
+    diameters_cm = geometry.get("diameters_cm")
+    if diameters_cm is None:
+        return img
+    for (x, y), r, d in zip(centers.tolist(), radii.tolist(), diameters_cm.tolist()):
+        cv2.putText(img, label.format(d), (x - r, y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return img
@@ -0,0 +1,212 @@
+import mmap
+import struct
+
+import cv2
+import numpy as np
+
+from instrumentation import span
+
+REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+MAPPED_EXTENSIONS = (".npy",)
+# Pixels de entrada por faixa na redução de uma imagem mapeada.
+STRIP_PIXELS = 4 << 20
+
+def _exif_orientation(data):
+    if not data.startswith(b"Exif\x00\x00"):
+        return 1
+    tiff = data[6:]
+    endian = "<" if tiff[:2] == b"II" else ">"
+    offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+    for i in range(count):
+        entry = tiff[offset + 2 + 12 * i:offset + 14 + 12 * i]
+        if len(entry) < 12:
+            break
+        tag = struct.unpack(endian + "H", entry[:2])[0]
+        if tag == 0x0112:
+            return struct.unpack(endian + "H", entry[8:10])[0]
+    return 1
+
+def _jpeg_size(f):
+    orientation = 1
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker == 0xE1:
+            orientation = _exif_orientation(f.read(length - 2))
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            # O imread aplica a orientação EXIF; 5 a 8 giram a imagem em 90 graus.
+            return (height, width) if orientation >= 5 else (width, height)
+        else:
+            f.seek(length - 2, 1)
+
+def _header_size(path):
+    with open(path, "rb") as f:
+        header = f.read(26)
+        try:
+            if header[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+            if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+                return struct.unpack(">II", header[16:24])
+            if header[:2] == b"BM" and struct.unpack("<I", header[14:18])[0] >= 40:
+                # Altura negativa indica linhas de cima para baixo.
+                width, height = struct.unpack("<ii", header[18:26])
+                return width, abs(height)
+        except struct.error:
+            pass
+    return None
+
+def image_size(path):
+    size = _header_size(path)
+    if size:
+        return size
+    img = cv2.imread(path)
+    return (img.shape[1], img.shape[0]) if img is not None else None
+
+def target_size(width, height, max_dimension):
+    if not max_dimension or (width <= max_dimension and height <= max_dimension):
+        return (width, height), 1.0
+    scale = max_dimension / max(width, height)
+    return (int(width * scale), int(height * scale)), scale
+
+def decode_factor(width, height, max_dimension):
+    for factor in REDUCED_FLAGS:
+        if max_dimension and max(width, height) / factor >= max_dimension:
+            return factor
+    return 1
+
+class LazyImage():
+    def __init__(self, path):
+        self.path = path
+        self._full = None
+        self.full_loads = 0
+        self.size = _header_size(path)
+        if not self.size:
+            # Sem cabeçalho conhecido (TIFF, WebP...) o tamanho só sai decodificando; a imagem decodificada fica
+            # guardada para a medição em vez de ser lida de novo.
+            img = self.full()
+            self.size = (img.shape[1], img.shape[0])
+
+    @property
+    def shape(self):
+        width, height = self.size
+        return (height, width, 3)
+
+    def full(self):
+        if self._full is None:
+            with span("decode"):
+                self._full = cv2.imread(self.path)
+            if self._full is None:
+                raise IOError(f"Não foi possível decodificar a imagem: {self.path}")
+            self.full_loads += 1
+        return self._full
+
+    def __getitem__(self, region):
+        return self.full()[region]
+
+    def reduced(self, max_dimension):
+        width, height = self.size
+        size, scale = target_size(width, height, max_dimension)
+        if self._full is not None:
+            img = self._full
+        else:
+            factor = decode_factor(width, height, max_dimension)
+            # O JPEG é decodificado direto em 1/2, 1/4 ou 1/8 pela escala da DCT, sem passar pela resolução cheia.
+            if factor > 1:
+                with span("decode"):
+                    img = cv2.imread(self.path, REDUCED_FLAGS[factor])
+            else:
+                img = self.full()
+        if img is None:
+            raise IOError(f"Não foi possível decodificar a imagem: {self.path}")
+        if (img.shape[1], img.shape[0]) != size:
+            with span("resize"):
+                img = cv2.resize(img, size)
+        return img, scale
+
+def reduce_region(image, region, size):
+    # Reduz em faixas horizontais: a região nunca é copiada inteira na resolução original.
+    x0, y0, x1, y1 = region
+    width, height = size
+    img = np.empty((height, width, 3), np.uint8)
+    scale = height / (y1 - y0)
+    rows = max(1, int(STRIP_PIXELS / (x1 - x0) * scale))
+    with span("resize"):
+        for start in range(0, height, rows):
+            end = min(height, start + rows)
+            top, bottom = y0 + int(round(start / scale)), min(y1, y0 + int(round(end / scale)))
+            img[start:end] = cv2.resize(image[top:bottom, x0:x1], (width, end - start), interpolation=cv2.INTER_AREA)
+            if hasattr(image, "release"):
+                image.release()
+    return img
+
+class MappedImage():
+    # Imagem já decodificada (BGR ou cinza, uint8) lida direto do arquivo mapeado: um .npy ou um np.memmap de um buffer
+    # bruto. Só as regiões pedidas entram na memória.
+    def __init__(self, source):
+        self.path = source if isinstance(source, str) else None
+        self.array = np.load(source, mmap_mode="r") if isinstance(source, str) else source
+        if self.array.dtype != np.uint8 or self.array.ndim not in (2, 3):
+            raise IOError(f"Buffer de imagem não suportado: {self.array.dtype} {self.array.shape}")
+        self.size = (self.array.shape[1], self.array.shape[0])
+        self.full_loads = 0
+
+    @property
+    def shape(self):
+        width, height = self.size
+        return (height, width, 3)
+
+    def __getitem__(self, region):
+        img = np.ascontiguousarray(self.array[region])
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img
+
+    def full(self):
+        self.full_loads += 1
+        return self[:, :]
+
+    def reduced(self, max_dimension):
+        width, height = self.size
+        size, scale = target_size(width, height, max_dimension)
+        if scale == 1.0:
+            return self.full(), 1.0
+        return reduce_region(self, (0, 0, width, height), size), scale
+
+    def release(self):
+        # Devolve as páginas já lidas do arquivo; sem isso o RSS cresce até o tamanho da imagem mapeada.
+        mapping = getattr(self.array, "_mmap", None)
+        if mapping is not None and hasattr(mmap, "MADV_DONTNEED"):
+            mapping.madvise(mmap.MADV_DONTNEED)
+
+def load_image(path):
+    try:
+        image = MappedImage(path) if path.lower().endswith(MAPPED_EXTENSIONS) else LazyImage(path)
+    except (OSError, ValueError):
+        return None
+    return image if image.size else None
+
+def read_image_reduced(path, max_dimension):
+    image = load_image(path)
+    if image is None:
+        return None, 1.0, None
+    try:
+        img, scale = image.reduced(max_dimension)
+    except IOError:
+        return None, 1.0, image.size
+    return img, scale, image.size
@@ -0,0 +1,188 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+METRICS_ENV = "MEDIDOR_METRICS"
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+PROMETHEUS_PREFIX = "medidor"
+
+class SpanStats():
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def merge(self, data):
+        self.count += data["count"]
+        self.total_ms += data["total_ms"]
+        self.max_ms = max(self.max_ms, data["max_ms"])
+        self.buckets = [a + b for a, b in zip(self.buckets, data["buckets"])]
+
+    def to_dict(self):
+        return {"count": self.count, "total_ms": self.total_ms, "max_ms": self.max_ms, "buckets": list(self.buckets)}
+
+def percentile(data, q):
+    # Estimativa pelo limite superior do bucket, como o histogram_quantile do Prometheus.
+    target = q * data["count"]
+    seen = 0
+    for bound, count in zip(BUCKETS_MS + (data["max_ms"],), data["buckets"]):
+        seen += count
+        if seen >= target:
+            return min(bound, data["max_ms"])
+    return data["max_ms"]
+
+class Span():
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+class NullSpan():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Metrics():
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.spans = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name, elapsed_ms):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.add(elapsed_ms)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            data = {
+                "spans": {name: stats.to_dict() for name, stats in self.spans.items()},
+                "counters": dict(self.counters),
+            }
+            if reset:
+                self.spans, self.counters = {}, {}
+        return data
+
+    def merge(self, data):
+        if not data:
+            return
+        with self.lock:
+            for name, span_data in data["spans"].items():
+                self.spans.setdefault(name, SpanStats()).merge(span_data)
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_json(self):
+        data = self.snapshot()
+        data["started_at"] = self.started_at
+        data["bucket_bounds_ms"] = list(BUCKETS_MS)
+        for span_data in data["spans"].values():
+            span_data["mean_ms"] = span_data["total_ms"] / span_data["count"]
+            span_data["p50_ms"] = percentile(span_data, 0.5)
+            span_data["p95_ms"] = percentile(span_data, 0.95)
+        return data
+
+    def to_prometheus(self):
+        data = self.snapshot()
+        name = f"{PROMETHEUS_PREFIX}_span_seconds"
+        lines = [f"# TYPE {name} histogram"]
+        for span, span_data in sorted(data["spans"].items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, span_data["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{span="{span}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{span="{span}",le="+Inf"}} {span_data["count"]}')
+            lines.append(f'{name}_sum{{span="{span}"}} {span_data["total_ms"] / 1000:.6f}')
+            lines.append(f'{name}_count{{span="{span}"}} {span_data["count"]}')
+        counter = f"{PROMETHEUS_PREFIX}_events_total"
+        lines.append(f"# TYPE {counter} counter")
+        for event, value in sorted(data["counters"].items()):
+            lines.append(f'{counter}{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else json.dumps(self.to_json(), indent=2)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def summary_lines(self):
+        lines = []
+        spans = self.snapshot()["spans"]
+        for name, data in sorted(spans.items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{name}: {data['count']}x, média {data['total_ms'] / data['count']:.2f} ms, "
+                         f"p95 {percentile(data, 0.95):.1f} ms, total {data['total_ms'] / 1000:.2f} s")
+        return lines
+
+METRICS = Metrics()
+
+def span(name):
+    return METRICS.span(name)
+
+def count(name, value=1):
+    METRICS.count(name, value)
+
+def enable(enabled=True):
+    METRICS.enabled = enabled
+
+def configure_from_env():
+    # MEDIDOR_METRICS=metricas.json (ou .prom) liga a coleta em qualquer script e grava o arquivo na saída.
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return None
+    import multiprocessing
+    # Workers herdam a variável, mas só o processo principal grava; eles devolvem os snapshots pelo ParallelRunner.
+    if multiprocessing.parent_process() is None:
+        enable()
+        atexit.register(METRICS.write, path)
+    return path
+
+def write_report(path):
+    METRICS.write(path)
+    print("\n=== TEMPO POR ETAPA ===")
+    for line in METRICS.summary_lines():
+        print(f"- {line}")
+    print(f"Métricas salvas em: {path}")
+
+configure_from_env()
@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+
+import cv2
+
+def put_latest(q, item):
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+class StageStats():
+    def __init__(self, name, smoothing=0.9):
+        self.name = name
+        self.smoothing = smoothing
+        self.count = 0
+        self.fps = 0.0
+        self.latency_ms = 0.0
+        self._last = None
+
+    def record(self, latency_s):
+        now = time.perf_counter()
+        latency_ms = latency_s * 1000
+        if self._last is not None and now > self._last:
+            fps = 1.0 / (now - self._last)
+            self.fps = fps if self.count == 1 else self.smoothing * self.fps + (1 - self.smoothing) * fps
+        self.latency_ms = latency_ms if self.count == 0 else self.smoothing * self.latency_ms + (1 - self.smoothing) * latency_ms
+        self._last = now
+        self.count += 1
+
+    def summary(self):
+        return f"{self.name}: {self.fps:.1f} fps / {self.latency_ms:.0f} ms"
+
+class LatestFrameGrabber(threading.Thread):
+    def __init__(self, cap, out_queue, stop_event):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.stats = StageStats("captura")
+        self.dropped = 0
+        self.ended = False
+
+    def run(self):
+        seq = 0
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            ok, frame = self.cap.read()
+            if not ok:
+                self.ended = True
+                break
+            self.stats.record(time.perf_counter() - start)
+            self.dropped += put_latest(self.out_queue, (seq, start, frame))
+            seq += 1
+
+class LivePipeline():
+    def __init__(self, cap, process_fn, render_fn, result_queue_size=2):
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.process_fn = process_fn
+        self.render_fn = render_fn
+        self.stop_event = threading.Event()
+        self.frames = queue.Queue(maxsize=1)
+        self.results = queue.Queue(maxsize=result_queue_size)
+        self.grabber = LatestFrameGrabber(cap, self.frames, self.stop_event)
+        self.processor = threading.Thread(target=self._process_loop, daemon=True)
+        self.process_stats = StageStats("processamento")
+        self.render_stats = StageStats("exibicao")
+        self.end_to_end = StageStats("latencia total")
+        self.dropped_results = 0
+
+    def _process_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                seq, captured_at, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                if self.grabber.ended:
+                    break
+                continue
+            start = time.perf_counter()
+            result = self.process_fn(frame)
+            self.process_stats.record(time.perf_counter() - start)
+            self.dropped_results += put_latest(self.results, (seq, captured_at, frame, result))
+
+    def stats_lines(self):
+        return [
+            self.grabber.stats.summary(),
+            self.process_stats.summary(),
+            self.render_stats.summary(),
+            f"latencia total: {self.end_to_end.latency_ms:.0f} ms",
+            f"quadros descartados: {self.grabber.dropped + self.dropped_results}",
+        ]
+
+    def run(self):
+        self.grabber.start()
+        self.processor.start()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    seq, captured_at, frame, result = self.results.get(timeout=0.1)
+                except queue.Empty:
+                    if not self.processor.is_alive():
+                        break
+                    continue
+                start = time.perf_counter()
+                keep_running = self.render_fn(frame, result)
+                now = time.perf_counter()
+                self.render_stats.record(now - start)
+                self.end_to_end.record(now - captured_at)
+                if not keep_running:
+                    break
+        finally:
+            self.stop_event.set()
+            self.processor.join(timeout=1)
+            self.grabber.join(timeout=1)
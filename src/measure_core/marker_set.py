@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_MARKER_SIZE_CM = 23.5
+
+class MarkerSet():
+    def __init__(self, sizes, positions=None, default_size=None):
+        self.sizes = {int(marker_id): float(size) for marker_id, size in sizes.items()}
+        self.positions = {int(marker_id): np.float64(position) for marker_id, position in (positions or {}).items()}
+        self.default_size = default_size
+
+    def description(self):
+        return {
+            "sizes": {str(k): v for k, v in sorted(self.sizes.items())},
+            "positions": {str(k): v.tolist() for k, v in sorted(self.positions.items())},
+            "default_size": self.default_size,
+        }
+
+    def select(self, corners, ids):
+        if not corners or ids is None:
+            return np.zeros((0, 4, 2), np.float32), np.zeros(0, np.int32), np.zeros(0)
+        ids = np.int32(ids).reshape(-1)
+        corners = np.float32(corners).reshape(-1, 4, 2)
+        if self.default_size is None:
+            known = np.isin(ids, list(self.sizes))
+            corners, ids = corners[known], ids[known]
+        sizes = np.float64([self.sizes.get(int(marker_id), self.default_size) for marker_id in ids])
+        return corners, ids, sizes
+
+    def plane_points(self, ids, sizes):
+        unit = np.float64([[0, 0], [1, 0], [1, 1], [0, 1]])
+        offsets = np.float64([self.positions.get(int(marker_id), (0.0, 0.0)) for marker_id in ids]).reshape(-1, 1, 2)
+        return unit[None] * sizes[:, None, None] + offsets
+
+    def fuse(self, corners, ids, sizes):
+        # Todos os marcadores em uma passada: perímetros, centros e homografias locais saem de operações em lote.
+        sides = np.linalg.norm(corners - np.roll(corners, -1, axis=1), axis=2)
+        ratios = sides.sum(axis=1) / (4 * sizes)
+        centers = corners.mean(axis=1)
+        plane = self.plane_points(ids, sizes)
+        local = batch_homographies(corners, plane - plane[:, :1])
+
+        board = None
+        on_board = np.array([int(marker_id) in self.positions for marker_id in ids], bool)
+        if on_board.any():
+            # Marcadores com posição conhecida no quadro entram juntos em uma única homografia por mínimos quadrados.
+            board, _ = cv2.findHomography(corners[on_board].reshape(-1, 2), plane[on_board].reshape(-1, 2), 0)
+        return {"ids": ids, "sizes": sizes, "corners": corners, "ratios": ratios, "centers": centers,
+                "homographies": local, "board": board}
+
+def batch_homographies(src, dst):
+    n = len(src)
+    x, y = src[..., 0].astype(np.float64), src[..., 1].astype(np.float64)
+    u, v = dst[..., 0], dst[..., 1]
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    rows_u = np.stack([x, y, ones, zeros, zeros, zeros, -u * x, -u * y], axis=2)
+    rows_v = np.stack([zeros, zeros, zeros, x, y, ones, -v * x, -v * y], axis=2)
+    a = np.concatenate([rows_u, rows_v], axis=1)
+    b = np.concatenate([u, v], axis=1)
+    h = np.linalg.solve(a, b[..., None])[..., 0]
+    return np.concatenate([h, np.ones((n, 1))], axis=1).reshape(n, 3, 3)
+
+def nearest_markers(points, centers):
+    points = np.float64(points).reshape(-1, 2)
+    if not len(points):
+        return np.zeros(0, np.intp)
+    distances = np.linalg.norm(points[:, None, :] - centers[None, :, :], axis=2)
+    return distances.argmin(axis=1)
+
+def parse_marker_set(text):
+    if text is None:
+        return None
+    if os.path.exists(text):
+        with open(text, encoding="utf-8") as f:
+            config = json.load(f)
+        markers = config.get("markers", [])
+        sizes = {m["id"]: m.get("size_cm", config.get("default_size_cm", DEFAULT_MARKER_SIZE_CM)) for m in markers}
+        positions = {m["id"]: m["position_cm"] for m in markers if "position_cm" in m}
+        return MarkerSet(sizes, positions, config.get("default_size_cm"))
+
+    sizes, default_size = {}, None
+    for item in text.split(","):
+        marker_id, _, size = item.partition(":")
+        size = float(size) if size else DEFAULT_MARKER_SIZE_CM
+        if marker_id.strip() == "*":
+            default_size = size
+        else:
+            sizes[int(marker_id)] = size
+    return MarkerSet(sizes, default_size=default_size)
+
+def marker_set_arg(text):
+    # Tipo do --markers: o erro aparece na linha de comando, não dentro dos processos do lote ou do serviço, que
+    # recebem o texto e montam o conjunto de novo.
+    try:
+        parse_marker_set(text)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        raise argparse.ArgumentTypeError(f"conjunto de marcadores inválido: {text} ({e})")
+    return text
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+class MarkerTracker():
+    def __init__(self, marker_detector, redetect_interval=30, roi_margin=0.5,
+                 max_flow_error=1.0, max_area_change=0.2):
+        self.marker_detector = marker_detector
+        self.redetect_interval = redetect_interval
+        self.roi_margin = roi_margin
+        self.max_flow_error = max_flow_error
+        self.max_area_change = max_area_change
+        self.prev_gray = None
+        self.gray = None
+        self.corners = ()
+        self.ids = None
+        self.frames_since_detection = 0
+        self.counts = {"rastreados": 0, "busca_roi": 0, "deteccao_completa": 0, "perdidos": 0}
+
+    def reset(self):
+        self.prev_gray = None
+        self.corners = ()
+        self.ids = None
+
+    def update(self, frame):
+        if self.gray is None or self.gray.shape != frame.shape[:2]:
+            self.gray = np.empty(frame.shape[:2], np.uint8)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray) if frame.ndim == 3 else frame
+
+        corners, ids, method = (), None, None
+        if self.corners:
+            if self.frames_since_detection < self.redetect_interval:
+                corners = self._track(gray)
+                ids, method = self.ids, "rastreados"
+            if not corners:
+                corners, ids = self._detect_roi(gray)
+                method = "busca_roi"
+
+        if not corners:
+            corners, ids, _ = self.marker_detector.detectMarkers(gray)
+            method = "deteccao_completa" if corners else "perdidos"
+
+        self.counts[method] += 1
+        if method in ("busca_roi", "deteccao_completa"):
+            self.frames_since_detection = 0
+        else:
+            self.frames_since_detection += 1
+
+        self.corners, self.ids = corners, ids
+        if not corners:
+            self.prev_gray = None
+        elif gray is self.gray:
+            self.prev_gray, self.gray = self.gray, self.prev_gray
+        else:
+            self.prev_gray = gray.copy()
+        return corners, ids, method
+
+    def _track(self, gray):
+        if self.prev_gray is None:
+            return ()
+        prev_points = np.concatenate(self.corners).reshape(-1, 1, 2)
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, prev_points, None, **LK_PARAMS)
+        if next_points is None or not status.all():
+            return ()
+
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, next_points, None, **LK_PARAMS)
+        if back_points is None or not back_status.all():
+            return ()
+        fb_error = np.linalg.norm((back_points - prev_points).reshape(-1, 2), axis=1)
+        if fb_error.max() > self.max_flow_error:
+            return ()
+
+        tracked = next_points.reshape(-1, 1, 4, 2)
+        for before, after in zip(self.corners, tracked):
+            area_before = cv2.contourArea(before[0])
+            area_after = cv2.contourArea(after[0])
+            if area_before <= 0 or abs(area_after - area_before) / area_before > self.max_area_change:
+                return ()
+            if not cv2.isContourConvex(after[0]):
+                return ()
+        return tuple(np.ascontiguousarray(c, dtype=np.float32) for c in tracked)
+
+    def _detect_roi(self, gray):
+        points = np.concatenate(self.corners).reshape(-1, 2)
+        x, y, w, h = cv2.boundingRect(points)
+        margin_x, margin_y = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(gray.shape[1], x + w + margin_x), min(gray.shape[0], y + h + margin_y)
+
+        corners, ids, _ = self.marker_detector.detectMarkers(gray[y0:y1, x0:x1])
+        if not corners:
+            return (), None
+        offset = np.float32([x0, y0])
+        return tuple(c + offset for c in corners), ids
+
+    def summary(self):
+        total = sum(self.counts.values())
+        full = self.counts["deteccao_completa"] + self.counts["perdidos"]
+        return (f"rastreados: {self.counts['rastreados']} | roi: {self.counts['busca_roi']} | "
+                f"completos: {full} de {total} quadros")
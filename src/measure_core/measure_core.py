@@ -0,0 +1,432 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from object_detector import *
+from geometry import contour_geometry, transform_contours, draw_circle_measurements, draw_rect_measurements
+from pyramid import full_res_detector, refine_contours, refine_marker_corners
+from image_loader import LazyImage, MappedImage, load_image
+from tiling import PREVIEW_DIMENSION, TiledDetector, redetect_markers
+from marker_set import nearest_markers
+from instrumentation import span, count
+
+MARKER_SIZE_CM = 23.5
+MARKER_PERIMETER_CM = 94
+MAX_DIMENSION = 1200
+
+MODES = ("objects", "trunk", "pile")
+ROUND_MODES = ("trunk", "pile")
+
+ROUND_ARUCO_PARAMETERS = {
+    "adaptiveThreshWinSizeMin": 3,
+    "adaptiveThreshWinSizeMax": 23,
+    "adaptiveThreshWinSizeStep": 10,
+    "adaptiveThreshConstant": 7,
+}
+
+def create_detector_parameters(mode="objects", overrides=None):
+    parameters = cv2.aruco.DetectorParameters()
+    values = dict(ROUND_ARUCO_PARAMETERS) if mode in ROUND_MODES else {}
+    values.update(overrides or {})
+    for name, value in values.items():
+        setattr(parameters, name, value)
+    return parameters
+
+def create_marker_detector(mode="objects", overrides=None):
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
+    return cv2.aruco.ArucoDetector(aruco_dict, create_detector_parameters(mode, overrides))
+
+def working_image(img, max_dimension):
+    # A própria fonte na resolução original (um .npy mapeado não é carregado) ou uma cópia reduzida para max_dimension.
+    if not max_dimension or max(img.shape[:2]) <= max_dimension:
+        return img, 1.0
+    if isinstance(img, (LazyImage, MappedImage)):
+        return img.reduced(max_dimension)
+    return resize_to_max_dimension(img, max_dimension)
+
+def resize_to_max_dimension(img, max_dimension=MAX_DIMENSION):
+    height, width = img.shape[:2]
+    scale = 1.0
+    if max_dimension and (width > max_dimension or height > max_dimension):
+        scale = max_dimension / max(width, height)
+        with span("resize"):
+            img = cv2.resize(img, (int(width * scale), int(height * scale)))
+    return img, scale
+
+def pixel_cm_ratio_from_corners(marker_corners):
+    return cv2.arcLength(marker_corners, True) / MARKER_PERIMETER_CM
+
+def marker_homography(marker_corners):
+    size = MARKER_SIZE_CM
+    plane = np.float32([[0, 0], [size, 0], [size, size], [0, size]])
+    return cv2.getPerspectiveTransform(np.float32(marker_corners).reshape(4, 2), plane)
+
+def metric_geometry(contours, homography, with_circles=True, marker_index=None):
+    # Todos os pontos de todos os contornos passam pela homografia em uma única chamada (uma por marcador, quando
+    # cada tora usa a homografia do marcador mais próximo).
+    if marker_index is None:
+        return contour_geometry(transform_contours(contours, homography), 1.0, with_circles)
+    warped = [None] * len(contours)
+    for m in np.unique(marker_index):
+        indices = np.flatnonzero(marker_index == m)
+        for i, cnt in zip(indices, transform_contours([contours[i] for i in indices], homography[m])):
+            warped[i] = cnt
+    return contour_geometry(warped, 1.0, with_circles)
+
+def nearest_marker_scale(centers, pixel_cm_ratio, homography, markers):
+    if markers is None:
+        return pixel_cm_ratio, None, None
+    marker_index = nearest_markers(centers, markers["centers"])
+    per_marker = homography is not None and np.ndim(homography) == 3
+    return markers["ratios"][marker_index], marker_index if per_marker else None, markers["ids"][marker_index].tolist()
+
+def to_cm(value_px, pixel_cm_ratio):
+    if pixel_cm_ratio is None:
+        return None
+    return value_px / pixel_cm_ratio
+
+def measure_object_contours(contours, pixel_cm_ratio, homography=None, markers=None):
+    geometry = contour_geometry(contours, with_circles=False)
+    count = geometry["count"]
+    pixel_cm_ratio, marker_index, marker_ids = nearest_marker_scale(geometry["centers"], pixel_cm_ratio, homography,
+                                                                    markers)
+    if homography is not None:
+        metric = metric_geometry(contours, homography, False, marker_index)
+        sizes_cm, areas_cm2 = metric["sizes"].tolist(), metric["areas"].tolist()
+    elif pixel_cm_ratio is not None:
+        sizes_cm = (geometry["sizes"] / np.reshape(pixel_cm_ratio, (-1, 1))).tolist()
+        areas_cm2 = (geometry["areas"] / np.square(pixel_cm_ratio)).tolist()
+    else:
+        sizes_cm, areas_cm2 = [(None, None)] * count, [None] * count
+    objects = [
+        {
+            "center_x": x, "center_y": y, "width_px": w, "height_px": h, "angle": angle,
+            "area_px": area, "circularity": circularity, "width_cm": w_cm, "height_cm": h_cm,
+            "area_cm2": area_cm2, "box": box,
+        }
+        for (x, y), (w, h), angle, area, circularity, (w_cm, h_cm), area_cm2, box in zip(
+            geometry["centers"].tolist(), geometry["sizes"].tolist(), geometry["angles"].tolist(),
+            geometry["areas"].tolist(), geometry["circularity"].tolist(), sizes_cm, areas_cm2,
+            np.int32(geometry["boxes"]).tolist())
+    ]
+    if marker_ids is not None:
+        for obj, marker_id in zip(objects, marker_ids):
+            obj["marker_id"] = marker_id
+    return objects
+
+def measure_trunk_contours(contours, pixel_cm_ratio, homography=None, markers=None):
+    geometry = contour_geometry(contours)
+    count = geometry["count"]
+    pixel_cm_ratio, marker_index, marker_ids = nearest_marker_scale(geometry["circle_centers"], pixel_cm_ratio,
+                                                                    homography, markers)
+    if homography is not None:
+        metric = metric_geometry(contours, homography, True, marker_index)
+        diameters_cm, areas_cm2 = (2 * metric["radii"]).tolist(), metric["areas"].tolist()
+    elif pixel_cm_ratio is not None:
+        diameters_cm = (2 * geometry["radii"] / pixel_cm_ratio).tolist()
+        areas_cm2 = (geometry["areas"] / np.square(pixel_cm_ratio)).tolist()
+    else:
+        diameters_cm, areas_cm2 = [None] * count, [None] * count
+    objects = [
+        {
+            "center_x": x, "center_y": y, "radius_px": radius, "area_px": area,
+            "circularity": circularity, "diameter_cm": diameter_cm, "area_cm2": area_cm2,
+        }
+        for (x, y), radius, area, circularity, diameter_cm, area_cm2 in zip(
+            geometry["circle_centers"].tolist(), geometry["radii"].tolist(), geometry["areas"].tolist(),
+            geometry["circularity"].tolist(), diameters_cm, areas_cm2)
+    ]
+    if marker_ids is not None:
+        for obj, marker_id in zip(objects, marker_ids):
+            obj["marker_id"] = marker_id
+    return objects
+
+def pile_totals(objects, pixel_cm_ratio, log_length_m=None):
+    totals = {"count": len(objects), "mean_diameter_cm": None, "cross_section_cm2": None, "volume_m3": None}
+    if pixel_cm_ratio is None or not objects:
+        return totals
+    cross_section_cm2 = sum(obj["area_cm2"] for obj in objects)
+    totals["mean_diameter_cm"] = sum(obj["diameter_cm"] for obj in objects) / len(objects)
+    totals["cross_section_cm2"] = cross_section_cm2
+    if log_length_m:
+        totals["volume_m3"] = cross_section_cm2 / 10000 * log_length_m
+    return totals
+
+def locate_marker(img, marker_detector, calibrator=None):
+    if calibrator is not None:
+        entry, source = calibrator.calibrate(img)
+        if entry is None:
+            return False, None, None, source
+        return source == "detectado", entry["marker_id"], np.float32(entry["marker_corners"]), source
+
+    with span("detect_markers"):
+        corners, ids, _ = marker_detector.detectMarkers(img)
+    if not corners:
+        return False, None, None, None
+    return True, int(ids[0][0]) if ids is not None else None, corners[0][0], None
+
+def refine_markers(full_img, marker_detector, corners, ids, scale, tiler=None):
+    # Por blocos o marcador é detectado de novo num recorte da imagem de trabalho; sem blocos, ou se ele não for achado
+    # no recorte, os cantos achados na reduzida são refinados em subpixel.
+    if tiler is not None:
+        with span("redetect_markers"):
+            redetected = redetect_markers(full_img, marker_detector, corners, ids, scale, tiler.marker_pixels)
+        if redetected is not None:
+            return redetected
+    with span("refine"):
+        return np.float32(refine_marker_corners(full_img, corners, scale)).reshape(-1, 4, 2)
+
+def locate_markers(img, marker_detector, marker_set, full_img=None, scale=1.0, tiler=None):
+    with span("detect_markers"):
+        corners, ids, _ = marker_detector.detectMarkers(img)
+    corners, ids, sizes = marker_set.select(corners, ids)
+    if not len(ids):
+        return None
+    if full_img is not None:
+        corners = refine_markers(full_img, marker_detector, corners, ids, scale, tiler)
+    with span("marker_fusion"):
+        return marker_set.fuse(corners, ids, sizes)
+
+def detect_contours(img, mode, object_detector=None):
+    # Mesmo resultado de detect_objects do detector do modo, separado em etapas medidas.
+    if object_detector is None or object_detector.mode != mode:
+        object_detector = create_object_detector(mode)
+    if mode == "trunk":
+        with span("threshold"):
+            cleaned = object_detector.segment(img)
+        with span("find_contours"):
+            return object_detector.filter_contours(cleaned)
+    if mode == "pile":
+        with span("threshold"):
+            faces = object_detector.segment(img)
+        with span("split_logs"):
+            contours = object_detector.split(faces)
+        with span("find_contours"):
+            return object_detector.filter_contours(contours)
+    if object_detector.debug:
+        with span("segment"):
+            return object_detector.detect_objects(img)
+    with span("threshold"):
+        mask = object_detector.segment(img)
+    with span("find_contours"):
+        return object_detector.filter_contours(mask)[0]
+
+def measure_image(img, mode, marker_detector, object_detector=None, max_dimension=MAX_DIMENSION,
+                  calibrator=None, pyramid=False, log_length_m=None, perspective=False, marker_set=None,
+                  tile_memory=None):
+    original_height, original_width = img.shape[:2]
+    full_img, full_scale = img, 1.0
+    if tile_memory:
+        # Por blocos, os objetos são segmentados na resolução de trabalho (max_dimension, 0 para a original) lendo um
+        # pedaço por vez; o marcador é achado numa prévia reduzida e refinado na imagem de trabalho.
+        full_img, full_scale = working_image(img, max_dimension)
+        img = full_img
+        max_dimension = min(max_dimension or PREVIEW_DIMENSION, PREVIEW_DIMENSION)
+    if isinstance(img, (LazyImage, MappedImage)):
+        # Sem pirâmide o JPEG é decodificado já reduzido; com ela, a resolução cheia é necessária para refinar o
+        # marcador, e decodificá-la uma vez só sai mais barato que decodificar as duas versões.
+        if pyramid and isinstance(img, LazyImage):
+            img.full()
+        img, scale = img.reduced(max_dimension)
+    else:
+        img, scale = resize_to_max_dimension(img, max_dimension)
+    refine = (pyramid or tile_memory) and scale < 1.0
+    if object_detector is None or object_detector.mode != mode:
+        object_detector = create_object_detector(mode)
+    tiler = TiledDetector(object_detector, tile_memory) if tile_memory else None
+
+    markers = None
+    if marker_set is not None:
+        markers = locate_markers(img, marker_detector, marker_set, full_img if refine else None, scale, tiler)
+        found, source = markers is not None, None
+        marker_id = int(markers["ids"][0]) if found else None
+        marker_corners = markers["corners"][0] if found else None
+    else:
+        found, marker_id, marker_corners, source = locate_marker(img, marker_detector, calibrator)
+        if refine and marker_corners is not None:
+            if found:
+                marker_corners = refine_markers(full_img, marker_detector, [marker_corners], [marker_id], scale,
+                                                tiler)[0]
+            else:
+                marker_corners = marker_corners / scale
+
+    homography = None
+    if markers is not None:
+        pixel_cm_ratio = float(np.median(markers["ratios"]))
+        if markers["board"] is not None:
+            homography = markers["board"]
+        elif perspective:
+            homography = markers["homographies"]
+    else:
+        pixel_cm_ratio = pixel_cm_ratio_from_corners(marker_corners) if marker_corners is not None else None
+        if perspective and marker_corners is not None:
+            homography = marker_homography(marker_corners)
+
+    result = {
+        "original_width": original_width,
+        "original_height": original_height,
+        "width": full_img.shape[1] if refine else img.shape[1],
+        "height": full_img.shape[0] if refine else img.shape[0],
+        "scale": full_scale if refine else full_scale * scale,
+        "marker_found": found,
+        "marker_id": marker_id,
+        "marker_corners": marker_corners.tolist() if marker_corners is not None else None,
+        "pixel_cm_ratio": pixel_cm_ratio,
+        "objects": [],
+    }
+    if calibrator is not None:
+        result["calibration_source"] = source
+    if refine:
+        result["coarse_scale"] = scale
+    if markers is not None:
+        result["markers"] = [
+            {"id": int(marker_id), "size_cm": size, "pixel_cm_ratio": ratio, "corners": corners}
+            for marker_id, size, ratio, corners in zip(markers["ids"], markers["sizes"].tolist(),
+                                                       markers["ratios"].tolist(), markers["corners"].tolist())
+        ]
+        result["marker_fusion"] = "quadro" if markers["board"] is not None else "marcador_mais_proximo"
+    if homography is not None and np.ndim(homography) == 2:
+        result["homography"] = homography.tolist()
+
+    count("images")
+    if found:
+        count("markers_found")
+    if mode == "objects" and pixel_cm_ratio is None:
+        return result, full_img if refine and not tile_memory else img
+    if tiler is not None:
+        with span("segment_tiles"):
+            contours = tiler.detect_objects(full_img if refine else img)
+        result["tiles"] = tiler.tiles
+    else:
+        contours = detect_contours(img, mode, object_detector)
+
+    if refine and not tile_memory:
+        with span("refine"):
+            contours = refine_contours(full_img, contours, scale, full_res_detector(object_detector, scale))
+
+    with span("geometry"):
+        if mode in ROUND_MODES:
+            result["objects"] = measure_trunk_contours(contours, pixel_cm_ratio, homography, markers)
+        else:
+            result["objects"] = measure_object_contours(contours, pixel_cm_ratio, homography, markers)
+    count("objects", len(result["objects"]))
+    if mode == "pile":
+        result["totals"] = pile_totals(result["objects"], pixel_cm_ratio, log_length_m)
+
+    # Por blocos a imagem cheia não é montada; a anotação sai sobre a reduzida (ver preview_result).
+    return result, full_img if refine and not tile_memory else img
+
+def preview_result(result, scale):
+    # Cópia do resultado nas coordenadas da imagem reduzida, só para desenhar.
+    preview = dict(result, objects=[dict(obj) for obj in result["objects"]])
+    if result["marker_corners"] is not None:
+        preview["marker_corners"] = (np.float64(result["marker_corners"]) * scale).tolist()
+    if result.get("markers"):
+        preview["markers"] = [dict(marker, corners=(np.float64(marker["corners"]) * scale).tolist())
+                              for marker in result["markers"]]
+    for obj in preview["objects"]:
+        for field in ("center_x", "center_y", "radius_px", "width_px", "height_px"):
+            if field in obj:
+                obj[field] *= scale
+        if "box" in obj:
+            obj["box"] = np.int32(np.float64(obj["box"]) * scale).tolist()
+    return preview
+
+def annotate_image(img, result, mode):
+    output_img = img.copy()
+    found = result["marker_found"]
+    calibrated = result["pixel_cm_ratio"] is not None
+
+    if found:
+        status = "Marcador detectado!"
+    elif calibrated:
+        status = "Escala da calibracao em cache"
+    else:
+        status = "Marcador não encontrado"
+    cv2.putText(output_img, "Status: " + status,
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if calibrated else (0, 0, 255), 2)
+
+    if result["marker_corners"] is not None:
+        if result["marker_id"] is not None:
+            cv2.putText(output_img, f"ID detectado: {result['marker_id']}", (10, 60),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        int_corners = np.int32([result["marker_corners"]])
+        cv2.polylines(output_img, int_corners, True, (0, 255, 0), 5)
+    for marker in result.get("markers") or []:
+        corners = np.int32(marker["corners"])
+        cv2.polylines(output_img, [corners], True, (0, 255, 0), 5)
+        cv2.putText(output_img, str(marker["id"]), tuple(corners[0].tolist()), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                    (0, 255, 0), 2)
+
+    objects = result["objects"]
+    if mode in ROUND_MODES:
+        geometry = {
+            "count": len(objects),
+            "circle_centers": np.float64([(o["center_x"], o["center_y"]) for o in objects]).reshape(-1, 2),
+            "radii": np.float64([o["radius_px"] for o in objects]),
+        }
+        if result["pixel_cm_ratio"] is not None and mode == "trunk":
+            geometry["diameters_cm"] = np.float64([o["diameter_cm"] for o in objects])
+        draw_circle_measurements(output_img, geometry)
+    else:
+        geometry = {
+            "count": len(objects),
+            "centers": np.float64([(o["center_x"], o["center_y"]) for o in objects]).reshape(-1, 2),
+            "boxes": np.int32([o["box"] for o in objects]).reshape(-1, 4, 2),
+            "sizes_cm": np.float64([(o["width_cm"], o["height_cm"]) for o in objects]).reshape(-1, 2),
+        }
+        draw_rect_measurements(output_img, geometry)
+
+    totals = result.get("totals")
+    if totals is not None:
+        text = f"Toras: {totals['count']}"
+        if totals["cross_section_cm2"] is not None:
+            text += f"  Area: {totals['cross_section_cm2'] / 10000:.2f} m2"
+        if totals["volume_m3"] is not None:
+            text += f"  Volume: {totals['volume_m3']:.2f} m3"
+        cv2.putText(output_img, text, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    cv2.putText(output_img, f"Marcador: {MARKER_SIZE_CM}x{MARKER_SIZE_CM}cm", (10, 90),
+               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return output_img
+
+def annotated_path(annotated_dir, image_path, root=None):
+    # Com a raiz das entradas, as subpastas se repetem em annotated_dir e fotos de mesmo nome não se sobrescrevem.
+    folder = os.path.relpath(os.path.dirname(os.path.abspath(image_path)), root) if root else os.curdir
+    return os.path.normpath(os.path.join(annotated_dir, folder, "medidas_" + os.path.basename(image_path)))
+
+def measure_image_file(path, mode, marker_detector, object_detector=None, max_dimension=MAX_DIMENSION,
+                       annotated_dir=None, calibrator=None, pyramid=False, log_length_m=None, perspective=False,
+                       marker_set=None, tile_memory=None, annotated_root=None):
+    start = time.perf_counter()
+    record = {"image": path}
+    try:
+        img = load_image(path)
+        if img is None:
+            record["error"] = "imagem_ilegivel"
+            return record
+        result, measured_img = measure_image(img, mode, marker_detector, object_detector, max_dimension,
+                                             calibrator, pyramid, log_length_m, perspective, marker_set, tile_memory)
+        record.update(result)
+        if result["pixel_cm_ratio"] is None:
+            record["error"] = "marcador_nao_encontrado"
+        if annotated_dir:
+            if isinstance(measured_img, (LazyImage, MappedImage)):
+                measured_img = measured_img.full()
+            drawn = preview_result(result, result["coarse_scale"]) if tile_memory and "coarse_scale" in result \
+                else result
+            with span("draw"):
+                annotated = annotate_image(measured_img, drawn, mode)
+            output_path = annotated_path(annotated_dir, path, annotated_root)
+            with span("write_image"):
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                cv2.imwrite(output_path, annotated)
+    except IOError:
+        record["error"] = "imagem_ilegivel"
+    except cv2.error as e:
+        record["error"] = f"opencv: {e}"
+    finally:
+        record["elapsed_ms"] = (time.perf_counter() - start) * 1000
+    return record
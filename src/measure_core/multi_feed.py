@@ -0,0 +1,230 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cv2
+
+from object_detector import *
+from measure_core import MAX_DIMENSION, measure_image
+from live_pipeline import LatestFrameGrabber, StageStats
+from video_source import open_capture, parse_source
+from smoothing import ObjectTracker, Smoother
+from station_profile import profile_detectors
+from instrumentation import span
+
+BUFFER_SIZE = 10
+CM_FIELDS = ("width_cm", "height_cm", "diameter_cm")
+TRACKED_FIELDS = {"objects": ("width_cm", "height_cm"), "trunk": ("diameter_cm",), "pile": ("diameter_cm",)}
+
+class PacedCapture():
+    def __init__(self, cap, fps=None):
+        self.cap = cap
+        self.interval = 1.0 / (fps or cap.get(cv2.CAP_PROP_FPS) or 30)
+        self._next = None
+
+    def read(self):
+        now = time.perf_counter()
+        if self._next is not None and now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next or now) + self.interval
+        return self.cap.read()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+class FeedMeasurer():
+    def __init__(self, mode="objects", max_dimension=MAX_DIMENSION, buffer_size=BUFFER_SIZE, smoothing="mean",
+                 perspective=False, marker_set=None, profile=None):
+        self.mode = mode
+        self.max_dimension = max_dimension
+        self.perspective = perspective
+        self.marker_set = marker_set
+        self.marker_detector, self.object_detector = profile_detectors(mode, profile)
+        self.ratio_smoother = Smoother(buffer_size, method=smoothing)
+        self.fields = TRACKED_FIELDS[mode]
+        self.tracker = ObjectTracker(len(self.fields), buffer_size, smoothing)
+
+    def measure(self, frame):
+        result, _ = measure_image(frame, self.mode, self.marker_detector, self.object_detector, self.max_dimension,
+                                  perspective=self.perspective, marker_set=self.marker_set)
+        ratio = result["pixel_cm_ratio"]
+        if ratio is None:
+            return result
+
+        # Só as medidas feitas com a razão única do marcador são corrigidas pela razão suavizada; com homografia ou
+        # com vários marcadores os cm não saem dessa razão.
+        objects = result["objects"]
+        if "homography" not in result and "markers" not in result:
+            smoothed = float(self.ratio_smoother.update(ratio)[0])
+            result["smoothed_pixel_cm_ratio"] = smoothed
+            factor = ratio / smoothed
+            for obj in objects:
+                for field in CM_FIELDS:
+                    if obj.get(field) is not None:
+                        obj[field] *= factor
+
+        centers = [(obj["center_x"], obj["center_y"]) for obj in objects]
+        values = [[obj[field] for field in self.fields] for obj in objects]
+        with span("tracking"):
+            tracks = self.tracker.update(centers, values)
+        for obj, (track_id, estimate, interval, samples) in zip(objects, tracks):
+            obj["track_id"] = track_id
+            obj["samples"] = samples
+            for field, value, ci in zip(self.fields, estimate.tolist(), interval.tolist()):
+                obj[field] = value
+                obj[f"{field}_ci"] = ci
+        return result
+
+class Feed():
+    def __init__(self, name, source, measurer, paced=False):
+        self.name = name
+        self.source = parse_source(source)
+        cap = open_capture(self.source)
+        if not cap.isOpened():
+            raise IOError(f"Não foi possível abrir a fonte de vídeo: {source}")
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.cap = PacedCapture(cap) if paced else cap
+        self.measurer = measurer
+        self.frames = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.grabber = LatestFrameGrabber(self.cap, self.frames, self.stop_event)
+        self.process_stats = StageStats("processamento")
+        self.end_to_end = StageStats("latencia total")
+        self.busy = False
+        self.last_dispatch = 0.0
+        self.processed = 0
+        self.errors = 0
+
+    @property
+    def finished(self):
+        return self.grabber.ended and self.frames.empty() and not self.busy
+
+    def process(self, seq, captured_at, frame):
+        start = time.perf_counter()
+        record = {"feed": self.name, "seq": seq}
+        try:
+            record.update(self.measurer.measure(frame))
+        except cv2.error as e:
+            record["error"] = f"opencv: {e}"
+            self.errors += 1
+        except Exception as e:
+            # Uma falha em um quadro vira registro de erro dessa câmera, sem derrubar a estação.
+            record["error"] = f"erro: {e}"
+            self.errors += 1
+        now = time.perf_counter()
+        self.process_stats.record(now - start)
+        self.end_to_end.record(now - captured_at)
+        record["latency_ms"] = (now - captured_at) * 1000
+        self.processed += 1
+        return record
+
+    def stats(self):
+        return {
+            "capture_fps": self.grabber.stats.fps,
+            "process_fps": self.process_stats.fps,
+            "process_ms": self.process_stats.latency_ms,
+            "latency_ms": self.end_to_end.latency_ms,
+            "queue_depth": self.frames.qsize(),
+            "dropped": self.grabber.dropped,
+            "processed": self.processed,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        self.stop_event.set()
+        self.grabber.join(timeout=1)
+        self.cap.release()
+
+class StationServer():
+    def __init__(self, feeds, workers=None):
+        self.feeds = feeds
+        self.workers = workers or min(len(feeds), os.cpu_count() or 1)
+        self.stop_event = threading.Event()
+        self.in_flight = {}
+        self.started_at = None
+
+    def stats(self):
+        feeds = {feed.name: feed.stats() for feed in self.feeds}
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        processed = sum(s["processed"] for s in feeds.values())
+        return {
+            "elapsed_s": elapsed,
+            "workers": self.workers,
+            "busy_workers": len(self.in_flight),
+            "process_fps": sum(s["process_fps"] for s in feeds.values()),
+            "average_fps": processed / elapsed if elapsed > 0 else 0.0,
+            "processed": processed,
+            "dropped": sum(s["dropped"] for s in feeds.values()),
+            "max_latency_ms": max((s["latency_ms"] for s in feeds.values()), default=0.0),
+            "feeds": feeds,
+        }
+
+    def _schedule(self, executor):
+        # Só há submissão quando um worker está livre, e a vez é da câmera atendida há mais tempo.
+        ready = sorted((feed for feed in self.feeds if not feed.busy and not feed.frames.empty()),
+                       key=lambda feed: feed.last_dispatch)
+        for feed in ready[:self.workers - len(self.in_flight)]:
+            try:
+                seq, captured_at, frame = feed.frames.get_nowait()
+            except queue.Empty:
+                continue
+            feed.busy = True
+            feed.last_dispatch = time.perf_counter()
+            self.in_flight[executor.submit(feed.process, seq, captured_at, frame)] = feed
+
+    def _collect(self, done, on_result):
+        for future in done:
+            feed = self.in_flight.pop(future)
+            feed.busy = False
+            record = future.result()
+            if on_result:
+                on_result(feed, record)
+
+    def run(self, on_result=None, on_stats=None, stats_every=5.0, duration=None):
+        self.started_at = time.perf_counter()
+        next_stats = self.started_at + stats_every
+        for feed in self.feeds:
+            feed.grabber.start()
+
+        executor = ThreadPoolExecutor(self.workers)
+        try:
+            while not self.stop_event.is_set():
+                # Cada câmera tem no máximo um quadro em processamento e um na fila; quadros novos substituem os antigos,
+                # então uma câmera sobrecarregada descarta quadros em vez de acumular atraso ou ocupar o pool inteiro.
+                self._schedule(executor)
+
+                if self.in_flight:
+                    done, _ = wait(self.in_flight, timeout=0.005, return_when=FIRST_COMPLETED)
+                    self._collect(done, on_result)
+                else:
+                    time.sleep(0.002)
+
+                now = time.perf_counter()
+                if on_stats and now >= next_stats:
+                    on_stats(self.stats())
+                    next_stats = now + stats_every
+                if duration is not None and now - self.started_at >= duration:
+                    break
+                if all(feed.finished for feed in self.feeds):
+                    break
+        finally:
+            self.stop_event.set()
+            self._collect(wait(self.in_flight).done, on_result)
+            executor.shutdown(wait=True)
+            for feed in self.feeds:
+                feed.close()
+        return self.stats()
+
+def stats_lines(stats):
+    lines = [f"estação: {stats['process_fps']:.1f} fps, {stats['busy_workers']}/{stats['workers']} workers ocupados, "
+             f"{stats['dropped']} quadros descartados, latência máxima {stats['max_latency_ms']:.0f} ms"]
+    for name, feed in stats["feeds"].items():
+        lines.append(f"{name}: captura {feed['capture_fps']:.1f} fps, processamento {feed['process_fps']:.1f} fps "
+                     f"({feed['process_ms']:.0f} ms), latência {feed['latency_ms']:.0f} ms, fila {feed['queue_depth']}, "
+                     f"descartados {feed['dropped']}")
+    return lines
@@ -0,0 +1,61 @@
+import math
+
+import cv2
+import numpy as np
+
+from object_detector import *
+
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 40, 0.01)
+
+def clip_region(x0, y0, x1, y1, shape):
+    return max(0, x0), max(0, y0), min(shape[1], x1), min(shape[0], y1)
+
+def refine_marker_corners(full_img, corners, scale, min_window=5):
+    window = max(min_window, int(math.ceil(1.5 / scale)) + 2)
+    refined = []
+    for marker in corners:
+        points = np.float32(marker).reshape(-1, 2) / scale
+        marker_refined = []
+        for px, py in points:
+            x0, y0, x1, y1 = clip_region(int(px) - 2 * window, int(py) - 2 * window,
+                                         int(px) + 2 * window + 1, int(py) + 2 * window + 1, full_img.shape)
+            roi = full_img[y0:y1, x0:x1]
+            if roi.ndim == 3:
+                roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+            point = np.float32([[[px - x0, py - y0]]])
+            half = min(window, (roi.shape[1] - 5) // 2, (roi.shape[0] - 5) // 2)
+            if half >= 2:
+                point = cv2.cornerSubPix(roi, point, (half, half), (-1, -1), SUBPIX_CRITERIA)
+            marker_refined.append(point[0, 0] + (x0, y0))
+        refined.append(np.float32(marker_refined).reshape(1, 4, 2))
+    return tuple(refined)
+
+def full_res_detector(object_detector, scale):
+    # Os parâmetros em pixels (janelas, áreas, raios) crescem junto com a resolução.
+    return object_detector.scaled(scale).detect_objects
+
+def refine_contours(full_img, coarse_contours, scale, detect_fn, margin=0.15):
+    refined = []
+    for cnt in coarse_contours:
+        full_cnt = np.int32(np.round(cnt.astype(np.float32) / scale))
+        x, y, w, h = cv2.boundingRect(full_cnt)
+        pad = int(max(w, h) * margin) + 2
+        x0, y0, x1, y1 = clip_region(x - pad, y - pad, x + w + pad, y + h + pad, full_img.shape)
+
+        moments = cv2.moments(full_cnt)
+        if moments["m00"]:
+            center = (moments["m10"] / moments["m00"] - x0, moments["m01"] / moments["m00"] - y0)
+        else:
+            center = (x + w / 2 - x0, y + h / 2 - y0)
+
+        max_area = 2 * cv2.contourArea(full_cnt)
+        best, best_area = None, 0
+        for candidate in detect_fn(full_img[y0:y1, x0:x1]):
+            if cv2.pointPolygonTest(candidate, center, False) < 0:
+                continue
+            area = cv2.contourArea(candidate)
+            if best_area < area <= max_area:
+                best, best_area = candidate, area
+
+        refined.append(best + np.int32([x0, y0]) if best is not None else full_cnt)
+    return refined
@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import time
+
+import measure_core
+
+DEFAULT_RESULT_CACHE = "resultados_cache.db"
+MAX_ENTRIES = 100000
+EVICT_CHECK_EVERY = 100
+# Incrementar quando o código da medição mudar de um jeito que altere os resultados.
+PIPELINE_VERSION = 3
+VOLATILE_FIELDS = ("image", "elapsed_ms", "worker_pid", "result_cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    record TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, fingerprint)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+def _parameter_values(obj):
+    values = {}
+    for name in dir(obj):
+        if name.startswith("_"):
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, (bool, int, float, str)):
+            values[name] = value
+    return values
+
+# hashlib só é importado com o cache ligado; o lote sem --result-cache não paga essa partida.
+def pipeline_fingerprint(options, marker_detector, object_detector, marker_set=None):
+    import hashlib
+    dictionary = marker_detector.getDictionary()
+    description = {
+        "version": PIPELINE_VERSION,
+        "mode": options["mode"],
+        "max_dimension": options["max_dimension"],
+        "pyramid": options["pyramid"],
+        "perspective": options["perspective"],
+        "markers": marker_set.description() if marker_set else None,
+        "log_length": options["log_length"],
+        "tile_memory": options["tile_memory"],
+        "marker_perimeter_cm": measure_core.MARKER_PERIMETER_CM,
+        "marker_size_cm": measure_core.MARKER_SIZE_CM,
+        "aruco_dictionary": hashlib.blake2b(dictionary.bytesList.tobytes(), digest_size=16).hexdigest(),
+        "aruco_marker_size": dictionary.markerSize,
+        "aruco_parameters": _parameter_values(marker_detector.getDetectorParameters()),
+        "detector": object_detector.params(),
+    }
+    text = json.dumps(description, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def file_hash(path, chunk_size=1 << 20):
+    import hashlib
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache():
+    def __init__(self, path, fingerprint, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        # Vários processos do lote compartilham o arquivo; o timeout espera o lock em vez de falhar.
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.puts = 0
+
+    def content_hash(self, path):
+        # Tamanho e mtime iguais dispensam reler o arquivo; qualquer mudança força o hash do conteúdo de novo.
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime_ns, content_hash FROM files WHERE path = ?",
+                                (os.path.abspath(path),)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        content_hash = file_hash(path)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+    def get(self, content_hash):
+        row = self.conn.execute("SELECT record FROM results WHERE content_hash = ? AND fingerprint = ?",
+                                (content_hash, self.fingerprint)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE results SET last_used = ? WHERE content_hash = ? AND fingerprint = ?",
+                              (time.time(), content_hash, self.fingerprint))
+        return json.loads(row[0])
+
+    def put(self, content_hash, record):
+        stored = {key: value for key, value in record.items() if key not in VOLATILE_FIELDS}
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                              (content_hash, self.fingerprint, json.dumps(stored), time.time()))
+        self.puts += 1
+        if self.puts % EVICT_CHECK_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        # Remove um décimo a mais que o excesso para não pagar a eviction a cada inserção.
+        excess = count - self.max_entries + self.max_entries // 10
+        with self.conn:
+            self.conn.execute("DELETE FROM results WHERE (content_hash, fingerprint) IN "
+                              "(SELECT content_hash, fingerprint FROM results ORDER BY last_used LIMIT ?)", (excess,))
+            self.conn.execute("DELETE FROM files WHERE content_hash NOT IN (SELECT content_hash FROM results)")
+        return excess
+
+    def invalidate(self):
+        # Remove os resultados de outras impressões digitais (outro modo, outros parâmetros, versão antiga).
+        with self.conn:
+            deleted = self.conn.execute("DELETE FROM results WHERE fingerprint != ?", (self.fingerprint,)).rowcount
+            self.conn.execute("DELETE FROM files WHERE content_hash NOT IN (SELECT content_hash FROM results)")
+        return deleted
+
+    def close(self):
+        self.evict()
+        self.conn.close()
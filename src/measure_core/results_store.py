@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import time
+import uuid
+
+STORE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    station TEXT,
+    source TEXT,
+    frame_index INTEGER,
+    timestamp_s REAL,
+    measured_at REAL NOT NULL,
+    mode TEXT,
+    marker_found INTEGER,
+    marker_id INTEGER,
+    pixel_cm_ratio REAL,
+    calibration_source TEXT,
+    width INTEGER,
+    height INTEGER,
+    scale REAL,
+    object_count INTEGER,
+    totals TEXT,
+    error TEXT,
+    elapsed_ms REAL,
+    latency_ms REAL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    measurement_id INTEGER NOT NULL REFERENCES measurements(id),
+    object_index INTEGER NOT NULL,
+    track_id INTEGER,
+    center_x REAL,
+    center_y REAL,
+    width_cm REAL,
+    height_cm REAL,
+    diameter_cm REAL,
+    width_cm_ci REAL,
+    height_cm_ci REAL,
+    diameter_cm_ci REAL,
+    area_px REAL,
+    circularity REAL,
+    PRIMARY KEY (measurement_id, object_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS measurements_station_time ON measurements(station, measured_at);
+CREATE INDEX IF NOT EXISTS measurements_source_frame ON measurements(source, frame_index);
+CREATE INDEX IF NOT EXISTS objects_track ON objects(track_id, measurement_id);
+"""
+RUN_INDEX = "CREATE INDEX IF NOT EXISTS measurements_run_source ON measurements(run_id, source)"
+
+MEASUREMENT_COLUMNS = ("run_id", "station", "source", "frame_index", "timestamp_s", "measured_at", "mode",
+                       "marker_found", "marker_id", "pixel_cm_ratio", "calibration_source", "width", "height", "scale",
+                       "object_count", "totals", "error", "elapsed_ms", "latency_ms")
+OBJECT_COLUMNS = ("measurement_id", "object_index", "track_id", "center_x", "center_y", "width_cm", "height_cm",
+                  "diameter_cm", "width_cm_ci", "height_cm_ci", "diameter_cm_ci", "area_px", "circularity")
+
+def is_store_path(path):
+    return path.lower().endswith(STORE_EXTENSIONS)
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # Bancos gravados antes da coluna run_id continuam válidos; as medições antigas ficam sem execução.
+    if "run_id" not in {row["name"] for row in conn.execute("PRAGMA table_info(measurements)")}:
+        conn.execute("ALTER TABLE measurements ADD COLUMN run_id TEXT")
+    conn.execute(RUN_INDEX)
+    return conn
+
+def _insert_sql(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+class ResultStore():
+    def __init__(self, path, station=None, mode=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.station = station
+        self.mode = mode
+        self.batch_size = batch_size
+        self.conn = connect(path)
+        # Os track_id do rastreador recomeçam a cada câmera e a cada execução: junto com a origem, o run_id identifica
+        # a tora.
+        self.run_id = uuid.uuid4().hex[:12]
+        self.pending = []
+        self.written = 0
+
+    def write(self, record):
+        objects = record.get("objects") or []
+        totals = record.get("totals")
+        measurement = (
+            self.run_id, record.get("station", self.station),
+            str(record.get("image") or record.get("source") or record.get("feed")),
+            record.get("frame_index", record.get("seq")), record.get("timestamp_s"), time.time(),
+            record.get("mode", self.mode), record.get("marker_found"), record.get("marker_id"),
+            record.get("pixel_cm_ratio"), record.get("calibration_source"), record.get("width"),
+            record.get("height"), record.get("scale"), len(objects), json.dumps(totals) if totals else None,
+            record.get("error"), record.get("elapsed_ms"), record.get("latency_ms"),
+        )
+        self.pending.append((measurement, [(i,) + tuple(obj.get(column) for column in OBJECT_COLUMNS[2:])
+                                           for i, obj in enumerate(objects)]))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # O id vem do SQLite (lastrowid) dentro da transação do lote: vários gravadores no mesmo banco não colidem.
+        measurement_sql = _insert_sql("measurements", MEASUREMENT_COLUMNS)
+        objects_sql = _insert_sql("objects", OBJECT_COLUMNS)
+        with self.conn:
+            for measurement, objects in self.pending:
+                measurement_id = self.conn.execute(measurement_sql, measurement).lastrowid
+                self.conn.executemany(objects_sql, [(measurement_id,) + obj for obj in objects])
+        self.written += len(self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+def _where(station=None, source=None, since=None, until=None, prefix="", run_id=None):
+    conditions, params = [], []
+    for column, op, value in (("station", "=", station), ("source", "=", source), ("run_id", "=", run_id),
+                              ("measured_at", ">=", since), ("measured_at", "<", until)):
+        if value is not None:
+            conditions.append(f"{prefix}{column} {op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+def query_measurements(conn, station=None, source=None, since=None, until=None, limit=None):
+    where, params = _where(station, source, since, until)
+    sql = f"SELECT * FROM measurements{where} ORDER BY measured_at, id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def query_track(conn, track_id, station=None, source=None, run_id=None):
+    # Sem run_id nem origem, vale a execução e a câmera da medição mais recente em que o track_id aparece.
+    where, params = _where(station, source, prefix="m.", run_id=run_id)
+    where = (where + " AND" if where else " WHERE") + " o.track_id = ?"
+    params.append(track_id)
+    latest = conn.execute(
+        f"SELECT m.run_id, m.source FROM objects o JOIN measurements m ON m.id = o.measurement_id{where} "
+        "ORDER BY m.id DESC LIMIT 1", params).fetchone()
+    if latest is None:
+        return []
+    where, params = _where(station, latest["source"], prefix="m.", run_id=latest["run_id"])
+    where += " AND o.track_id = ?" + ("" if latest["run_id"] is not None else " AND m.run_id IS NULL")
+    return conn.execute(
+        "SELECT m.run_id, m.station, m.source, m.frame_index, m.timestamp_s, m.measured_at, o.* "
+        f"FROM objects o JOIN measurements m ON m.id = o.measurement_id{where} ORDER BY o.measurement_id",
+        params + [track_id]).fetchall()
+
+def summarize(conn, station=None, since=None, until=None):
+    where, params = _where(station, since=since, until=until, prefix="m.")
+    row = conn.execute(
+        "SELECT COUNT(*) AS measurements, SUM(m.error IS NOT NULL) AS errors, SUM(m.object_count) AS objects, "
+        "AVG(m.elapsed_ms) AS elapsed_ms, MIN(m.measured_at) AS first_at, MAX(m.measured_at) AS last_at "
+        f"FROM measurements m{where}", params).fetchone()
+    sizes = conn.execute(
+        "SELECT AVG(o.diameter_cm) AS mean_diameter_cm, AVG(o.width_cm) AS mean_width_cm, "
+        "AVG(o.height_cm) AS mean_height_cm "
+        f"FROM objects o JOIN measurements m ON m.id = o.measurement_id{where}", params).fetchone()
+    return dict(dict(row), **dict(sizes))
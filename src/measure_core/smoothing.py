@@ -0,0 +1,169 @@
+import numpy as np
+
+METHODS = ("mean", "median", "trimmed")
+Z_95 = 1.96
+
+class RingBuffer():
+    def __init__(self, capacity, dims=1):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, dims), np.float64)
+        self.sum = np.zeros(dims, np.float64)
+        self.sum_sq = np.zeros(dims, np.float64)
+        self.index = 0
+        self.count = 0
+
+    def append(self, values):
+        values = np.asarray(values, np.float64).reshape(-1)
+        if self.count == self.capacity:
+            old = self.data[self.index]
+            self.sum -= old
+            self.sum_sq -= old * old
+        else:
+            self.count += 1
+        self.data[self.index] = values
+        self.sum += values
+        self.sum_sq += values * values
+        self.index = (self.index + 1) % self.capacity
+
+    def clear(self):
+        self.sum[:] = 0
+        self.sum_sq[:] = 0
+        self.index = 0
+        self.count = 0
+
+    def values(self):
+        return self.data[:self.count]
+
+    def mean(self):
+        return self.sum / self.count
+
+    def variance(self):
+        if self.count < 2:
+            return np.zeros_like(self.sum)
+        mean = self.sum / self.count
+        return np.maximum(self.sum_sq / self.count - mean * mean, 0) * self.count / (self.count - 1)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    def median(self):
+        return np.median(self.values(), axis=0)
+
+    def trimmed_mean(self, proportion=0.1):
+        cut = int(self.count * proportion)
+        ordered = np.sort(self.values(), axis=0)
+        return ordered[cut:self.count - cut].mean(axis=0)
+
+    def confidence_interval(self, z=Z_95):
+        return z * self.std() / np.sqrt(max(self.count, 1))
+
+class Smoother():
+    def __init__(self, capacity=10, dims=1, method="mean", trim=0.1, outlier_k=3.5, min_samples=5,
+                 max_rejections=3):
+        if method not in METHODS:
+            raise ValueError(f"Método de suavização desconhecido: {method}")
+        self.buffer = RingBuffer(capacity, dims)
+        self.method = method
+        self.trim = trim
+        self.outlier_k = outlier_k
+        self.min_samples = min_samples
+        self.max_rejections = max_rejections
+        self.rejected = 0
+        self.consecutive_rejections = 0
+
+    def is_outlier(self, values):
+        if not self.outlier_k or self.buffer.count < self.min_samples:
+            return False
+        window = self.buffer.values()
+        median = np.median(window, axis=0)
+        mad = np.median(np.abs(window - median), axis=0) * 1.4826
+        scale = np.maximum(mad, 1e-3 * np.abs(median) + 1e-9)
+        return bool(np.any(np.abs(values - median) > self.outlier_k * scale))
+
+    def update(self, values):
+        values = np.asarray(values, np.float64).reshape(-1)
+        if self.is_outlier(values):
+            self.rejected += 1
+            self.consecutive_rejections += 1
+            if self.consecutive_rejections <= self.max_rejections:
+                return self.estimate()
+            # Vários descartes seguidos indicam mudança real da medida, não ruído: recomeça a janela.
+            self.buffer.clear()
+        self.consecutive_rejections = 0
+        self.buffer.append(values)
+        return self.estimate()
+
+    def estimate(self):
+        if self.buffer.count == 0:
+            return None
+        if self.method == "median":
+            return self.buffer.median()
+        if self.method == "trimmed":
+            return self.buffer.trimmed_mean(self.trim)
+        return self.buffer.mean()
+
+    def interval(self, z=Z_95):
+        return self.buffer.confidence_interval(z)
+
+class Track():
+    def __init__(self, track_id, center, smoother):
+        self.id = track_id
+        self.center = np.float64(center)
+        self.smoother = smoother
+        self.missed = 0
+        self.hits = 0
+
+class ObjectTracker():
+    def __init__(self, dims, capacity=10, method="mean", max_distance=50.0, max_missed=5, **smoother_options):
+        self.dims = dims
+        self.capacity = capacity
+        self.method = method
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.smoother_options = smoother_options
+        self.tracks = []
+        self.next_id = 1
+
+    def _new_track(self, center):
+        track = Track(self.next_id, center, Smoother(self.capacity, self.dims, self.method, **self.smoother_options))
+        self.next_id += 1
+        self.tracks.append(track)
+        return track
+
+    def match(self, centers):
+        assigned = [None] * len(centers)
+        if not self.tracks or not len(centers):
+            return assigned
+        track_centers = np.array([track.center for track in self.tracks])
+        distances = np.linalg.norm(centers[:, None, :] - track_centers[None, :, :], axis=2)
+        order = np.argsort(distances, axis=None)
+        used_tracks = set()
+        for flat in order:
+            det, trk = divmod(int(flat), len(self.tracks))
+            if distances[det, trk] > self.max_distance:
+                break
+            if assigned[det] is not None or trk in used_tracks:
+                continue
+            assigned[det] = self.tracks[trk]
+            used_tracks.add(trk)
+        return assigned
+
+    def update(self, centers, values):
+        centers = np.asarray(centers, np.float64).reshape(-1, 2)
+        values = np.asarray(values, np.float64).reshape(len(centers), self.dims)
+        assigned = self.match(centers)
+
+        results = []
+        for center, value, track in zip(centers, values, assigned):
+            if track is None:
+                track = self._new_track(center)
+            track.center = center
+            track.missed = -1
+            track.hits += 1
+            estimate = track.smoother.update(value)
+            results.append((track.id, estimate, track.smoother.interval(), track.smoother.buffer.count))
+
+        for track in self.tracks:
+            track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        return results
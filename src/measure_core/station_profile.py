@@ -0,0 +1,262 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from object_detector import *
+from measure_core import MARKER_PERIMETER_CM, MAX_DIMENSION, ROUND_MODES, create_detector_parameters, \
+    create_marker_detector, measure_image
+from image_loader import load_image
+
+PROFILE_VERSION = 1
+MAX_DIMENSION_CANDIDATES = (1600, 1200, 1000, 800, 640, 480)
+# (mínimo, máximo, passo) das janelas do limiar adaptativo; cada janela é uma limiarização completa do quadro.
+WINDOW_CANDIDATES = ((3, 3, 10), (5, 5, 10), (7, 7, 10), (9, 9, 10), (13, 13, 10), (23, 23, 10), (3, 13, 10),
+                     (7, 17, 10), (3, 23, 10))
+# Só parâmetros que mudam o custo entram na busca; áreas mínimas e circularidade apenas filtram contornos prontos.
+TUNED_PARAMETERS = {
+    "objects": ("c", "block_size"),
+    "trunk": ("blur_size", "block_size", "kernel_size"),
+    "pile": ("blur_size", "min_radius", "block_size"),
+}
+PERIMETER_MARGIN = 0.5
+MIN_GAIN = 0.03
+
+def load_profile(path, mode=None):
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    if profile.get("version") != PROFILE_VERSION:
+        raise ValueError(f"Versão de perfil não suportada em {path}: {profile.get('version')}")
+    if mode is not None and profile["mode"] != mode:
+        raise ValueError(f"O perfil {path} foi ajustado para o modo {profile['mode']}, não {mode}")
+    return profile
+
+def save_profile(path, profile):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+def resolve_max_dimension(max_dimension, profile=None):
+    if max_dimension is not None:
+        return max_dimension
+    return profile["max_dimension"] if profile else MAX_DIMENSION
+
+def profile_detectors(mode, profile=None):
+    aruco = profile["aruco"] if profile else None
+    params = profile["detector"] if profile else None
+    return create_marker_detector(mode, aruco), create_object_detector(mode, params)
+
+def sample_paths(paths, count):
+    if not count or len(paths) <= count:
+        return list(paths)
+    step = len(paths) / count
+    return [paths[int(i * step)] for i in range(count)]
+
+def run_config(paths, mode, config, repeat=1):
+    marker_detector = create_marker_detector(mode, config["aruco"])
+    object_detector = create_object_detector(mode, config["detector"])
+    results, elapsed = [], 0.0
+    for path in paths:
+        best = None
+        for _ in range(repeat):
+            # A decodificação entra na conta: ela muda com a dimensão máxima (JPEG decodificado já reduzido).
+            start = time.perf_counter()
+            result, _ = measure_image(load_image(path), mode, marker_detector, object_detector, config["max_dimension"])
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        results.append(result)
+        elapsed += best
+    return results, elapsed * 1000 / len(paths)
+
+def object_points(result, mode):
+    objects = result["objects"]
+    scale = result["scale"]
+    centers = np.float64([(o["center_x"], o["center_y"]) for o in objects]).reshape(-1, 2) / scale
+    if mode in ROUND_MODES:
+        radii = np.float64([o["radius_px"] for o in objects]) / scale
+        sizes = np.array([[o["diameter_cm"]] for o in objects], dtype=float).reshape(-1, 1)
+    else:
+        radii = np.float64([min(o["width_px"], o["height_px"]) / 2 for o in objects]) / scale
+        sizes = np.array([(o["width_cm"], o["height_cm"]) for o in objects], dtype=float).reshape(-1, 2)
+    return centers, radii, sizes
+
+def compare_results(baseline, candidate, mode):
+    markers = kept = total = found = matched = 0
+    size_errors, ratio_errors = [], []
+    for base, cand in zip(baseline, candidate):
+        if base["pixel_cm_ratio"] is not None:
+            markers += 1
+            if cand["pixel_cm_ratio"] is not None:
+                kept += 1
+                base_ratio = base["pixel_cm_ratio"] / base["scale"]
+                ratio_errors.append(abs(cand["pixel_cm_ratio"] / cand["scale"] - base_ratio) / base_ratio)
+
+        base_centers, base_radii, base_sizes = object_points(base, mode)
+        cand_centers, _, cand_sizes = object_points(cand, mode)
+        total += len(base_centers)
+        found += len(cand_centers)
+        if not len(base_centers) or not len(cand_centers):
+            continue
+
+        # Pareamento guloso pelo centro mais próximo, dentro de meio raio do objeto da referência.
+        distances = np.linalg.norm(base_centers[:, None, :] - cand_centers[None, :, :], axis=2)
+        used_base, used_cand = set(), set()
+        for i, j in zip(*np.unravel_index(np.argsort(distances, axis=None), distances.shape)):
+            if distances[i, j] > 0.5 * base_radii[i]:
+                break
+            if i in used_base or j in used_cand:
+                continue
+            used_base.add(i)
+            used_cand.add(j)
+            errors = np.abs(cand_sizes[j] - base_sizes[i]) / base_sizes[i]
+            size_errors.extend(errors[np.isfinite(errors)].tolist())
+        matched += len(used_base)
+
+    return {
+        "marker_rate": kept / markers if markers else 1.0,
+        "ratio_error": max(ratio_errors, default=0.0),
+        "recall": matched / total if total else 1.0,
+        "precision": matched / found if found else 1.0,
+        "size_error": float(np.median(size_errors)) if size_errors else 0.0,
+    }
+
+class StationTuner():
+    def __init__(self, paths, mode="objects", max_dimension=MAX_DIMENSION, tolerance=0.02, min_recall=0.95,
+                 repeat=2, log=print):
+        self.paths = paths
+        self.mode = mode
+        self.max_dimension = max_dimension
+        self.tolerance = tolerance
+        self.min_recall = min_recall
+        self.repeat = repeat
+        self.log = log
+        self.evaluations = 0
+
+    def accepts(self, agreement):
+        return (agreement["marker_rate"] >= 1.0 and agreement["ratio_error"] <= self.tolerance / 2
+                and agreement["recall"] >= self.min_recall and agreement["precision"] >= self.min_recall
+                and agreement["size_error"] <= self.tolerance)
+
+    def evaluate(self, config):
+        self.evaluations += 1
+        results, ms = run_config(self.paths, self.mode, config, self.repeat)
+        agreement = compare_results(self.baseline, results, self.mode)
+        return ms, agreement
+
+    def marker_candidates(self, rates):
+        # A faixa de perímetros observada na estação (com folga) descarta cedo os contornos pequenos demais.
+        perimeter = {}
+        if rates:
+            perimeter = {"minMarkerPerimeterRate": max(0.03, min(rates) * PERIMETER_MARGIN),
+                         "maxMarkerPerimeterRate": min(4.0, max(rates) / PERIMETER_MARGIN)}
+        base = create_detector_parameters(self.mode)
+        candidates = []
+        for low, high, step in WINDOW_CANDIDATES:
+            windows = {"adaptiveThreshWinSizeMin": low, "adaptiveThreshWinSizeMax": high,
+                       "adaptiveThreshWinSizeStep": step, "adaptiveThreshConstant": base.adaptiveThreshConstant}
+            candidates.append(windows)
+            if perimeter:
+                candidates.append(dict(windows, **perimeter))
+        return candidates
+
+    def tune_marker(self, max_dimension):
+        # Só a detecção do marcador, nas imagens já reduzidas: barato o bastante para varrer todas as combinações.
+        images, rates = [], []
+        expected = [(r["marker_id"], r["pixel_cm_ratio"] / r["scale"]) if r["pixel_cm_ratio"] is not None else None
+                    for r in self.baseline]
+        for path, reference in zip(self.paths, expected):
+            image = load_image(path)
+            images.append(image.reduced(max_dimension))
+            if reference is not None:
+                # Perímetro relativo ao maior lado da imagem, como no minMarkerPerimeterRate; não depende da escala.
+                rates.append(reference[1] * MARKER_PERIMETER_CM / max(image.size))
+
+        best, best_ms = None, None
+        for aruco in self.marker_candidates(rates):
+            detector = create_marker_detector(self.mode, aruco)
+            ok, elapsed = True, 0.0
+            for (img, scale), reference in zip(images, expected):
+                seconds = None
+                for _ in range(self.repeat):
+                    start = time.perf_counter()
+                    corners, ids, _ = detector.detectMarkers(img)
+                    t = time.perf_counter() - start
+                    seconds = t if seconds is None else min(seconds, t)
+                elapsed += seconds
+                if reference is None:
+                    continue
+                marker_id, ratio = reference
+                if not corners or (ids is not None and int(ids[0][0]) != marker_id):
+                    ok = False
+                    break
+                measured = cv2.arcLength(corners[0], True) / MARKER_PERIMETER_CM / scale
+                if abs(measured - ratio) / ratio > self.tolerance / 2:
+                    ok = False
+                    break
+            if ok and (best_ms is None or elapsed < best_ms):
+                best, best_ms = aruco, elapsed
+        return best
+
+    def tune(self):
+        # Resolução em que os parâmetros padrão trabalham: fotos menores que max_dimension não são ampliadas.
+        image_dimension = max(load_image(self.paths[0]).size)
+        base_dimension = min(self.max_dimension, image_dimension) if self.max_dimension else image_dimension
+        default_detector = create_object_detector(self.mode)
+        baseline_config = {"max_dimension": self.max_dimension, "aruco": None, "detector": default_detector.params()}
+        self.baseline, baseline_ms = run_config(self.paths, self.mode, baseline_config, self.repeat)
+        self.log(f"Referência: {baseline_ms:.1f} ms por imagem (dimensão máxima {self.max_dimension or 'original'})")
+
+        best_config, best_ms, best_agreement = None, None, None
+        dimensions = sorted({d for d in MAX_DIMENSION_CANDIDATES if d < base_dimension} | {base_dimension},
+                            reverse=True)
+        for dimension in dimensions:
+            aruco = self.tune_marker(dimension)
+            if aruco is None:
+                self.log(f"- {dimension}px: nenhum ajuste do ArUco encontra todos os marcadores")
+                continue
+            # Janelas, blur e raios em pixels acompanham a mudança de resolução.
+            detector = default_detector.scaled(base_dimension / dimension).params()
+            config = {"max_dimension": dimension, "aruco": aruco, "detector": detector}
+            ms, agreement = self.evaluate(config)
+            accepted = self.accepts(agreement)
+            self.log(f"- {dimension}px: {ms:.1f} ms, recall {agreement['recall']:.2f}, "
+                     f"erro de tamanho {100 * agreement['size_error']:.1f}%" + ("" if accepted else " (rejeitado)"))
+            if accepted and (best_ms is None or ms < best_ms):
+                best_config, best_ms, best_agreement = config, ms, agreement
+
+        if best_config is None:
+            best_config = dict(baseline_config, aruco={})
+            best_ms, best_agreement = baseline_ms, compare_results(self.baseline, self.baseline, self.mode)
+
+        for name in TUNED_PARAMETERS[self.mode]:
+            for value in parameter_candidates(name, best_config["detector"][name]):
+                config = dict(best_config, detector=dict(best_config["detector"], **{name: value}))
+                ms, agreement = self.evaluate(config)
+                if self.accepts(agreement) and ms < best_ms * (1 - MIN_GAIN):
+                    self.log(f"- {name}={value}: {ms:.1f} ms")
+                    best_config, best_ms, best_agreement = config, ms, agreement
+
+        return {
+            "version": PROFILE_VERSION,
+            "mode": self.mode,
+            "max_dimension": best_config["max_dimension"],
+            "aruco": best_config["aruco"],
+            "detector": best_config["detector"],
+            "tuned_at": datetime.now().isoformat(timespec="seconds"),
+            "samples": len(self.paths),
+            "baseline_ms": baseline_ms,
+            "ms_per_image": best_ms,
+            "agreement": best_agreement,
+            "evaluations": self.evaluations,
+        }
+
+def parameter_candidates(name, value):
+    if name == "c":
+        return [value - 2, value + 2, value + 4]
+    if name == "min_radius":
+        return [value * 0.75, value * 1.25]
+    return sorted({odd(value * factor) for factor in (0.5, 0.75, 1.5)} - {value})
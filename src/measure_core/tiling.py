@@ -0,0 +1,355 @@
+import argparse
+import math
+
+import cv2
+import numpy as np
+
+from object_detector import *
+from image_loader import reduce_region
+from pyramid import clip_region
+from instrumentation import count, span
+
+DEFAULT_TILE_MEMORY_MB = 512
+# Pico de memória por pixel do bloco, medido com o OpenCV 4.10: cópia BGR, cinza, máscaras, buffers internos do blur e
+# do findContours e, nas pilhas, distâncias e rótulos de 32 bits. No modo objects o limiar adaptativo transforma fundo
+# com textura em centenas de milhares de contornos, e o findContours passa a custar uns 35 bytes por pixel.
+BYTES_PER_PIXEL = {"objects": 40, "trunk": 20, "pile": 42}
+# Detecção ArUco num recorte em volta do marcador: cópia BGR, cinza e limiares; ~8 bytes medidos, com folga.
+MARKER_BYTES_PER_PIXEL = 16
+MAX_STITCH_ROUNDS = 6
+# max_hole_area padrão do segment_log_pile.
+PILE_MAX_HOLE_AREA = 50
+INDEX_CELL = 256
+SAME_OBJECT_IOU = 0.9
+PREVIEW_DIMENSION = 1200
+# Folga do recorte em volta do marcador achado na prévia, em fração do lado.
+MARKER_WINDOW_MARGIN = 0.1
+
+def parse_tile_memory(text):
+    # --tiled 0 desligaria os blocos sem aviso; o orçamento tem de ser positivo.
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"orçamento de memória dos blocos deve ser positivo (MB): {text}")
+    return value
+
+def detector_halo(object_detector):
+    # Contexto em pixels que as operações locais (blur, limiar adaptativo, morfologia) leem além de cada pixel; o
+    # fechamento e a abertura são duas passadas do kernel.
+    params = object_detector.params()
+    halo = sum(int(params.get(name, 0)) // 2 for name in ("blur_size", "block_size")) + 2
+    halo += 2 * (int(params.get("kernel_size", 0)) // 2)
+    if object_detector.mode == "pile":
+        # Abertura 3x3, furos pequenos preenchidos e a janela dos máximos locais da distância.
+        halo += 2 + int(math.ceil(math.sqrt(PILE_MAX_HOLE_AREA))) + 2 * int(math.ceil(params["min_radius"])) + 2
+    return halo
+
+def tile_ranges(length, core):
+    return [(start, min(length, start + core)) for start in range(0, length, core)]
+
+def bounding_box(cnt):
+    x, y, w, h = cv2.boundingRect(cnt)
+    return (x, y, x + w, y + h)
+
+def box_center(box):
+    return (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+def box_area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+def contains(box, x, y):
+    return box[0] <= x <= box[2] and box[1] <= y <= box[3]
+
+def contains_box(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+def boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def union_box(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def box_iou(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (box_area(a) + box_area(b) - inter)
+
+def redetect_markers(image, marker_detector, corners, ids, scale, max_pixels):
+    # Na prévia reduzida os cantos saem com erro de uma fração de pixel da prévia, que vira ~0,1% na escala; detectado
+    # de novo num recorte em volta, na resolução de trabalho, o marcador sai igual ao da detecção sem blocos.
+    redetected = []
+    for marker, marker_id in zip(corners, ids):
+        points = np.float32(marker).reshape(-1, 2) / scale
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        pad = int(MARKER_WINDOW_MARGIN * max(x1 - x0, y1 - y0)) + 8
+        region = clip_region(int(x0) - pad, int(y0) - pad, int(x1) + pad + 1, int(y1) + pad + 1, image.shape)
+        x0, y0, x1, y1 = region
+        factor = math.sqrt(max_pixels / ((x1 - x0) * (y1 - y0)))
+        if factor < 1.0:
+            # Marcador enorme para o orçamento: o recorte é reduzido só o necessário, bem menos que a prévia.
+            size = (max(1, int((x1 - x0) * factor)), max(1, int((y1 - y0) * factor)))
+            crop = reduce_region(image, region, size)
+            stretch = np.float32([(x1 - x0) / size[0], (y1 - y0) / size[1]])
+        else:
+            crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+            stretch = np.float32([1.0, 1.0])
+        found, found_ids, _ = marker_detector.detectMarkers(crop)
+        del crop
+        if hasattr(image, "release"):
+            image.release()
+        match = ([cnt for cnt, i in zip(found, np.ravel(found_ids)) if marker_id is None or int(i) == int(marker_id)]
+                 if found else [])
+        if not match:
+            return None
+        # Centro de pixel a centro de pixel entre o recorte reduzido e a imagem de trabalho.
+        points = (np.float32(match[0]).reshape(4, 2) + 0.5) * stretch - 0.5
+        redetected.append(points + np.float32([x0, y0]))
+    return np.float32(redetected).reshape(-1, 4, 2)
+
+class BoxIndex():
+    # Grade espacial: as caixas próximas de uma caixa saem só das células que ela cobre.
+    def __init__(self, cell=INDEX_CELL):
+        self.cell = cell
+        self.cells = {}
+        self.items = []
+
+    def _keys(self, box):
+        cell = self.cell
+        for cy in range(int(box[1]) // cell, int(box[3] - 1) // cell + 1):
+            for cx in range(int(box[0]) // cell, int(box[2] - 1) // cell + 1):
+                yield cx, cy
+
+    def add(self, box, value=None):
+        index = len(self.items)
+        self.items.append((box, value))
+        for key in self._keys(box):
+            self.cells.setdefault(key, []).append(index)
+        return index
+
+    def overlapping(self, box):
+        seen = set()
+        for key in self._keys(box):
+            for index in self.cells.get(key, ()):
+                if index not in seen:
+                    seen.add(index)
+                    if boxes_overlap(self.items[index][0], box):
+                        yield index
+
+def merge_boxes(boxes):
+    # Pedaços que se sobrepõem são o mesmo objeto visto por blocos vizinhos: viram um grupo, com a caixa que envolve
+    # todos e os pedaços de origem.
+    index = BoxIndex()
+    parent = list(range(len(boxes)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, box in enumerate(boxes):
+        # Caixas que só se encostam também são juntadas: o objeto foi cortado exatamente na linha entre elas.
+        for j in index.overlapping((box[0] - 1, box[1] - 1, box[2] + 1, box[3] + 1)):
+            parent[root(j)] = root(i)
+        index.add(box)
+    groups = {}
+    for i, box in enumerate(boxes):
+        groups.setdefault(root(i), []).append(box)
+    return [(union_box(members), members) for members in groups.values()]
+
+class TiledDetector():
+    def __init__(self, object_detector, memory_mb=DEFAULT_TILE_MEMORY_MB, overlap=None):
+        self.object_detector = object_detector
+        self.mode = object_detector.mode
+        self.halo = detector_halo(object_detector)
+        self.overlap = overlap if overlap is not None else 2 * self.halo
+        self.max_pixels = int(memory_mb * 2 ** 20 / BYTES_PER_PIXEL[self.mode])
+        self.marker_pixels = int(memory_mb * 2 ** 20 / MARKER_BYTES_PER_PIXEL)
+        self.core = int(math.sqrt(self.max_pixels)) - 2 * self.overlap
+        if self.core < self.overlap:
+            # Orçamento pequeno demais para o contexto que o detector precisa: mede assim mesmo, acima do orçamento.
+            self.core = self.overlap
+            count("tiles_over_budget")
+        # Todo modo exige área acima de min_area. Um objeto cortado por até quatro blocos deixa em algum deles um pedaço
+        # com pelo menos um quarto da caixa; contornos menores são ruído e textura, que no modo objects passam de um
+        # milhão por imagem e, nas bordas, encadeiam grupos do tamanho da imagem.
+        self.min_box = object_detector.params()["min_area"] / 4
+        self.tiles = 0
+        self.stitched = 0
+
+    def detect_region(self, image, region):
+        x0, y0, x1, y1 = region
+        factor = math.sqrt(self.max_pixels / ((x1 - x0) * (y1 - y0)))
+        if factor < 1.0:
+            # Janela maior que o orçamento (objeto muito grande): segmentada reduzida, parâmetros na mesma escala.
+            size = (max(1, int((x1 - x0) * factor)), max(1, int((y1 - y0) * factor)))
+            tile = reduce_region(image, region, size)
+            stretch = np.float32([(x1 - x0) / size[0], (y1 - y0) / size[1]])
+            contours = [np.int32(np.round(cnt * stretch)) for cnt in
+                        self.object_detector.scaled(1 / factor).candidates(tile)]
+            count("tiles_reduced")
+        else:
+            tile = image[y0:y1, x0:x1]
+            contours = self.object_detector.candidates(tile)
+        del tile
+        if hasattr(image, "release"):
+            image.release()
+        self.tiles += 1
+        count("tiles")
+
+        shape = image.shape
+        height, width = shape[:2]
+        # Um contorno que chega a menos de halo da borda interna do bloco foi cortado ou segmentado sem contexto.
+        limits = (x0 + self.halo if x0 > 0 else -1, y0 + self.halo if y0 > 0 else -1,
+                  x1 - self.halo if x1 < width else width + 1, y1 - self.halo if y1 < height else height + 1)
+        whole, cut = [], []
+        for cnt in contours:
+            x, y, w, h = cv2.boundingRect(cnt)
+            if w * h <= self.min_box:
+                continue
+            box = (x0 + x, y0 + y, x0 + x + w, y0 + y + h)
+            if not contains_box(limits, self.reach(box, shape)):
+                cut.append((box, cnt + np.int32([x0, y0])))
+            else:
+                whole.append(cnt)
+        # Só o que passa no filtro do detector é guardado.
+        whole = [cnt + np.int32([x0, y0]) for cnt in self.object_detector.select(whole)]
+        return [(bounding_box(cnt), cnt) for cnt in whole], cut, limits
+
+    def reach(self, box, shape):
+        # Na pilha cada pixel vai para o núcleo mais próximo, que pode estar a um diâmetro da tora: o contorno só sai
+        # igual ao da imagem inteira com essa folga (até a sobreposição entre blocos) dentro da área útil do bloco.
+        if self.mode != "pile":
+            return box
+        extra = min(max(box[2] - box[0], box[3] - box[1]), self.halo)
+        return (max(0, box[0] - extra), max(0, box[1] - extra),
+                min(shape[1], box[2] + extra), min(shape[0], box[3] + extra))
+
+    def covers(self, box, cnt, centers):
+        # Na pilha as toras se encostam e a caixa de uma vizinha também pega o centro; lá vale o contorno, com folga de
+        # arredondamento. Nos outros modos o objeto pode ser côncavo e o centro dos pedaços cair fora dele.
+        return any(contains(box, x, y) and (self.mode != "pile" or
+                                            cv2.pointPolygonTest(cnt, (float(x), float(y)), True) >= -2)
+                   for x, y in centers)
+
+    def keep(self, kept, box, cnt):
+        # O mesmo objeto visto inteiro por dois blocos sai com o mesmo contorno; só a primeira cópia fica. Objetos finos
+        # e paralelos têm caixas bem sobrepostas sem serem o mesmo, daí o limite alto.
+        if not any(box_iou(kept.items[i][0], box) > SAME_OBJECT_IOU for i in kept.overlapping(box)):
+            kept.add(box, cnt)
+
+    def brightness_histogram(self, image, blur_size):
+        # Histograma do cinza suavizado, somado por faixas com a borda que o blur precisa: dá o mesmo limiar de Otsu da
+        # imagem inteira sem carregá-la.
+        height, width = image.shape[:2]
+        halo = blur_size // 2 + 1
+        rows = max(1, self.max_pixels // width - 2 * halo)
+        hist = np.zeros((256, 1), np.float32)
+        for y0 in range(0, height, rows):
+            y1 = min(height, y0 + rows)
+            top, bottom = max(0, y0 - halo), min(height, y1 + halo)
+            strip = image[top:bottom, :]
+            gray = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY) if strip.ndim == 3 else strip
+            blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)[y0 - top:y1 - top]
+            hist += cv2.calcHist([blurred], [0], None, [256], [0, 256])
+            del strip, gray, blurred
+            if hasattr(image, "release"):
+                image.release()
+        return hist
+
+    def detect_objects(self, image):
+        height, width = image.shape[:2]
+        if height * width <= self.max_pixels:
+            self.tiles += 1
+            count("tiles")
+            return self.object_detector.detect_objects(image[:, :])
+        if self.mode == "pile" and self.object_detector.threshold is None:
+            # O limiar de brilho de Otsu é global: calculado uma vez, sobre o histograma da imagem toda.
+            params = self.object_detector.params()
+            with span("brightness_histogram"):
+                hist = self.brightness_histogram(image, params["blur_size"])
+            self.object_detector = PileDetector(**dict(params, threshold=otsu_threshold(hist)))
+
+        kept, pieces, interiors = BoxIndex(), [], BoxIndex(max(INDEX_CELL, self.core))
+        for y0, y1 in tile_ranges(height, self.core):
+            for x0, x1 in tile_ranges(width, self.core):
+                with span("tile"):
+                    whole, cut, limits = self.detect_region(image, (max(0, x0 - self.overlap),
+                                                                    max(0, y0 - self.overlap),
+                                                                    min(width, x1 + self.overlap),
+                                                                    min(height, y1 + self.overlap)))
+                for box, cnt in whole:
+                    self.keep(kept, box, cnt)
+                pieces.extend(box for box, _ in cut)
+                interiors.add(limits)
+
+        with span("stitch"):
+            # Só é medido de novo o que nenhum bloco viu inteiro: se a área útil de um bloco contém o pedaço, esse bloco
+            # já mediu (ou descartou) o objeto.
+            pieces = [box for box in pieces if not any(contains_box(interiors.items[i][0], self.reach(box, image.shape))
+                                                       for i in interiors.overlapping(box))]
+            groups = []
+            margin = self.halo + self.overlap
+            for box, members in merge_boxes(pieces):
+                window = (box[2] - box[0] + 2 * margin) * (box[3] - box[1] + 2 * margin)
+                if len(members) > 1 and window > self.max_pixels:
+                    # Objetos encostados (as toras de uma pilha) encadeiam um grupo que não cabe no orçamento, e
+                    # reduzido a segmentação muda; cada pedaço é costurado na sua própria janela.
+                    groups.extend((member, [member]) for member in set(members))
+                else:
+                    groups.append((box, members))
+            for box, members in sorted(groups, key=lambda group: -box_area(group[0])):
+                # Um grupo maior, medido antes, pode já ter levado o objeto inteiro.
+                if any(contains_box(kept.items[i][0], box) for i in kept.overlapping(box)):
+                    continue
+                for other, cnt in self.stitch(image, box, members):
+                    self.keep(kept, other, cnt)
+        return self.object_detector.select([cnt for i, (box, cnt) in enumerate(kept.items)
+                                            if not self.nested(kept, i, box, cnt)])
+
+    def nested(self, kept, index, box, cnt):
+        # O bloco que corta um objeto em anel abre o buraco, e o que está dentro aparece como contorno externo; na
+        # imagem inteira o RETR_EXTERNAL não o devolveria. Na pilha cada tora é contornada à parte, e uma tora menor
+        # dentro do contorno de outra é legítima.
+        if self.mode == "pile":
+            return False
+        x, y = cnt[0][0]
+        return any(i != index and contains_box(kept.items[i][0], box)
+                   and cv2.pointPolygonTest(kept.items[i][1], (float(x), float(y)), False) > 0
+                   for i in kept.overlapping(box))
+
+    def fitting_margin(self, box, margin):
+        # Maior margem, até a pedida, com que a janela em volta da caixa ainda cabe no orçamento.
+        w, h = box[2] - box[0], box[3] - box[1]
+        return min(margin, int((math.sqrt((w - h) ** 2 + 4 * self.max_pixels) - (w + h)) / 4))
+
+    def stitch(self, image, box, members):
+        # O grupo é segmentado de novo numa janela em volta dele. Enquanto o contorno que contém o centro de algum
+        # pedaço ainda encostar na borda, a janela passa a envolvê-lo com o dobro da margem, até o orçamento: reduzida,
+        # a segmentação já não é a da imagem inteira, e numa pilha o que passa disso é fundo entre as toras. Só um
+        # grupo que já começa acima do orçamento é segmentado reduzido.
+        height, width = image.shape[:2]
+        centers = [box_center(member) for member in members]
+        margin = self.halo + self.overlap
+        region = None
+        for _ in range(MAX_STITCH_ROUNDS):
+            grow = margin if region is None else self.fitting_margin(box, margin)
+            grown = (max(0, box[0] - grow), max(0, box[1] - grow),
+                     min(width, box[2] + grow), min(height, box[3] + grow))
+            if grown == region:
+                break
+            region = grown
+            whole, cut, _ = self.detect_region(image, region)
+            cut = [other for other, cnt in cut if self.covers(other, cnt, centers)]
+            if not cut:
+                break
+            box = union_box([box] + cut)
+            if (box[2] - box[0] + 2 * self.overlap) * (box[3] - box[1] + 2 * self.overlap) > self.max_pixels:
+                # O contorno já passa do que cabe no orçamento com a borda de contexto: não sai inteiro nesta resolução.
+                break
+            margin *= 2
+
+        self.stitched += 1
+        return [(other, cnt) for other, cnt in whole if self.covers(other, cnt, centers)]
@@ -0,0 +1,177 @@
+import os
+import time
+
+import cv2
+
+from measure_core import MAX_DIMENSION, measure_image
+from instrumentation import span
+
+def parse_source(source):
+    if isinstance(source, int):
+        return source
+    return int(source) if str(source).isdigit() else source
+
+def open_capture(source):
+    source = parse_source(source)
+    if isinstance(source, int):
+        return cv2.VideoCapture(source)
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+
+class VideoSource():
+    def __init__(self, source, stride=1, every_seconds=None, keyframes_only=False, start_s=0.0, end_s=None,
+                 seek_threshold=None):
+        self.source = parse_source(source)
+        self.seekable = isinstance(self.source, str) and os.path.isfile(self.source)
+        if keyframes_only and not self.seekable:
+            raise ValueError("A leitura apenas de quadros-chave exige um arquivo de vídeo")
+
+        self.cap = open_capture(self.source)
+        if not self.cap.isOpened():
+            raise IOError(f"Não foi possível abrir a fonte de vídeo: {source}")
+
+        self.stride = max(1, stride)
+        self.every_seconds = every_seconds
+        self.keyframes_only = keyframes_only
+        self.start_s = start_s
+        self.end_s = end_s
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.seekable else None
+        self.seek_threshold = seek_threshold or int(2 * (self.fps or 30))
+        self.decoded = 0
+        self.skipped = 0
+        self.seeks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.cap.release()
+
+    def frames(self):
+        if self.keyframes_only:
+            return self._keyframes()
+        if self.seekable and self.fps:
+            return self._indexed_frames()
+        return self._stream_frames()
+
+    def _step(self):
+        if self.every_seconds and self.fps:
+            return max(self.stride, int(round(self.every_seconds * self.fps)))
+        return self.stride
+
+    def _seek(self, index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.seeks += 1
+
+    def _indexed_frames(self):
+        start = int(round(self.start_s * self.fps))
+        end = int(self.end_s * self.fps) if self.end_s is not None else None
+        step = self._step()
+
+        position = 0
+        target = start
+        while end is None or target <= end:
+            if self.frame_count and target >= self.frame_count:
+                return
+            gap = target - position
+            if gap >= self.seek_threshold:
+                self._seek(target)
+                self.skipped += gap
+            else:
+                for _ in range(gap):
+                    if not self.cap.grab():
+                        return
+                    self.skipped += 1
+
+            with span("decode"):
+                ok, frame = self.cap.read()
+            if not ok:
+                return
+            self.decoded += 1
+            yield target, target / self.fps, frame
+            position = target + 1
+            target += step
+
+    def _stream_frames(self):
+        index = -1
+        started = time.perf_counter()
+        next_sample = self.start_s
+        while True:
+            if not self.cap.grab():
+                return
+            index += 1
+            position_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            timestamp = position_ms / 1000 if position_ms > 0 or index == 0 else time.perf_counter() - started
+            if self.end_s is not None and timestamp > self.end_s:
+                return
+            if timestamp < next_sample or index % self.stride:
+                self.skipped += 1
+                continue
+
+            with span("decode"):
+                ok, frame = self.cap.retrieve()
+            if not ok:
+                return
+            self.decoded += 1
+            if self.every_seconds:
+                next_sample = timestamp + self.every_seconds
+            yield index, timestamp, frame
+
+    def _keyframes(self):
+        # Um segundo leitor só percorre os pacotes comprimidos; apenas os quadros-chave escolhidos são decodificados.
+        packets = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG)
+        packets.set(cv2.CAP_PROP_FORMAT, -1)
+        fps = self.fps or 30
+        next_sample = self.start_s
+        keyframe_count = 0
+        position = 0
+        try:
+            while packets.grab():
+                if not packets.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    continue
+                timestamp = packets.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                if self.end_s is not None and timestamp > self.end_s:
+                    return
+                if timestamp < next_sample:
+                    continue
+                keyframe_count += 1
+                if (keyframe_count - 1) % self.stride:
+                    continue
+
+                index = int(round(timestamp * fps))
+                if index != position:
+                    self._seek(index)
+                    self.skipped += max(0, index - position)
+                with span("decode"):
+                    ok, frame = self.cap.read()
+                if not ok:
+                    return
+                self.decoded += 1
+                position = index + 1
+                if self.every_seconds:
+                    next_sample = timestamp + self.every_seconds
+                yield index, timestamp, frame
+        finally:
+            packets.release()
+
+    def summary(self):
+        return f"{self.decoded} quadros decodificados, {self.skipped} pulados, {self.seeks} buscas"
+
+def measure_video(video, mode, marker_detector, object_detector=None, max_dimension=MAX_DIMENSION,
+                  calibrator=None, pyramid=False, log_length_m=None, perspective=False, marker_set=None):
+    for frame_index, timestamp, frame in video.frames():
+        start = time.perf_counter()
+        record = {"source": str(video.source), "frame_index": frame_index, "timestamp_s": timestamp}
+        try:
+            result, _ = measure_image(frame, mode, marker_detector, object_detector, max_dimension,
+                                      calibrator, pyramid, log_length_m, perspective, marker_set)
+            record.update(result)
+            if result["pixel_cm_ratio"] is None:
+                record["error"] = "marcador_nao_encontrado"
+        except cv2.error as e:
+            record["error"] = f"opencv: {e}"
+        record["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        yield record
@@ -1,75 +1,87 @@
+import argparse
+import os
 import sys
-sys.dont_write_bytecode = True
 
 import cv2
 from object_detector import *
+from geometry import contour_geometry, draw_rect_measurements
+from instrumentation import span
 import numpy as np
 
-if len(sys.argv) < 2:
-    print("Por favor, forneça o nome da imagem.")
-    print("Uso: python measure_object_size.py nome_da_imagem.jpg")
-    sys.exit(1)
+MARKER_SIZE_CM = 23.5
 
-parameters = cv2.aruco.DetectorParameters()
-aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
+def measure_object_size(img, detector=None):
+    if detector is None:
+        detector = HomogeneousBgDetector()
+    parameters = cv2.aruco.DetectorParameters()
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
 
-detector = HomogeneousBgDetector()
+    output_img = img.copy()
 
-img = cv2.imread(sys.argv[1])
-if img is None:
-    print(f"Erro: Não foi possível carregar a imagem {sys.argv[1]}")
-    sys.exit(1)
+    with span("detect_markers"):
+        corners, ids, _ = cv2.aruco.detectMarkers(img, aruco_dict, parameters=parameters)
 
-output_img = img.copy()
+    cv2.putText(output_img, "Status: " + ("Marcador detectado!" if corners else "Marcador não encontrado"),
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if corners else (0, 0, 255), 2)
 
-corners, ids, _ = cv2.aruco.detectMarkers(img, aruco_dict, parameters=parameters)
+    result = {"corners": corners, "ids": ids, "pixel_cm_ratio": None, "geometry": None}
+    if not corners:
+        return result, output_img
 
-cv2.putText(output_img, "Status: " + ("Marcador detectado!" if corners else "Marcador não encontrado"), 
-            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if corners else (0, 0, 255), 2)
+    if ids is not None:
+        cv2.putText(output_img, f"ID detectado: {ids[0][0]}", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-if not corners:
-    print("Erro: Marcador ArUco não encontrado na imagem")
-    cv2.imshow("Image", output_img)
-    cv2.waitKey(0)
-    sys.exit(1)
+    int_corners = np.int32(corners)
+    cv2.polylines(output_img, int_corners, True, (0, 255, 0), 5)
 
-if ids is not None:
-    cv2.putText(output_img, f"ID detectado: {ids[0][0]}", (10, 60), 
-               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    aruco_perimeter = cv2.arcLength(corners[0], True)
 
-int_corners = np.int32(corners)
-cv2.polylines(output_img, int_corners, True, (0, 255, 0), 5)
+    pixel_cm_ratio = aruco_perimeter / 94
 
-aruco_perimeter = cv2.arcLength(corners[0], True)
+    with span("segment"):
+        contours = detector.detect_objects(img)
 
-pixel_cm_ratio = aruco_perimeter / 94
+    geometry = contour_geometry(contours, pixel_cm_ratio, with_circles=False)
+    draw_rect_measurements(output_img, geometry)
 
-contours = detector.detect_objects(img)
+    cv2.putText(output_img, f"Marcador: {MARKER_SIZE_CM}x{MARKER_SIZE_CM}cm", (10, 90),
+               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-for cnt in contours:
+    result.update(pixel_cm_ratio=pixel_cm_ratio, geometry=geometry)
+    return result, output_img
 
-    rect = cv2.minAreaRect(cnt)
-    (x, y),(w, h), angle = rect
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede objetos em uma imagem com o marcador ArUco.")
+    parser.add_argument("image", help="Nome da imagem (ex.: nome_da_imagem.jpg)")
+    args = parser.parse_args(argv)
 
-    object_width = w / pixel_cm_ratio
-    object_height = h / pixel_cm_ratio
+    with span("decode"):
+        img = cv2.imread(args.image)
+    if img is None:
+        print(f"Erro: Não foi possível carregar a imagem {args.image}")
+        return 1
 
-    box = cv2.boxPoints(rect)
-    box = np.int32(box)
+    result, output_img = measure_object_size(img, HomogeneousBgDetector(debug=True))
 
-    cv2.circle(output_img, (int(x), int(y)), 5, (0, 0, 255), -1)
-    cv2.polylines(output_img, [box], True, (255, 0, 0), 2)
-    cv2.putText(output_img, "Width {} cm".format(round(object_width, 1)), (int(x - 100), int(y - 15)), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
-    cv2.putText(output_img, "Height {} cm".format(round(object_height, 1)), (int(x - 100), int(y + 15)), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
+    if result["pixel_cm_ratio"] is None:
+        print("Erro: Marcador ArUco não encontrado na imagem")
+        cv2.imshow("Image", output_img)
+        cv2.waitKey(0)
+        return 1
 
-marker_size = 23.5
-cv2.putText(output_img, f"Marcador: {marker_size}x{marker_size}cm", (10, 90), 
-           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    output_filename = os.path.join(os.path.dirname(args.image), "medidas_" + os.path.basename(args.image))
+    with span("write_image"):
+        saved = cv2.imwrite(output_filename, output_img)
+    if saved:
+        print(f"Imagem com medições salva como: {output_filename}")
+    else:
+        print(f"Erro: não foi possível salvar a imagem com medições em {output_filename}")
 
-output_filename = "medidas_" + sys.argv[1]
-cv2.imwrite(output_filename, output_img)
-print(f"Imagem com medições salva como: {output_filename}")
+    cv2.imshow("Image", output_img)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+    return 0 if saved else 1
 
-cv2.imshow("Image", output_img)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
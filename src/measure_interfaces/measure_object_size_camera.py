@@ -1,85 +1,185 @@
+import argparse
 import sys
-sys.dont_write_bytecode = True
 
 import cv2
 from object_detector import *
+from measure_core import MARKER_SIZE_CM, create_marker_detector, marker_homography, metric_geometry, \
+    pixel_cm_ratio_from_corners
+from live_pipeline import LivePipeline
+from marker_tracker import MarkerTracker
+from video_source import open_capture
+from smoothing import METHODS, ObjectTracker, Smoother
+from geometry import contour_geometry, draw_rect_measurements
+import instrumentation
+from instrumentation import span
 import numpy as np
 
-parameters = cv2.aruco.DetectorParameters()
-aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
+BUFFER_SIZE = 10
 
-detector = HomogeneousBgDetector()
+class CameraMeasurer():
+    def __init__(self, debug=True, tracking=False, buffer_size=BUFFER_SIZE, smoothing="mean", perspective=False):
+        self.perspective = perspective
+        self.marker_detector = create_marker_detector()
+        self.tracker = MarkerTracker(self.marker_detector) if tracking else None
+        self.detector = HomogeneousBgDetector(debug=debug)
+        self.marker_smoother = Smoother(buffer_size, dims=2, method=smoothing)
+        self.object_tracker = ObjectTracker(2, buffer_size, smoothing)
+
+    def measure(self, img):
+        with span("detect_markers"):
+            if self.tracker:
+                corners, ids, _ = self.tracker.update(img)
+            else:
+                corners, ids, _ = self.marker_detector.detectMarkers(img)
+        result = {"corners": corners, "ids": ids, "geometry": None}
+        if not corners:
+            return result
+
+        pixel_cm_ratio = pixel_cm_ratio_from_corners(corners[0])
 
-BUFFER_SIZE = 10
-width_buffer = []
-height_buffer = []
+        marker_points = corners[0][0]
+        marker_width = np.linalg.norm(marker_points[0] - marker_points[1]) / pixel_cm_ratio
+        marker_height = np.linalg.norm(marker_points[1] - marker_points[2]) / pixel_cm_ratio
 
-cap = cv2.VideoCapture(1)  
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        avg_width, avg_height = self.marker_smoother.update((marker_width, marker_height)).tolist()
+        result["avg_width"] = avg_width
+        result["avg_height"] = avg_height
 
-while True:
-    _, img = cap.read()
+        with span("segment"):
+            contours = self.detector.detect_objects(img)
 
-    corners, ids, _ = cv2.aruco.detectMarkers(img, aruco_dict, parameters=parameters)
-    
-    cv2.putText(img, "Status: " + ("Marcador detectado!" if corners else "Procurando marcador..."), 
-                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if corners else (0, 0, 255), 2)
-    
-    if corners:
-        if ids is not None:
-            cv2.putText(img, f"ID detectado: {ids[0][0]}", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        with span("geometry"):
+            geometry = contour_geometry(contours, pixel_cm_ratio, with_circles=False)
+            if self.perspective:
+                geometry["sizes_cm"] = metric_geometry(contours, marker_homography(marker_points),
+                                                       with_circles=False)["sizes"]
+            else:
+                correction_factor = MARKER_SIZE_CM / avg_width
+                geometry["sizes_cm"] *= correction_factor
 
-        int_corners = np.int32(corners)
-        cv2.polylines(img, int_corners, True, (0, 255, 0), 5)
+        with span("tracking"):
+            tracks = self.object_tracker.update(geometry["centers"], geometry["sizes_cm"])
+        geometry["track_ids"] = [track_id for track_id, _, _, _ in tracks]
+        geometry["sizes_cm"] = np.float64([estimate for _, estimate, _, _ in tracks]).reshape(-1, 2)
+        geometry["sizes_ci"] = np.float64([interval for _, _, interval, _ in tracks]).reshape(-1, 2)
+        result["geometry"] = geometry
 
-        aruco_perimeter = cv2.arcLength(corners[0], True)
+        return result
 
-        pixel_cm_ratio = aruco_perimeter / 94
+def draw_measurements(img, result):
+    corners, ids = result["corners"], result["ids"]
 
-        marker_points = corners[0][0]
-        marker_width = np.linalg.norm(marker_points[0] - marker_points[1]) / pixel_cm_ratio
-        marker_height = np.linalg.norm(marker_points[1] - marker_points[2]) / pixel_cm_ratio
-        
-        width_buffer.append(marker_width)
-        height_buffer.append(marker_height)
-        if len(width_buffer) > BUFFER_SIZE:
-            width_buffer.pop(0)
-            height_buffer.pop(0)
-        
-        avg_width = sum(width_buffer) / len(width_buffer)
-        avg_height = sum(height_buffer) / len(height_buffer)
-        
-        cv2.putText(img, f"Marcador: {avg_width:.1f}x{avg_height:.1f}cm", 
-                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        contours = detector.detect_objects(img)
-
-        for cnt in contours:
-
-            rect = cv2.minAreaRect(cnt)
-            (x, y),(w, h), angle = rect
-
-            object_width = w / pixel_cm_ratio
-            object_height = h / pixel_cm_ratio
-            
-            correction_factor = 23.5 / avg_width  
-            object_width *= correction_factor
-            object_height *= correction_factor
-
-            box = cv2.boxPoints(rect)
-            box = np.int32(box)
-
-            cv2.circle(img, (int(x), int(y)), 5, (0, 0, 255), -1)
-            cv2.polylines(img, [box], True, (255, 0, 0), 2)
-            cv2.putText(img, "Width {} cm".format(round(object_width, 1)), (int(x - 100), int(y - 15)), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
-            cv2.putText(img, "Height {} cm".format(round(object_height, 1)), (int(x - 100), int(y + 15)), cv2.FONT_HERSHEY_PLAIN, 2, (100, 200, 0), 2)
-
-    cv2.imshow("Image", img)
-    key = cv2.waitKey(1)
-    if key == 27:
-        break
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    cv2.putText(img, "Status: " + ("Marcador detectado!" if corners else "Procurando marcador..."),
+                (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0) if corners else (0, 0, 255), 2)
+
+    if not corners:
+        return
+
+    if ids is not None:
+        cv2.putText(img, f"ID detectado: {ids[0][0]}", (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    int_corners = np.int32(corners)
+    cv2.polylines(img, int_corners, True, (0, 255, 0), 5)
+
+    cv2.putText(img, f"Marcador: {result['avg_width']:.1f}x{result['avg_height']:.1f}cm",
+               (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    geometry = result["geometry"]
+    draw_rect_measurements(img, geometry)
+    for track_id, (x, y), (ci_w, ci_h) in zip(geometry["track_ids"], np.int32(geometry["centers"]).tolist(),
+                                             geometry["sizes_ci"].tolist()):
+        cv2.putText(img, f"#{track_id} +/-{ci_w:.1f} x {ci_h:.1f} cm", (x - 100, y + 45),
+                    cv2.FONT_HERSHEY_PLAIN, 1.5, (0, 200, 255), 2)
+
+def draw_stats(img, lines):
+    y = img.shape[0] - 15 - 25 * (len(lines) - 1)
+    for line in lines:
+        cv2.putText(img, line, (10, y), cv2.FONT_HERSHEY_PLAIN, 1.5, (0, 255, 255), 2)
+        y += 25
+
+def stats_lines(measurer, pipeline=None):
+    lines = pipeline.stats_lines() if pipeline else []
+    if measurer.tracker:
+        lines.append(measurer.tracker.summary())
+    return lines
+
+def print_stats(lines):
+    if lines:
+        print("\nDesempenho:")
+    for line in lines:
+        print(f"- {line}")
+
+def run_serial(cap, tracking=False, window=BUFFER_SIZE, smoothing="mean", perspective=False):
+    measurer = CameraMeasurer(tracking=tracking, buffer_size=window, smoothing=smoothing, perspective=perspective)
+    while True:
+        with span("decode"):
+            ok, img = cap.read()
+        if not ok:
+            # Fim do vídeo ou conexão perdida com a câmera/stream.
+            print("Fim da fonte de vídeo.")
+            break
+
+        result = measurer.measure(img)
+        with span("draw"):
+            draw_measurements(img, result)
+        if measurer.tracker:
+            draw_stats(img, stats_lines(measurer))
+
+        cv2.imshow("Image", img)
+        key = cv2.waitKey(1)
+        if key == 27:
+            break
+
+    print_stats(stats_lines(measurer))
+
+def run_pipelined(cap, tracking=False, window=BUFFER_SIZE, smoothing="mean", perspective=False):
+    measurer = CameraMeasurer(debug=False, tracking=tracking, buffer_size=window, smoothing=smoothing,
+                              perspective=perspective)
+    pipeline = None
+
+    def render(img, result):
+        with span("draw"):
+            draw_measurements(img, result)
+        draw_stats(img, stats_lines(measurer, pipeline))
+        cv2.imshow("Image", img)
+        return cv2.waitKey(1) != 27
+
+    pipeline = LivePipeline(cap, measurer.measure, render)
+    pipeline.run()
+
+    print_stats(stats_lines(measurer, pipeline))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Medição ao vivo pela câmera usando o marcador ArUco.")
+    parser.add_argument("--camera", default="1", help="Índice da câmera, arquivo de vídeo ou URL de stream")
+    parser.add_argument("--track", action="store_true", help="Rastreia o marcador entre quadros em vez de detectá-lo em cada quadro")
+    parser.add_argument("--serial", action="store_true", help="Executa captura, processamento e exibição em um único laço")
+    parser.add_argument("--smoothing", choices=METHODS, default="mean",
+                        help="Suavização das medidas entre quadros (média, mediana ou média aparada)")
+    parser.add_argument("--window", type=int, default=BUFFER_SIZE, help="Quadros na janela de suavização")
+    parser.add_argument("--perspective", action="store_true",
+                        help="Mede no plano do marcador pela homografia em vez do fator de correção pela largura")
+    parser.add_argument("--metrics",
+                        help="Mede o tempo de cada etapa e grava em JSON ou no formato texto do Prometheus (.prom)")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        instrumentation.enable()
+
+    cap = open_capture(args.camera)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+
+    if args.serial:
+        run_serial(cap, args.track, args.window, args.smoothing, args.perspective)
+    else:
+        run_pipelined(cap, args.track, args.window, args.smoothing, args.perspective)
+
+    cap.release()
+    cv2.destroyAllWindows()
+    if args.metrics:
+        instrumentation.write_report(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from measure_batch import collect_images
+from measure_service import DEFAULT_HOST, DEFAULT_PORT, read_head
+
+def quantile(values, q):
+    # Posto mais próximo sobre as latências ordenadas; exato, sem os buckets do instrumentation.
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+class LoadClient():
+    def __init__(self, url=None, socket_path=None):
+        parts = urlsplit(url or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.socket_path = socket_path
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.socket_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, target, body=b"", content_type="application/octet-stream"):
+        if self.writer is None:
+            await self.connect()
+        head = f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += f"Content-Type: {content_type}\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+        start_line, headers = await read_head(self.reader)
+        if not start_line:
+            raise ConnectionError("conexão encerrada pelo serviço")
+        payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return int(start_line[1]), payload
+
+def load_items(paths, send_paths):
+    if send_paths:
+        return [(json.dumps({"path": os.path.abspath(p)}).encode("utf-8"), "application/json", "/medir")
+                for p in paths]
+    items = []
+    for path in paths:
+        with open(path, "rb") as f:
+            items.append((f.read(), "application/octet-stream", f"/medir?nome={quote(os.path.basename(path))}"))
+    return items
+
+async def run_load(items, total, concurrency, url=None, socket_path=None):
+    counter = itertools.count()
+    samples = []
+
+    async def user():
+        client = LoadClient(url, socket_path)
+        try:
+            for i in counter:
+                if i >= total:
+                    break
+                body, content_type, target = items[i % len(items)]
+                start = time.perf_counter()
+                try:
+                    status, payload = await client.request("POST", target, body, content_type)
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    client.close()
+                    samples.append({"status": 0, "latency_ms": (time.perf_counter() - start) * 1000, "error": str(e)})
+                    continue
+                sample = {"status": status, "latency_ms": (time.perf_counter() - start) * 1000}
+                if status == 200:
+                    sample["elapsed_ms"] = json.loads(payload).get("elapsed_ms")
+                samples.append(sample)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+async def fetch_status(url=None, socket_path=None):
+    client = LoadClient(url, socket_path)
+    try:
+        status, payload = await client.request("GET", "/saude")
+    finally:
+        client.close()
+    return json.loads(payload) if status == 200 else None
+
+def summarize(samples, elapsed, concurrency):
+    ok = [s for s in samples if s["status"] == 200]
+    latencies = sorted(s["latency_ms"] for s in ok)
+    server_ms = [s["elapsed_ms"] for s in ok if s.get("elapsed_ms") is not None]
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "rejected": sum(1 for s in samples if s["status"] == 503),
+        "errors": sum(1 for s in samples if s["status"] not in (200, 503)),
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(samples) / elapsed if elapsed else 0.0,
+        "ok_per_s": len(ok) / elapsed if elapsed else 0.0,
+        "p50_ms": quantile(latencies, 0.50),
+        "p90_ms": quantile(latencies, 0.90),
+        "p99_ms": quantile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else None,
+        "server_mean_ms": sum(server_ms) / len(server_ms) if server_ms else None,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço de medição: latência e vazão.")
+    parser.add_argument("inputs", nargs="+", help="Diretórios, arquivos ou padrões glob das fotos enviadas")
+    parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", help="Endereço do serviço")
+    parser.add_argument("--socket", help="Socket Unix do serviço, no lugar da URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos, cada um com sua conexão")
+    parser.add_argument("--requests", type=int, default=200, help="Total de pedidos; as fotos se repetem em rodízio")
+    parser.add_argument("--paths", action="store_true",
+                        help="Envia só o caminho das fotos (o serviço lê do disco) em vez do arquivo")
+    parser.add_argument("--output", help="Grava o resumo em JSON")
+    parser.add_argument("--recursive", action="store_true", help="Percorre subdiretórios")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = collect_images(args.inputs, args.recursive)
+    if not paths:
+        print("Nenhuma imagem encontrada nas entradas informadas.")
+        return 1
+    items = load_items(paths, args.paths)
+
+    try:
+        service = asyncio.run(fetch_status(args.url, args.socket))
+    except OSError as e:
+        print(f"Erro: serviço indisponível em {args.socket or args.url}: {e}")
+        return 1
+    if service:
+        print(f"Serviço no modo {service['mode']} com {service['workers']} processos.")
+    print(f"Enviando {args.requests} pedidos de {len(items)} fotos com {args.concurrency} clientes...")
+
+    samples, elapsed = asyncio.run(run_load(items, args.requests, args.concurrency, args.url, args.socket))
+    summary = summarize(samples, elapsed, args.concurrency)
+
+    def ms(value):
+        return f"{value:.1f} ms" if value is not None else "-"
+
+    print("\n=== TESTE DE CARGA ===")
+    print(f"- Pedidos: {summary['requests']} (ok {summary['ok']}, recusados com a fila cheia {summary['rejected']}, "
+          f"erros {summary['errors']})")
+    print(f"- Tempo total: {summary['elapsed_s']:.2f} s")
+    print(f"- Vazão: {summary['requests_per_s']:.1f} pedidos/s ({summary['ok_per_s']:.1f} medidos/s)")
+    print(f"- Latência: p50 {ms(summary['p50_ms'])}, p90 {ms(summary['p90_ms'])}, p99 {ms(summary['p99_ms'])}, "
+          f"máx. {ms(summary['max_ms'])}")
+    print(f"- Tempo médio de medição no serviço: {ms(summary['server_mean_ms'])}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Resumo salvo em: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
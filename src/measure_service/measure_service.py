@@ -0,0 +1,440 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from measure_core import MAX_DIMENSION, MODES
+from calibration_cache import DEFAULT_CACHE_FILE
+from result_cache import DEFAULT_RESULT_CACHE, MAX_ENTRIES
+from tiling import DEFAULT_TILE_MEMORY_MB, parse_tile_memory
+from marker_set import marker_set_arg
+import instrumentation
+from instrumentation import span
+from station_profile import load_profile, resolve_max_dimension
+from parallel_runner import clear_result_cache, create_executor, process_chunk
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+MAX_UPLOAD_MB = 64
+MAX_HEADER_LINES = 100
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Erros que são do próprio pedido (imagem ruim), não do serviço.
+CLIENT_ERRORS = ("imagem_ilegivel",)
+
+async def read_head(reader):
+    # Linha inicial e cabeçalhos de uma mensagem HTTP/1.1; o corpo fica para quem chamou, que conhece o limite.
+    start_line = await reader.readline()
+    if not start_line:
+        return None, None
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return start_line.decode("latin-1").split(), headers
+
+def http_response(status, payload, keep_alive=True):
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        lines.append("Retry-After: 1")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1: {text}")
+    return value
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"não pode ser negativo: {text}")
+    return value
+
+def is_local_client(peername):
+    # Socket Unix não tem endereço; só quem tem acesso ao arquivo do socket conecta.
+    if not isinstance(peername, tuple):
+        return True
+    try:
+        return ipaddress.ip_address(peername[0]).is_loopback
+    except ValueError:
+        return False
+
+def upload_extension(name, data):
+    # O imread reconhece JPEG, PNG etc. pelo conteúdo, mas o MappedImage só abre .npy pela extensão.
+    ext = os.path.splitext(os.path.basename(name or ""))[1].lower()
+    if ext[1:].isalnum():
+        return ext
+    return ".npy" if data.startswith(b"\x93NUMPY") else ".img"
+
+def record_status(record):
+    error = record.get("error")
+    if error is None or error == "marcador_nao_encontrado":
+        return HTTPStatus.OK
+    if error in CLIENT_ERRORS:
+        return HTTPStatus.UNPROCESSABLE_ENTITY
+    return HTTPStatus.INTERNAL_SERVER_ERROR
+
+class MeasureService():
+    def __init__(self, options, workers=None, batch_size=8, queue_size=64, spool_dir=None,
+                 max_upload_mb=MAX_UPLOAD_MB, root=None):
+        if (workers or 0) < 0 or batch_size < 1 or queue_size < 1:
+            raise ValueError(f"workers, batch_size e queue_size inválidos: {workers}, {batch_size}, {queue_size}")
+        self.options = options
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_in_flight = self.workers * 2
+        self.max_upload = max_upload_mb << 20
+        self.spool_dir = spool_dir
+        self.own_spool = spool_dir is None
+        self.root = os.path.realpath(root) if root else None
+        self.executor = None
+        self.tasks = set()
+        self.in_flight = 0
+        self.uploads = 0
+        self.served = 0
+        self.rejected = 0
+        self.batches = 0
+        self.crashes = 0
+        self.started = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        if self.own_spool:
+            # Os envios viram arquivos para reaproveitar a leitura reduzida do JPEG e o cache de resultados; em
+            # /dev/shm não passam pelo disco.
+            self.spool_dir = tempfile.mkdtemp(prefix="medidor_servico_",
+                                              dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        else:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        self.executor = create_executor(self.options, self.workers)
+        # Os processos sobem e importam o OpenCV antes da primeira requisição, não durante ela.
+        await asyncio.gather(*(self.loop.run_in_executor(self.executor, process_chunk, [])
+                               for _ in range(self.workers)))
+        self.started = time.perf_counter()
+        self.spawn(self.batch_loop())
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.own_spool and self.spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def batch_loop(self):
+        while True:
+            await self.slots.acquire()
+            items = [await self.queue.get()]
+            # Junta o que chegou enquanto os workers estavam ocupados, repartido entre eles para nenhum ficar parado.
+            size = min(self.batch_size, self.queue.qsize() // self.workers + 1)
+            while len(items) < size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            self.spawn(self.run_batch(items))
+
+    async def run_batch(self, items):
+        paths = [path for path, _, _ in items]
+        now = time.perf_counter()
+        for _, _, queued_at in items:
+            instrumentation.METRICS.record("service_queue", (now - queued_at) * 1000)
+        executor = self.executor
+        self.in_flight += 1
+        try:
+            records, snapshot = await self.loop.run_in_executor(executor, process_chunk, paths)
+            instrumentation.METRICS.merge(snapshot)
+        except BrokenProcessPool:
+            # Um worker morreu (memória, falha do OpenCV): o lote volta com erro e o pool é recriado uma vez só, mesmo
+            # com vários lotes perdidos no pool antigo.
+            if executor is self.executor:
+                self.crashes += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = create_executor(self.options, self.workers)
+            records = [{"image": path, "error": "worker_encerrado_inesperadamente"} for path in paths]
+        except Exception as e:
+            # Qualquer outra falha do lote (pool já encerrado, resultado que não volta do worker) também responde cada
+            # pedido, em vez de deixá-lo esperando para sempre.
+            records = [{"image": path, "error": f"erro: {e}"} for path in paths]
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+        self.batches += 1
+        for (_, future, _), record in zip(items, records):
+            if not future.done():
+                future.set_result(record)
+
+    async def measure(self, path):
+        future = self.loop.create_future()
+        try:
+            self.queue.put_nowait((path, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            return None
+        return await future
+
+    async def measure_request(self, path, name):
+        record = await self.measure(path)
+        if record is None:
+            # Fila cheia: recusa na hora em vez de acumular pedidos que só seriam respondidos tarde demais.
+            self.rejected += 1
+            instrumentation.count("service_rejected")
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "fila_cheia"}
+        self.served += 1
+        record["image"] = name
+        return record_status(record), record
+
+    def resolve_path(self, path, local):
+        # Um pedido por caminho lê um arquivo do servidor: só dentro de --root ou, sem raiz, vindo da própria máquina.
+        if self.root is None:
+            return path if local else None
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        try:
+            inside = os.path.commonpath([resolved, self.root]) == self.root
+        except ValueError:
+            inside = False
+        return resolved if inside else None
+
+    async def handle_measure(self, query, headers, body, local=True):
+        if self.queue.full():
+            self.rejected += 1
+            instrumentation.count("service_rejected")
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "fila_cheia"}
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                path = json.loads(body)["path"]
+            except (ValueError, KeyError, TypeError):
+                path = None
+            if not isinstance(path, str):
+                return HTTPStatus.BAD_REQUEST, {"error": "esperado_json_com_path"}
+            resolved = self.resolve_path(path, local)
+            if resolved is None:
+                return HTTPStatus.FORBIDDEN, {"error": "caminho_nao_permitido"}
+            return await self.measure_request(resolved, path)
+        if not body:
+            return HTTPStatus.BAD_REQUEST, {"error": "corpo_vazio"}
+
+        name = query.get("nome", ["upload"])[0]
+        self.uploads += 1
+        spool_path = os.path.join(self.spool_dir, f"{self.uploads}{upload_extension(name, body)}")
+        # Escrita síncrona: no tmpfs alguns megabytes levam menos de um milissegundo.
+        with open(spool_path, "wb") as f:
+            f.write(body)
+        try:
+            return await self.measure_request(spool_path, name)
+        finally:
+            os.remove(spool_path)
+
+    def status(self):
+        return {
+            "status": "ok",
+            "mode": self.options["mode"],
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "batches_in_flight": self.in_flight,
+            "served": self.served,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "crashes": self.crashes,
+            "uptime_s": time.perf_counter() - self.started,
+        }
+
+    async def dispatch(self, method, target, headers, body, local=True):
+        url = urlsplit(target)
+        routes = {"/medir": "POST", "/saude": "GET", "/metricas": "GET"}
+        if url.path not in routes:
+            return HTTPStatus.NOT_FOUND, {"error": "rota_desconhecida"}
+        if method != routes[url.path]:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"use_{routes[url.path]}"}
+        if url.path == "/saude":
+            return HTTPStatus.OK, self.status()
+        if url.path == "/metricas":
+            return HTTPStatus.OK, instrumentation.METRICS.to_prometheus()
+        with span("service_request"):
+            return await self.handle_measure(parse_qs(url.query), headers, body, local)
+
+    async def handle_connection(self, reader, writer):
+        local = is_local_client(writer.get_extra_info("peername"))
+        try:
+            while True:
+                start_line, headers = await read_head(reader)
+                if not start_line:
+                    break
+                if len(start_line) != 3:
+                    writer.write(http_response(HTTPStatus.BAD_REQUEST, {"error": "requisicao_invalida"}, False))
+                    break
+                method, target, version = start_line
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if "transfer-encoding" in headers:
+                    writer.write(http_response(HTTPStatus.LENGTH_REQUIRED, {"error": "informe_content_length"}, False))
+                    break
+                length = headers.get("content-length", "0")
+                if not length.isdecimal():
+                    # Tamanho negativo ou que não é número: não há como saber onde o corpo termina.
+                    writer.write(http_response(HTTPStatus.BAD_REQUEST, {"error": "requisicao_invalida"}, False))
+                    break
+                length = int(length)
+                if length > self.max_upload:
+                    # O corpo não é lido: a conexão fecha em vez de gastar a banda com um envio que seria recusado.
+                    writer.write(http_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "envio_grande_demais"},
+                                               False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, headers, body, local)
+                writer.write(http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, on_ready=None):
+        await self.start()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # No Windows não há tratadores no laço; o Ctrl+C chega como KeyboardInterrupt.
+                pass
+        try:
+            if socket_path:
+                server = await asyncio.start_unix_server(self.handle_connection, socket_path)
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port)
+            async with server:
+                if on_ready:
+                    on_ready(self)
+                await stop.wait()
+        finally:
+            await self.close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serviço local de medição: recebe fotos ou caminhos por HTTP e devolve as medidas em JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta de escuta")
+    parser.add_argument("--socket", help="Escuta num socket Unix em vez da porta TCP")
+    parser.add_argument("--mode", choices=MODES, default="objects", help="Pipeline de medição")
+    parser.add_argument("--max-dimension", type=int,
+                        help=f"Dimensão máxima antes da medição (0 desativa; padrão: a do perfil ou {MAX_DIMENSION})")
+    parser.add_argument("--profile", help="Perfil JSON da estação gerado por tune_station.py (ArUco e segmentação)")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="Detecta na imagem reduzida e refina cantos e contornos na resolução original")
+    parser.add_argument("--tiled", nargs="?", type=parse_tile_memory, const=DEFAULT_TILE_MEMORY_MB, metavar="MB",
+                        help="Segmenta na resolução de --max-dimension em blocos que cabem em MB de memória")
+    parser.add_argument("--perspective", action="store_true",
+                        help="Mede no plano do marcador pela homografia, corrigindo fotos oblíquas")
+    parser.add_argument("--markers", type=marker_set_arg,
+                        help="Vários marcadores: IDs e tamanhos (ex.: 0,1,2:15 ou *:23.5) ou arquivo JSON do quadro")
+    parser.add_argument("--log-length", type=float,
+                        help="Comprimento das toras em metros, para estimar o volume no modo pile")
+    parser.add_argument("--station", help="ID da estação; ativa o cache de calibração da escala")
+    parser.add_argument("--calibration-cache", default=DEFAULT_CACHE_FILE, help="Arquivo do cache de calibração")
+    parser.add_argument("--verify-every", type=int, default=100, help="Reverifica o marcador a cada N imagens")
+    parser.add_argument("--result-cache", nargs="?", const=DEFAULT_RESULT_CACHE,
+                        help="Reaproveita resultados de imagens e parâmetros já medidos (banco SQLite)")
+    parser.add_argument("--result-cache-size", type=int, default=MAX_ENTRIES,
+                        help="Número máximo de resultados no cache; os usados há mais tempo saem primeiro")
+    parser.add_argument("--result-cache-clear", action="store_true",
+                        help="Remove do cache os resultados de outros parâmetros, modos ou versões antes de começar")
+    parser.add_argument("--workers", type=non_negative_int, default=0,
+                        help="Processos de medição (0 usa todos os núcleos)")
+    parser.add_argument("--batch-size", type=positive_int, default=8,
+                        help="Máximo de pedidos enviados de uma vez a um processo")
+    parser.add_argument("--queue-size", type=positive_int, default=64,
+                        help="Pedidos aguardando na fila; acima disso o serviço responde 503")
+    parser.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD_MB, help="Tamanho máximo de cada envio")
+    parser.add_argument("--root",
+                        help="Pedidos com JSON {\"path\": ...} só leem arquivos nesta pasta (caminhos relativos a "
+                             "ela); sem ela, só clientes da própria máquina podem enviar caminhos")
+    parser.add_argument("--spool-dir", help="Diretório das fotos recebidas durante a medição (padrão: temporário)")
+    parser.add_argument("--metrics", help="Grava o tempo de cada etapa ao encerrar, em JSON ou texto do Prometheus")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        profile = load_profile(args.profile, args.mode) if args.profile else None
+    except (OSError, ValueError) as e:
+        print(f"Erro: não foi possível carregar o perfil: {e}")
+        return 1
+
+    # As métricas ficam sempre ligadas: /metricas é a forma de acompanhar um serviço que não termina.
+    instrumentation.enable()
+    options = {
+        "mode": args.mode,
+        "max_dimension": resolve_max_dimension(args.max_dimension, profile),
+        "pyramid": args.pyramid,
+        "station": args.station,
+        "calibration_cache": args.calibration_cache,
+        "verify_every": args.verify_every,
+        "log_length": args.log_length,
+        "perspective": args.perspective,
+        "markers": args.markers,
+        "result_cache": args.result_cache,
+        "result_cache_size": args.result_cache_size,
+        "metrics": True,
+        "profile": profile,
+        "tile_memory": args.tiled,
+    }
+    if args.result_cache and args.station:
+        print("Aviso: o cache de resultados é ignorado com --station.")
+    elif args.result_cache and args.result_cache_clear:
+        print(f"Removidos {clear_result_cache(options)} resultados antigos do cache de resultados.")
+
+    service = MeasureService(options, args.workers, args.batch_size, args.queue_size, args.spool_dir,
+                             args.max_upload_mb, args.root)
+    address = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+
+    def on_ready(service):
+        print(f"Serviço de medição ({args.mode}) com {service.workers} processos em {address}. Ctrl+C encerra.")
+        print("POST /medir (foto no corpo ou JSON {\"path\": ...}), GET /saude, GET /metricas")
+        sys.stdout.flush()
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket, on_ready))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Erro: não foi possível escutar em {address}: {e}")
+        return 1
+
+    print(f"\nPedidos atendidos: {service.served}, recusados com a fila cheia: {service.rejected}, "
+          f"lotes: {service.batches}")
+    if service.crashes:
+        print(f"Reinícios do pool após falha de processo: {service.crashes}")
+    if args.metrics:
+        instrumentation.write_report(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import json
+import sys
+
+from measure_core import MAX_DIMENSION, MODES
+from smoothing import METHODS
+from results_store import ResultStore, is_store_path
+from marker_set import marker_set_arg, parse_marker_set
+import instrumentation
+from instrumentation import span
+from station_profile import load_profile, resolve_max_dimension
+from multi_feed import Feed, FeedMeasurer, StationServer, stats_lines
+
+def parse_feed(text):
+    name, sep, source = text.partition("=")
+    if not sep:
+        return f"camera{text}", text
+    return name, source
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Estação com várias câmeras medidas ao mesmo tempo.")
+    parser.add_argument("--feed", action="append", type=parse_feed, required=True,
+                        help="Câmera no formato nome=fonte (índice, arquivo ou URL); repita para cada câmera")
+    parser.add_argument("--mode", choices=MODES, default="objects", help="Pipeline de medição")
+    parser.add_argument("--workers", type=int, help="Threads de medição compartilhadas (padrão: uma por câmera)")
+    parser.add_argument("--max-dimension", type=int,
+                        help=f"Dimensão máxima antes da medição (0 desativa; padrão: a do perfil ou {MAX_DIMENSION})")
+    parser.add_argument("--profile", help="Perfil JSON da estação gerado por tune_station.py (ArUco e segmentação)")
+    parser.add_argument("--smoothing", choices=METHODS, default="mean",
+                        help="Suavização das medidas de cada tora entre quadros (média, mediana ou média aparada)")
+    parser.add_argument("--window", type=int, default=10, help="Quadros na janela de suavização")
+    parser.add_argument("--perspective", action="store_true",
+                        help="Mede no plano do marcador pela homografia, corrigindo fotos oblíquas")
+    parser.add_argument("--markers", type=marker_set_arg,
+                        help="Vários marcadores: IDs e tamanhos (ex.: 0,1,2:15 ou *:23.5) ou arquivo JSON do quadro")
+    parser.add_argument("--output", help="Salva os registros de cada quadro medido em JSONL ou em um banco SQLite (.db)")
+    parser.add_argument("--station", help="ID da estação gravado junto dos registros no banco")
+    parser.add_argument("--stats-every", type=float, default=5.0, help="Intervalo entre relatórios de desempenho (s)")
+    parser.add_argument("--stats-file", help="Arquivo JSON atualizado com as métricas a cada relatório")
+    parser.add_argument("--metrics",
+                        help="Tempo de cada etapa em JSON ou texto do Prometheus (.prom), reescrito a cada relatório")
+    parser.add_argument("--duration", type=float, help="Encerra depois de N segundos")
+    parser.add_argument("--paced", action="store_true", help="Lê arquivos de vídeo no ritmo do FPS, como uma câmera")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        profile = load_profile(args.profile, args.mode) if args.profile else None
+    except (OSError, ValueError) as e:
+        print(f"Erro: não foi possível carregar o perfil: {e}")
+        return 1
+    max_dimension = resolve_max_dimension(args.max_dimension, profile)
+
+    marker_set = parse_marker_set(args.markers)
+    feeds = []
+    try:
+        for name, source in args.feed:
+            measurer = FeedMeasurer(args.mode, max_dimension, args.window, args.smoothing, args.perspective,
+                                    marker_set, profile)
+            feeds.append(Feed(name, source, measurer, args.paced))
+    except IOError as e:
+        print(f"Erro: {e}")
+        for feed in feeds:
+            feed.close()
+        return 1
+
+    store = ResultStore(args.output, args.station, args.mode) if args.output and is_store_path(args.output) else None
+    output = open(args.output, "w", encoding="utf-8") if args.output and not store else None
+
+    def on_result(feed, record):
+        with span("write_results"):
+            if store:
+                store.write(record)
+            elif output:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def on_stats(stats):
+        print("\n" + "\n".join(stats_lines(stats)))
+        if args.stats_file:
+            with open(args.stats_file, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+        if args.metrics:
+            instrumentation.METRICS.write(args.metrics)
+
+    server = StationServer(feeds, args.workers)
+    print(f"Estação com {len(feeds)} câmeras e {server.workers} workers. Ctrl+C encerra.")
+    try:
+        stats = server.run(on_result, on_stats, args.stats_every, args.duration)
+    except KeyboardInterrupt:
+        stats = server.stats()
+    finally:
+        if store:
+            store.close()
+        if output:
+            output.close()
+
+    print("\n=== RESUMO DA ESTAÇÃO ===")
+    on_stats(stats)
+    print(f"- Quadros medidos: {stats['processed']} ({stats['average_fps']:.1f} fps em média)")
+    if args.metrics:
+        instrumentation.write_report(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
+import argparse
+import os
 import sys
-sys.dont_write_bytecode = True
 
 import cv2
 import numpy as np
+from measure_core import create_detector_parameters
+from calibration_cache import CalibrationCache, calibration_entry, matching_entry
+from instrumentation import span
 
 IMAGE_FILE = "troncoSemSombra.jpeg"  
 
@@ -28,11 +32,7 @@ def try_detect_marker(image):
     print(f"- Canais: {image.shape[2]}")
     print("\nParâmetros do detector:")
     
-    parameters = cv2.aruco.DetectorParameters()
-    parameters.adaptiveThreshWinSizeMin = 3
-    parameters.adaptiveThreshWinSizeMax = 23
-    parameters.adaptiveThreshWinSizeStep = 10
-    parameters.adaptiveThreshConstant = 7
+    parameters = create_detector_parameters("trunk")
     
     print(f"- Tamanho mínimo da janela adaptativa: {parameters.adaptiveThreshWinSizeMin}")
     print(f"- Tamanho máximo da janela adaptativa: {parameters.adaptiveThreshWinSizeMax}")
@@ -40,7 +40,8 @@ def try_detect_marker(image):
     print(f"- Constante adaptativa: {parameters.adaptiveThreshConstant}")
     
     aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
-    corners, ids, _ = cv2.aruco.detectMarkers(image, aruco_dict, parameters=parameters)
+    with span("detect_markers"):
+        corners, ids, _ = cv2.aruco.detectMarkers(image, aruco_dict, parameters=parameters)
     
     print("\nResultados da detecção:")
     print(f"- Marcadores encontrados: {len(corners) if corners else 0}")
@@ -67,16 +68,23 @@ def try_detect_marker(image):
     print("\n=== FIM DA DETECÇÃO DO MARCADOR ===")
     return corners, ids
 
-def main():
+def main(argv=None):
     global img_copy
+
+    parser = argparse.ArgumentParser(description="Medição manual do diâmetro de um tronco clicando em dois pontos.")
+    parser.add_argument("image", nargs="?", default=IMAGE_FILE, help="Foto do tronco")
+    parser.add_argument("--station", help="ID da estação; ativa o cache de calibração da escala")
+    args = parser.parse_args(argv)
+    image_file, station_id = args.image, args.station
     
     print("\n=== INICIANDO PROCESSAMENTO ===")
-    print(f"Arquivo de entrada: {IMAGE_FILE}")
+    print(f"Arquivo de entrada: {image_file}")
     
-    img = cv2.imread(IMAGE_FILE)
+    with span("decode"):
+        img = cv2.imread(image_file)
     if img is None:
-        print(f"Erro: Não foi possível carregar a imagem {IMAGE_FILE}")
-        sys.exit(1)
+        print(f"Erro: Não foi possível carregar a imagem {image_file}")
+        return 1
 
     height, width = img.shape[:2]
     print("\nDimensões da imagem:")
@@ -91,7 +99,8 @@ def main():
         scale = max_dimension / max(width, height)
         new_width = int(width * scale)
         new_height = int(height * scale)
-        img = cv2.resize(img, (new_width, new_height))
+        with span("resize"):
+            img = cv2.resize(img, (new_width, new_height))
         print("\nRedimensionamento:")
         print(f"- Dimensão máxima permitida: {max_dimension} pixels")
         print(f"- Nova largura: {new_width} pixels")
@@ -105,6 +114,9 @@ def main():
     corners, ids = try_detect_marker(img)
     
     pixel_cm_ratio = None
+    # Sem --station nada é lido nem gravado em calibracao.json.
+    cache = CalibrationCache() if station_id else None
+    cached = matching_entry(cache, station_id, img) if cache else None
     
     if corners and len(corners) > 0:
         print("\n=== ANÁLISE DO MARCADOR ENCONTRADO ===")
@@ -133,6 +145,14 @@ def main():
         print(f"- Razão pixel/cm: {pixel_cm_ratio:.2f}")
         print(f"- 1 cm = {pixel_cm_ratio:.1f} pixels")
         print(f"- 1 pixel = {1/pixel_cm_ratio:.3f} cm")
+
+        if cache:
+            cache.store(station_id, calibration_entry(img, corners, ids))
+    elif cached:
+        pixel_cm_ratio = cached["pixel_cm_ratio"]
+        print("\nMarcador ArUco não encontrado.")
+        print(f"Usando a calibração em cache da estação '{station_id}':")
+        print(f"- Razão pixel/cm: {pixel_cm_ratio:.2f}")
     else:
         print("\nMarcador ArUco não encontrado.")
         print("Você precisará fornecer a medida de referência manualmente.")
@@ -190,16 +210,21 @@ def main():
                           (mid_point[0]-100, mid_point[1]-20),
                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
                 
-                output_filename = "medidas_" + IMAGE_FILE
-                cv2.imwrite(output_filename, img_copy)
-                print(f"\nArquivo de saída:")
-                print(f"- Nome: {output_filename}")
+                output_filename = os.path.join(os.path.dirname(image_file), "medidas_" + os.path.basename(image_file))
+                with span("write_image"):
+                    saved = cv2.imwrite(output_filename, img_copy)
+                if saved:
+                    print(f"\nArquivo de saída:")
+                    print(f"- Nome: {output_filename}")
+                else:
+                    print(f"\nErro: não foi possível salvar a imagem em {output_filename}")
                 print("=== FIM DO PROCESSAMENTO ===")
         
         elif key == ord('q'):
             break
 
     cv2.destroyAllWindows()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
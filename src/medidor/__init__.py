@@ -0,0 +1,82 @@
+import importlib
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_DIRS = ("object_detector", "measure_core", "measure_batch", "measure_service", "measure_types",
+               "measure_interfaces")
+
+# Os módulos do projeto se importam pelo nome (from object_detector import *); o pacote coloca os diretórios no caminho
+# de busca no lugar do PYTHONPATH manual. Nada pesado é importado aqui: cv2 e numpy só entram no primeiro acesso à API.
+for _name in MODULE_DIRS:
+    _path = os.path.join(SRC_DIR, _name)
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+API = {
+    "MAX_DIMENSION": "measure_core",
+    "MODES": "measure_core",
+    "MARKER_SIZE_CM": "measure_core",
+    "create_marker_detector": "measure_core",
+    "measure_image": "measure_core",
+    "measure_image_file": "measure_core",
+    "annotate_image": "measure_core",
+    "HomogeneousBgDetector": "object_detector",
+    "TrunkDetector": "object_detector",
+    "PileDetector": "object_detector",
+    "create_object_detector": "object_detector",
+    "detect_tree_trunk": "object_detector",
+    "detect_log_pile": "object_detector",
+    "LazyImage": "image_loader",
+    "load_image": "image_loader",
+    "MappedImage": "image_loader",
+    "TiledDetector": "tiling",
+    "MarkerSet": "marker_set",
+    "parse_marker_set": "marker_set",
+    "VideoSource": "video_source",
+    "measure_video": "video_source",
+    "CalibrationCache": "calibration_cache",
+    "StationCalibrator": "calibration_cache",
+    "ObjectTracker": "smoothing",
+    "Smoother": "smoothing",
+    "ResultStore": "results_store",
+    "connect": "results_store",
+    "query_measurements": "results_store",
+    "query_track": "results_store",
+    "summarize": "results_store",
+    "ResultCache": "result_cache",
+    "ParallelRunner": "parallel_runner",
+    "create_measure_state": "parallel_runner",
+    "measure_path": "parallel_runner",
+    "close_measure_state": "parallel_runner",
+    "MeasureService": "measure_service",
+    "measure_photo": "measure_from_photo",
+    "measure_trunk_photo": "measure_object_size_trunk",
+    "measure_object_size": "measure_object_size",
+    "StationTuner": "station_profile",
+    "load_profile": "station_profile",
+    "profile_detectors": "station_profile",
+    "METRICS": "instrumentation",
+    "Metrics": "instrumentation",
+}
+
+__all__ = sorted(API) + ["measure_files"]
+
+def __getattr__(name):
+    module = API.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(API))
+
+def measure_files(paths, workers=1, chunk_size=8, **options):
+    # Mesmas opções do lote (mode, max_dimension, perspective, markers, profile, ...); devolve um registro por
+    # imagem, em ordem.
+    from parallel_runner import ParallelRunner, measure_serial
+    if workers != 1:
+        return ParallelRunner(options, workers, chunk_size).run(list(paths))
+    return measure_serial(options, paths)
@@ -0,0 +1,54 @@
+import importlib
+import os
+import sys
+
+from medidor import SRC_DIR
+
+COMMANDS = {
+    "lote": ("measure_batch", "measure_batch", "Medição em lote de diretórios de fotos"),
+    "video": ("measure_batch", "measure_video", "Medição de vídeos, câmeras ou streams, quadro a quadro"),
+    "estacao": ("measure_station", "measure_station", "Estação com várias câmeras medidas ao mesmo tempo"),
+    "consulta": ("measure_batch", "query_results", "Consulta o banco de medições"),
+    "ajustar": ("measure_batch", "tune_station", "Ajusta os parâmetros de uma estação e grava o perfil"),
+    "servico": ("measure_service", "measure_service", "Serviço HTTP de medição com fila e pool de processos"),
+    "carga": ("measure_service", "load_test", "Teste de carga do serviço: latência p50/p99 e vazão"),
+    "camera": ("measure_interfaces", "measure_object_size_camera", "Medição ao vivo pela câmera, com janela"),
+    "objetos": ("measure_interfaces", "measure_object_size", "Mede objetos em uma imagem, com janela"),
+    "foto": ("measure_types", "measure_from_photo", "Mede objetos em uma foto reduzida, com janela"),
+    "tronco": ("measure_types", "measure_object_size_trunk", "Mede troncos em uma foto, com janelas de depuração"),
+    "manual": ("measure_types", "measure_manual_trunk", "Medição manual do diâmetro clicando em dois pontos"),
+    "cameras": ("list_cameras", "list_cameras", "Lista as câmeras disponíveis"),
+    "marcador": ("generate_marker", "generate_marker", "Gera a imagem de um marcador ArUco"),
+    "dataset": ("generate_marker", "generate_dataset", "Gera o conjunto sintético de avaliação"),
+    "benchmark": ("benchmark", "benchmark", "Mede o tempo de cada etapa do pipeline"),
+    "avaliar": ("benchmark", "evaluate_dataset", "Avalia a precisão no conjunto sintético"),
+}
+
+def print_usage():
+    print("Uso: python -m medidor <comando> [opções]\n")
+    print("Comandos:")
+    for name, (_, _, description) in COMMANDS.items():
+        print(f"  {name:<10} {description}")
+    print("\nUse python -m medidor <comando> --help para as opções de cada comando.")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print_usage()
+        return 0
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        print(f"Comando desconhecido: {argv[0]}\n")
+        print_usage()
+        return 2
+
+    # Só o módulo do comando escolhido é importado; consultas e --help não carregam o OpenCV à toa.
+    directory, module, _ = command
+    path = os.path.join(SRC_DIR, directory)
+    if path not in sys.path:
+        sys.path.append(path)
+    sys.argv[0] = f"medidor {argv[0]}"
+    return importlib.import_module(module).main(argv[1:])
+
+if __name__ == "__main__":
+    sys.exit(main())
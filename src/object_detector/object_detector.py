@@ -1,27 +1,257 @@
 import cv2
+import numpy as np
 
 class HomogeneousBgDetector():
-    def __init__(self):
-        pass
+    mode = "objects"
 
-    def detect_objects(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def __init__(self, block_size=19, c=5, min_area=1000, debug=False):
+        self.block_size = block_size
+        self.c = c
+        self.min_area = min_area
+        self.debug = debug
+        self.gray = None
+        self.mask = None
+        self.mask_debug = None
+
+    def _prepare_buffers(self, shape):
+        if self.mask is None or self.mask.shape != shape:
+            self.gray = np.empty(shape, np.uint8)
+            self.mask = np.empty(shape, np.uint8)
+            self.mask_debug = None
 
-        mask = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 19, 5)
+    def segment(self, frame):
+        self._prepare_buffers(frame.shape[:2])
 
-        cv2.imshow("Mask - Objetos detectados em branco", mask)
+        gray = frame
+        if frame.ndim == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
 
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV,
+                                     self.block_size, self.c, dst=self.mask)
+
+    def filter_contours(self, mask):
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return self.select(contours), contours
+
+    def candidates(self, frame):
+        contours, _ = cv2.findContours(self.segment(frame), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    def select(self, contours):
+        return [cnt for cnt in contours if cv2.contourArea(cnt) > self.min_area]
+
+    def detect_objects(self, frame):
+        mask = self.segment(frame)
 
-        objects_contours = []
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area > 1000:  
-                objects_contours.append(cnt)
+        if self.debug:
+            cv2.imshow("Mask - Objetos detectados em branco", mask)
 
-        mask_debug = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
-        cv2.drawContours(mask_debug, contours, -1, (0,255,0), 2)
-        cv2.imshow("Contornos detectados", mask_debug)
+        objects_contours, contours = self.filter_contours(mask)
 
-        print(f"Número de objetos detectados: {len(objects_contours)}")
+        if self.debug:
+            self.mask_debug = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR, dst=self.mask_debug)
+            cv2.drawContours(self.mask_debug, contours, -1, (0,255,0), 2)
+            cv2.imshow("Contornos detectados", self.mask_debug)
+
+            print(f"Número de objetos detectados: {len(objects_contours)}")
         return objects_contours
+
+    def params(self):
+        return {"block_size": self.block_size, "c": self.c, "min_area": self.min_area}
+
+    def scaled(self, scale):
+        return HomogeneousBgDetector(odd(self.block_size / scale), self.c, self.min_area / (scale * scale))
+
+def odd(value, minimum=3):
+    value = max(minimum, int(round(value)))
+    return value if value % 2 else value + 1
+
+def segment_tree_trunk(image, blur_size=15, block_size=21, c=2, kernel_size=7):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+
+    binary = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY_INV, block_size, c)
+
+    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+    cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+
+    return binary, cleaned
+
+def filter_round_contours(contours, min_area, min_circularity):
+    valid_contours = []
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+        perimeter = cv2.arcLength(cnt, True)
+        if perimeter == 0:
+            continue
+
+        circularity = 4 * np.pi * area / (perimeter * perimeter)
+
+        if area > min_area and circularity > min_circularity:
+            valid_contours.append(cnt)
+
+    valid_contours.sort(key=cv2.contourArea, reverse=True)
+
+    return valid_contours
+
+def filter_trunk_contours(cleaned, min_area=5000, min_circularity=0.4):
+    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return filter_round_contours(contours, min_area, min_circularity)
+
+def detect_tree_trunk(image, blur_size=15, block_size=21, c=2, kernel_size=7, min_area=5000, min_circularity=0.4):
+    binary, cleaned = segment_tree_trunk(image, blur_size, block_size, c, kernel_size)
+    valid_contours = filter_trunk_contours(cleaned, min_area, min_circularity)
+    return valid_contours, binary, cleaned
+
+class TrunkDetector():
+    mode = "trunk"
+
+    def __init__(self, blur_size=15, block_size=21, c=2, kernel_size=7, min_area=5000, min_circularity=0.4):
+        self.blur_size = blur_size
+        self.block_size = block_size
+        self.c = c
+        self.kernel_size = kernel_size
+        self.min_area = min_area
+        self.min_circularity = min_circularity
+
+    def segment(self, image):
+        return segment_tree_trunk(image, self.blur_size, self.block_size, self.c, self.kernel_size)[1]
+
+    def filter_contours(self, cleaned):
+        return filter_trunk_contours(cleaned, self.min_area, self.min_circularity)
+
+    def detect_objects(self, image):
+        return self.filter_contours(self.segment(image))
+
+    def candidates(self, image):
+        contours, _ = cv2.findContours(self.segment(image), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    def select(self, contours):
+        return filter_round_contours(contours, self.min_area, self.min_circularity)
+
+    def params(self):
+        return {"blur_size": self.blur_size, "block_size": self.block_size, "c": self.c,
+                "kernel_size": self.kernel_size, "min_area": self.min_area, "min_circularity": self.min_circularity}
+
+    def scaled(self, scale):
+        return TrunkDetector(odd(self.blur_size / scale), odd(self.block_size / scale), self.c,
+                             odd(self.kernel_size / scale), self.min_area / (scale * scale), self.min_circularity)
+
+def fill_small_holes(mask, max_hole_area):
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return mask
+    holes = [cnt for cnt, (_, _, _, parent) in zip(contours, hierarchy[0])
+             if parent >= 0 and cv2.contourArea(cnt) < max_hole_area]
+    cv2.drawContours(mask, holes, -1, 255, -1)
+    return mask
+
+def otsu_threshold(hist):
+    # Mesmo critério do THRESH_OTSU (maior variância entre classes), a partir de um histograma somado por partes.
+    hist = np.float64(hist).ravel() / max(1.0, float(np.sum(hist)))
+    omega = np.cumsum(hist)
+    mu = np.cumsum(hist * np.arange(hist.size))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return float(np.argmax(np.nan_to_num(sigma, nan=-1.0, posinf=-1.0)))
+
+def segment_log_pile(image, blur_size=5, block_size=51, c=5, open_size=3, max_hole_area=50, threshold=None):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+
+    faces = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                  cv2.THRESH_BINARY, block_size, c)
+    # O limiar de Otsu depende da imagem inteira; quem segmenta por blocos passa o valor calculado uma vez.
+    if threshold is None:
+        _, bright = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        _, bright = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    cv2.bitwise_and(faces, bright, dst=faces)
+    kernel = np.ones((open_size, open_size), np.uint8)
+    faces = cv2.morphologyEx(faces, cv2.MORPH_OPEN, kernel)
+    return fill_small_holes(faces, max_hole_area)
+
+def largest_contour(region, x=0, y=0):
+    contours, _ = cv2.findContours(np.uint8(region), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return max(contours, key=cv2.contourArea) + np.int32([x, y])
+
+def split_touching_logs(faces, min_radius=12, peak_ratio=0.7):
+    dist = cv2.distanceTransform(faces, cv2.DIST_L2, 5)
+
+    window = 2 * int(min_radius) + 1
+    local_max = cv2.dilate(dist, np.ones((window, window), np.uint8))
+    peaks = (dist >= peak_ratio * local_max) & (dist >= min_radius)
+    if not peaks.any():
+        return []
+
+    # Cada pixel de face vai para o núcleo mais próximo; toras encostadas se dividem na linha de contato.
+    _, nearest = cv2.distanceTransformWithLabels(np.uint8(~peaks), cv2.DIST_L2, 5,
+                                                 labelType=cv2.DIST_LABEL_CCOMP)
+    nearest[faces == 0] = 0
+    borders = np.zeros(nearest.shape, bool)
+    borders[:, 1:] = nearest[:, 1:] != nearest[:, :-1]
+    borders[1:, :] |= nearest[1:, :] != nearest[:-1, :]
+    nearest[borders] = 0
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(np.uint8(nearest > 0), connectivity=4)
+    contours = []
+    for label in range(1, count):
+        x, y, w, h, _ = stats[label]
+        contours.append(largest_contour(labels[y:y + h, x:x + w] == label, x, y))
+    return contours
+
+def detect_log_pile(image, blur_size=5, block_size=51, c=5, min_radius=12, peak_ratio=0.7,
+                    min_area=300, min_circularity=0.7):
+    faces = segment_log_pile(image, blur_size, block_size, c)
+    contours = split_touching_logs(faces, min_radius, peak_ratio)
+    valid_contours = filter_round_contours(contours, min_area, min_circularity)
+    return valid_contours, faces
+
+class PileDetector():
+    mode = "pile"
+
+    def __init__(self, blur_size=5, block_size=51, c=5, min_radius=12, peak_ratio=0.7, min_area=300,
+                 min_circularity=0.7, threshold=None):
+        self.blur_size = blur_size
+        self.block_size = block_size
+        self.c = c
+        self.min_radius = min_radius
+        self.peak_ratio = peak_ratio
+        self.min_area = min_area
+        self.min_circularity = min_circularity
+        self.threshold = threshold
+
+    def segment(self, image):
+        return segment_log_pile(image, self.blur_size, self.block_size, self.c, threshold=self.threshold)
+
+    def split(self, faces):
+        return split_touching_logs(faces, self.min_radius, self.peak_ratio)
+
+    def filter_contours(self, contours):
+        return filter_round_contours(contours, self.min_area, self.min_circularity)
+
+    def detect_objects(self, image):
+        return self.filter_contours(self.split(self.segment(image)))
+
+    def candidates(self, image):
+        return self.split(self.segment(image))
+
+    def select(self, contours):
+        return self.filter_contours(contours)
+
+    def params(self):
+        return {"blur_size": self.blur_size, "block_size": self.block_size, "c": self.c,
+                "min_radius": self.min_radius, "peak_ratio": self.peak_ratio, "min_area": self.min_area,
+                "min_circularity": self.min_circularity, "threshold": self.threshold}
+
+    def scaled(self, scale):
+        return PileDetector(odd(self.blur_size / scale), odd(self.block_size / scale), self.c, self.min_radius / scale,
+                            self.peak_ratio, self.min_area / (scale * scale), self.min_circularity, self.threshold)
+
+DETECTORS = {"objects": HomogeneousBgDetector, "trunk": TrunkDetector, "pile": PileDetector}
+
+def create_object_detector(mode="objects", params=None):
+    return DETECTORS[mode](**(params or {}))
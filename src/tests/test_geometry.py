@@ -0,0 +1,23 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from geometry import box_points
+
+def test_box_points_matches_opencv():
+    rng = np.random.default_rng(3)
+    rects = np.column_stack([rng.uniform(0, 2000, (50, 2)), rng.uniform(1, 400, (50, 2)),
+                             rng.uniform(-90, 90, 50)])
+    expected = np.stack([cv2.boxPoints(((cx, cy), (w, h), angle)) for cx, cy, w, h, angle in rects])
+    np.testing.assert_allclose(box_points(rects), expected, atol=1e-3)
+
+def test_box_points_from_min_area_rect():
+    contour = cv2.ellipse2Poly((300, 200), (120, 40), 30, 0, 360, 5).reshape(-1, 1, 2)
+    (cx, cy), (w, h), angle = cv2.minAreaRect(contour)
+    points = box_points(np.float64([[cx, cy, w, h, angle]]))[0]
+    np.testing.assert_allclose(points, cv2.boxPoints(cv2.minAreaRect(contour)), atol=1e-3)
@@ -0,0 +1,68 @@
+import os
+import struct
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from image_loader import _header_size, image_size, load_image
+
+WIDTH, HEIGHT = 320, 200
+
+def sample_image():
+    img = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    cv2.rectangle(img, (20, 30), (120, 90), (40, 160, 220), -1)
+    return img
+
+def with_exif_orientation(jpeg, orientation):
+    # APP1 mínimo com um único campo TIFF (0x0112) logo depois do SOI.
+    tiff = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", 1)
+    tiff += struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack("<I", 0)
+    payload = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + jpeg[2:]
+
+@pytest.mark.parametrize("ext", [".jpg", ".png", ".bmp"])
+def test_header_size_without_decoding(tmp_path, ext):
+    path = str(tmp_path / f"foto{ext}")
+    cv2.imwrite(path, sample_image())
+    assert tuple(_header_size(path)) == (WIDTH, HEIGHT)
+
+def test_header_size_unknown_format_falls_back_to_decode(tmp_path):
+    path = str(tmp_path / "foto.tiff")
+    cv2.imwrite(path, sample_image())
+    assert _header_size(path) is None
+    assert image_size(path) == (WIDTH, HEIGHT)
+
+    image = load_image(path)
+    # O tamanho saiu de uma decodificação completa, que fica guardada para a medição.
+    assert image.size == (WIDTH, HEIGHT)
+    assert image.full_loads == 1
+    image.full()
+    assert image.full_loads == 1
+
+@pytest.mark.parametrize("orientation", [1, 3, 6, 8])
+def test_exif_orientation_matches_imread(tmp_path, orientation):
+    ok, encoded = cv2.imencode(".jpg", sample_image())
+    path = tmp_path / "foto.jpg"
+    path.write_bytes(with_exif_orientation(encoded.tobytes(), orientation))
+
+    decoded = cv2.imread(str(path))
+    assert tuple(_header_size(str(path))) == (decoded.shape[1], decoded.shape[0])
+    if orientation >= 5:
+        assert tuple(_header_size(str(path))) == (HEIGHT, WIDTH)
+
+def test_reduced_decode(tmp_path):
+    path = str(tmp_path / "foto.jpg")
+    cv2.imwrite(path, sample_image())
+    img, scale = load_image(path).reduced(160)
+    assert img.shape[:2] == (100, 160)
+    assert scale == pytest.approx(0.5)
+
+def test_unreadable_file(tmp_path):
+    path = tmp_path / "foto.tiff"
+    path.write_bytes(b"nada aqui")
+    assert load_image(str(path)) is None
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from marker_set import DEFAULT_MARKER_SIZE_CM, marker_set_arg, parse_marker_set
+
+def test_parse_ids_and_sizes():
+    marker_set = parse_marker_set("0,1,2:15")
+    assert marker_set.sizes == {0: DEFAULT_MARKER_SIZE_CM, 1: DEFAULT_MARKER_SIZE_CM, 2: 15.0}
+    assert marker_set.default_size is None
+
+def test_parse_default_size():
+    marker_set = parse_marker_set("*:20,3:10")
+    assert marker_set.default_size == 20.0
+    assert marker_set.sizes == {3: 10.0}
+
+def test_parse_none():
+    assert parse_marker_set(None) is None
+
+def test_parse_board_file(tmp_path):
+    path = tmp_path / "quadro.json"
+    path.write_text(json.dumps({"default_size_cm": 12, "markers": [
+        {"id": 0, "position_cm": [0, 0]},
+        {"id": 1, "size_cm": 8, "position_cm": [30, 0]},
+        {"id": 2},
+    ]}), encoding="utf-8")
+    marker_set = parse_marker_set(str(path))
+    assert marker_set.sizes == {0: 12.0, 1: 8.0, 2: 12.0}
+    assert set(marker_set.positions) == {0, 1}
+    assert marker_set.positions[1] == pytest.approx([30, 0])
+
+def test_select_drops_unknown_ids_without_default():
+    marker_set = parse_marker_set("0,2:15")
+    # O detector ArUco devolve os cantos como uma tupla de arrays.
+    corners = tuple(np.zeros((1, 4, 2), np.float32) for _ in range(3))
+    corners, ids, sizes = marker_set.select(corners, np.int32([[0], [1], [2]]))
+    assert ids.tolist() == [0, 2]
+    assert sizes.tolist() == [DEFAULT_MARKER_SIZE_CM, 15.0]
+
+@pytest.mark.parametrize("text", ["abc", "0:x", "1,,2"])
+def test_invalid_text_is_an_argument_error(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        marker_set_arg(text)
+
+def test_valid_text_passes_through():
+    assert marker_set_arg("0,1:15") == "0,1:15"
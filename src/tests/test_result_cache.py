@@ -0,0 +1,72 @@
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+import result_cache
+from result_cache import ResultCache
+
+def open_cache(tmp_path, fingerprint="a", max_entries=10):
+    return ResultCache(str(tmp_path / "cache.db"), fingerprint, max_entries)
+
+def test_round_trip_drops_volatile_fields(tmp_path):
+    cache = open_cache(tmp_path)
+    record = {"image": "x.jpg", "elapsed_ms": 12.0, "worker_pid": 7, "pixel_cm_ratio": 4.5, "objects": [{"id": 1}]}
+    cache.put("h1", record)
+    assert cache.get("h1") == {"pixel_cm_ratio": 4.5, "objects": [{"id": 1}]}
+    assert cache.get("h2") is None
+    cache.close()
+
+    # Outra impressão digital (parâmetros ou versão) não enxerga o resultado.
+    other = open_cache(tmp_path, "b")
+    assert other.get("h1") is None
+    other.close()
+
+def test_content_hash_follows_file_changes(tmp_path):
+    cache = open_cache(tmp_path)
+    path = tmp_path / "foto.jpg"
+    path.write_bytes(b"primeira")
+    first = cache.content_hash(str(path))
+    assert cache.content_hash(str(path)) == first
+
+    path.write_bytes(b"segunda versao")
+    assert cache.content_hash(str(path)) != first
+    cache.close()
+
+def test_evict_removes_least_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(result_cache.time, "time", lambda: next(clock))
+    cache = open_cache(tmp_path, max_entries=10)
+    for i in range(12):
+        cache.put(f"h{i}", {"n": i})
+    cache.get("h0")
+
+    # Excesso de 2 mais um décimo do limite: saem os três usados há mais tempo, h0 foi lido agora há pouco.
+    assert cache.evict() == 3
+    kept = {row[0] for row in cache.conn.execute("SELECT content_hash FROM results")}
+    assert kept == {"h0"} | {f"h{i}" for i in range(4, 12)}
+    cache.close()
+
+def test_close_evicts(tmp_path):
+    cache = open_cache(tmp_path, max_entries=5)
+    for i in range(8):
+        cache.put(f"h{i}", {"n": i})
+    cache.close()
+
+    reopened = open_cache(tmp_path, max_entries=5)
+    assert reopened.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] <= 5
+    reopened.close()
+
+def test_invalidate_keeps_current_fingerprint(tmp_path):
+    old = open_cache(tmp_path, "antiga")
+    old.put("h1", {"n": 1})
+    old.close()
+
+    cache = open_cache(tmp_path, "nova")
+    cache.put("h2", {"n": 2})
+    assert cache.invalidate() == 1
+    assert cache.get("h2") == {"n": 2}
+    assert cache.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 1
+    cache.close()
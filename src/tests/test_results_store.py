@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from results_store import MEASUREMENT_COLUMNS, OBJECT_COLUMNS, SCHEMA, ResultStore, connect, query_measurements, \
+    query_track, summarize
+
+def record(feed, track_id, diameter, error=None):
+    return {"feed": feed, "seq": 1, "pixel_cm_ratio": 5.0, "error": error,
+            "objects": [{"track_id": track_id, "center_x": 1.0, "center_y": 2.0, "diameter_cm": diameter}]}
+
+def test_schema_columns(tmp_path):
+    conn = connect(str(tmp_path / "medidas.db"))
+    measurements = {row["name"] for row in conn.execute("PRAGMA table_info(measurements)")}
+    objects = {row["name"] for row in conn.execute("PRAGMA table_info(objects)")}
+    assert set(MEASUREMENT_COLUMNS) | {"id"} == measurements
+    assert set(OBJECT_COLUMNS) == objects
+    conn.close()
+
+def test_writers_do_not_collide(tmp_path):
+    path = str(tmp_path / "medidas.db")
+    first, second = ResultStore(path, "patio"), ResultStore(path, "patio")
+    first.write(record("cam", 1, 30.0))
+    second.write(record("cam", 1, 31.0))
+    first.write(record("cam", 2, 32.0))
+    first.close()
+    second.close()
+
+    conn = connect(path)
+    rows = query_measurements(conn, station="patio")
+    assert len(rows) == 3
+    assert len({row["id"] for row in rows}) == 3
+    assert conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 3
+    conn.close()
+
+def test_query_track_is_scoped_by_run_and_source(tmp_path):
+    path = str(tmp_path / "medidas.db")
+    old_run = ResultStore(path)
+    old_run.write(record("cam", 7, 20.0))
+    old_run.close()
+    run = ResultStore(path)
+    run.write(record("cam", 7, 25.0))
+    run.write(record("outra", 7, 40.0))
+    run.close()
+
+    conn = connect(path)
+    # Sem execução nem origem vale a medição mais recente com esse track_id.
+    assert [row["diameter_cm"] for row in query_track(conn, 7)] == [40.0]
+    assert [row["diameter_cm"] for row in query_track(conn, 7, source="cam")] == [25.0]
+    assert [row["diameter_cm"] for row in query_track(conn, 7, run_id=old_run.run_id)] == [20.0]
+    assert query_track(conn, 8) == []
+    conn.close()
+
+def test_summarize(tmp_path):
+    path = str(tmp_path / "medidas.db")
+    store = ResultStore(path, "patio", batch_size=2)
+    store.write(record("cam", 1, 30.0))
+    store.write(record("cam", 2, 40.0, error="marcador_nao_encontrado"))
+    store.write(record("cam", 3, 50.0))
+    assert store.written == 2
+    store.close()
+
+    summary = summarize(connect(path), station="patio")
+    assert summary["measurements"] == 3
+    assert summary["errors"] == 1
+    assert summary["mean_diameter_cm"] == 40.0
+
+def test_old_database_gets_run_column(tmp_path):
+    path = str(tmp_path / "antigo.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA.replace("    run_id TEXT,\n", ""))
+    conn.close()
+
+    store = ResultStore(path)
+    store.write(record("cam", 1, 30.0))
+    store.close()
+    conn = connect(path)
+    assert [row["run_id"] for row in query_measurements(conn)] == [store.run_id]
+    conn.close()
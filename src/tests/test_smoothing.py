@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from smoothing import RingBuffer, Smoother
+
+def test_ring_buffer_keeps_last_window():
+    buffer = RingBuffer(4, dims=2)
+    values = np.float64([[i, 10 * i] for i in range(1, 8)])
+    for row in values:
+        buffer.append(row)
+
+    window = values[-4:]
+    assert buffer.count == 4
+    assert sorted(buffer.values()[:, 0]) == [4, 5, 6, 7]
+    # Soma e soma dos quadrados atualizadas a cada inserção têm de bater com o cálculo direto sobre a janela.
+    assert buffer.mean() == pytest.approx(window.mean(axis=0))
+    assert buffer.variance() == pytest.approx(window.var(axis=0, ddof=1))
+    assert buffer.median() == pytest.approx(np.median(window, axis=0))
+
+def test_ring_buffer_trimmed_mean_and_clear():
+    buffer = RingBuffer(10)
+    for value in [1, 2, 3, 4, 5, 6, 7, 8, 9, 100]:
+        buffer.append([value])
+    assert buffer.trimmed_mean(0.1) == pytest.approx([5.5])
+
+    buffer.clear()
+    assert buffer.count == 0
+    buffer.append([3.0])
+    assert buffer.mean() == pytest.approx([3.0])
+    assert buffer.variance() == pytest.approx([0.0])
+
+def test_smoother_rejects_outlier_then_restarts():
+    smoother = Smoother(10, max_rejections=2)
+    for value in [10.0, 10.1, 9.9, 10.0, 10.2, 9.8]:
+        smoother.update([value])
+    before = float(smoother.estimate()[0])
+
+    assert float(smoother.update([50.0])[0]) == pytest.approx(before)
+    assert float(smoother.update([50.0])[0]) == pytest.approx(before)
+    assert smoother.rejected == 2
+    # O terceiro descarte seguido é uma mudança real da medida: a janela recomeça com o valor novo.
+    assert float(smoother.update([50.0])[0]) == pytest.approx(50.0)
+    assert smoother.buffer.count == 1
+
+@pytest.mark.parametrize("method, expected", [("mean", 4.0), ("median", 3.0), ("trimmed", 3.0)])
+def test_smoother_methods(method, expected):
+    smoother = Smoother(5, method=method, trim=0.2, outlier_k=0)
+    for value in [1, 2, 3, 4, 10]:
+        estimate = smoother.update([value])
+    assert float(estimate[0]) == pytest.approx(expected)
+
+def test_smoother_unknown_method():
+    with pytest.raises(ValueError):
+        Smoother(method="moda")
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from measure_core import MODES, create_marker_detector, measure_image
+
+WIDTH, HEIGHT = 2400, 1600
+MARKER_BOX = (1900, 100, 2160, 360)
+# Orçamento pequeno o bastante para dividir a cena em vários blocos em todos os modos, mas que ainda cabe o maior
+# objeto com a sua margem: acima disso a janela é segmentada reduzida e o resultado deixa de ser o mesmo.
+TILE_MEMORY_MB = {"objects": 12, "trunk": 8, "pile": 16}
+
+def generate_scene(seed=5):
+    # Discos claros de tamanhos variados sobre fundo escuro com ruído, sem encostar uns nos outros, e um marcador ArUco.
+    rng = np.random.default_rng(seed)
+    img = np.full((HEIGHT, WIDTH, 3), 35, np.uint8)
+    placed = []
+    x0, y0, x1, y1 = MARKER_BOX
+    for _ in range(3000):
+        r = rng.choice([rng.uniform(10, 16), rng.uniform(32, 120)], p=[0.6, 0.4])
+        x, y = rng.uniform(r + 8, WIDTH - r - 8), rng.uniform(r + 8, HEIGHT - r - 8)
+        if x0 < x + r and x - r < x1 and y0 < y + r and y - r < y1:
+            continue
+        if all((x - a) ** 2 + (y - b) ** 2 > (r + c + 2) ** 2 for a, b, c in placed):
+            placed.append((x, y, r))
+    for x, y, r in placed[:200]:
+        color = tuple(float(c) for c in rng.uniform([90, 140, 180], [110, 160, 200]))
+        cv2.circle(img, (int(x), int(y)), int(r), color, -1, cv2.LINE_AA)
+    marker = cv2.aruco.generateImageMarker(cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50), 0, 200)
+    img[y0:y1, x0:x1] = 255
+    img[y0 + 30:y1 - 30, x0 + 30:x1 - 30] = cv2.cvtColor(marker, cv2.COLOR_GRAY2BGR)
+    return np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+
+@pytest.fixture(scope="module")
+def scene():
+    return generate_scene()
+
+def centers(result):
+    return np.float64([(obj["center_x"], obj["center_y"]) for obj in result["objects"]]).reshape(-1, 2)
+
+@pytest.mark.parametrize("mode", MODES)
+def test_tiled_matches_untiled(scene, mode):
+    marker_detector = create_marker_detector(mode)
+    untiled, _ = measure_image(scene, mode, marker_detector, max_dimension=0)
+    tiled, _ = measure_image(scene, mode, marker_detector, max_dimension=0, tile_memory=TILE_MEMORY_MB[mode])
+
+    assert tiled["tiles"] > 1
+    assert untiled["objects"]
+    assert tiled["pixel_cm_ratio"] == pytest.approx(untiled["pixel_cm_ratio"], rel=1e-6)
+    assert len(tiled["objects"]) == len(untiled["objects"])
+    distances = np.linalg.norm(centers(untiled)[:, None] - centers(tiled)[None], axis=2)
+    assert distances.min(axis=1).max() < 1.0
+    assert distances.min(axis=0).max() < 1.0
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medidor  # noqa: F401 - coloca os módulos do projeto no caminho de busca
+from video_source import VideoSource, parse_source
+
+FPS = 10
+FRAMES = 30
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    # Cada quadro tem o próprio índice codificado no brilho, para conferir qual quadro foi lido.
+    path = str(tmp_path_factory.mktemp("video") / "esteira.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV sem gravação de vídeo MJPG")
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i * 8, np.uint8))
+    writer.release()
+    return path
+
+def read(video, **options):
+    with VideoSource(video, **options) as source:
+        frames = [(index, timestamp, int(round(frame.mean() / 8))) for index, timestamp, frame in source.frames()]
+    return frames, source
+
+def test_stride(video):
+    frames, source = read(video, stride=4)
+    assert [index for index, _, _ in frames] == list(range(0, FRAMES, 4))
+    assert all(index == content for index, _, content in frames)
+    assert source.decoded == len(frames)
+
+def test_every_seconds(video):
+    frames, _ = read(video, every_seconds=0.5)
+    assert [index for index, _, _ in frames] == list(range(0, FRAMES, 5))
+    assert [timestamp for _, timestamp, _ in frames] == pytest.approx([i / FPS for i in range(0, FRAMES, 5)])
+
+def test_every_seconds_never_below_stride(video):
+    frames, _ = read(video, stride=10, every_seconds=0.1)
+    assert [index for index, _, _ in frames] == [0, 10, 20]
+
+def test_start_and_end(video):
+    frames, _ = read(video, start_s=1.0, end_s=2.0)
+    assert [index for index, _, _ in frames] == list(range(10, 21))
+    assert all(index == content for index, _, content in frames)
+
+def test_parse_source():
+    assert parse_source("0") == 0
+    assert parse_source(2) == 2
+    assert parse_source("rtsp://camera/stream") == "rtsp://camera/stream"